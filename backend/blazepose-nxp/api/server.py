@@ -1,32 +1,78 @@
 from __future__ import annotations
+import asyncio
 import os
 import platform
-from typing import Optional
+import queue
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple, Type, TypeVar
 
-from fastapi import FastAPI, HTTPException, Response
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from PIL import UnidentifiedImageError
 
-from service.inference import InferenceService
-from service.targets import TargetRegistry, compute_similarity_percent
+from service.inference import InferenceService, SessionBusy
+from service.metrics import METRICS, StageTimings
+from scripts.pose_similarity import compute_angles, pack_keypoints
+from service.targets import TargetRegistry, compute_procrustes_percent, compute_similarity_percent
+from service.variants import parse_variant_models
 
 # Per-request inference timeout (seconds); default 5s
 INFER_TIMEOUT_SEC = float(os.getenv("INFER_TIMEOUT_SEC", "5"))
-# Single worker to avoid over-parallelizing heavy CPU/NPU work
-_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+# Longest a request may wait to get its frame queued (session's previous frame in flight,
+# pipeline input queue full); past it the request is rejected with 429/503 instead of
+# running into the inference timeout. Default: half of INFER_TIMEOUT_SEC
+SUBMIT_TIMEOUT_SEC = float(os.getenv("SUBMIT_TIMEOUT_SEC", str(INFER_TIMEOUT_SEC / 2)))
+
+# Submitting reads and hashes the image and may wait up to SUBMIT_TIMEOUT_SEC for room,
+# so it runs here instead of on the event loop
+_SUBMIT_POOL = ThreadPoolExecutor(thread_name_prefix="pose-submit")
 
 
 class SimilarityRequest(BaseModel):
-    image_path: str
+    image_path: Optional[str] = None  # not needed when the image is sent in the body
     target_pose: str
     angles: Optional[list[str]] = None  # optional override
+    session_id: Optional[str] = None  # enables ROI tracking across this client's frames
+    variant: Optional[str] = None  # landmark model: lite/full/heavy; None or "auto" = adaptive
+    multi_person: bool = False  # score every detected person instead of the most confident one
+    max_persons: Optional[int] = None  # multi-person cap; None = MULTI_PERSON_MAX
+    metric: str = "angles"  # "angles" (key-angle difference) or "procrustes" (aligned landmark shape)
 
 
-class SimilarityResponse(BaseModel):
+class RecognizeRequest(BaseModel):
+    image_path: Optional[str] = None  # not needed when the image is sent in the body
+    top_k: int = 3
+    angles: Optional[list[str]] = None
+    session_id: Optional[str] = None
+    variant: Optional[str] = None
+
+
+class PoseMatchModel(BaseModel):
+    target_pose: str
+    similarity: float
+    mirrored: bool  # the left/right-swapped pose matched best
+
+
+class RecognizeResponse(BaseModel):
+    matches: List[PoseMatchModel]  # best first; empty when no person was found
+    body_found: bool
+    variant: str
+
+
+class PersonSimilarity(BaseModel):
     similarity: float
+
+
+class SimilarityResponse(BaseModel):
+    similarity: float  # multi-person mode: the best-matching person
     body_found: bool
+    variant: str  # landmark model variant that served the request
+    persons: Optional[List[PersonSimilarity]] = None  # multi-person mode only, by detector confidence
 
 
 app = FastAPI(title="BlazePose Similarity API", version="0.1.0")
@@ -37,11 +83,14 @@ def _startup():
     # Models default to files in repo root unless overridden by env
     det = os.getenv("BLAZEPOSE_DET_MODEL", "pose_detection_quant_vela.tflite")
     lmk = os.getenv("BLAZEPOSE_LMK_MODEL", "pose_landmark_full_quant_vela.tflite")
+    # Several landmark variants: BLAZEPOSE_LMK_MODELS="lite=...tflite,full=...tflite,heavy=...tflite"
+    lmk_models = parse_variant_models(os.getenv("BLAZEPOSE_LMK_MODELS"), lmk)
     # Delegate: None on Windows, ethos-u on i.MX if provided
     default_delegate = None if platform.system().lower().startswith("win") else "/usr/lib/libethosu_delegate.so"
     delegate = os.getenv("BLAZEPOSE_DELEGATE", default_delegate)
 
-    InferenceService.initialize(det, lmk, delegate)
+    # Models load and warm up in the background so the port binds immediately; see /readyz
+    InferenceService.start_background(det, lmk_models, delegate)
 
     targets_dir = os.getenv("TARGETS_DIR", os.path.join(os.getcwd(), "targets"))
     TargetRegistry.initialize(targets_dir)
@@ -52,44 +101,287 @@ def healthz():
     return {"ok": True}
 
 
+@app.get("/readyz")
+def readyz(response: Response):
+    """200 once models are loaded and warmed up, 503 before (or if loading failed)."""
+    state = InferenceService.readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+
+def _require_ready():
+    if not InferenceService.is_ready():
+        raise HTTPException(
+            status_code=503,
+            detail={"error_code": "SERVICE_NOT_READY", "message": "Models are still loading or warming up"},
+            headers={"Retry-After": "1"},
+        )
+
+
+@app.get("/backends")
+def backends():
+    """Backend (Ethos-U / XNNPACK / CPU threads) chosen for each model, with tuning timings."""
+    _require_ready()
+    return {"backends": InferenceService.instance().backend_report()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition. Histograms are only aggregated here, at scrape time."""
+    gauges = [("pose_ready", "1 once models are loaded and warmed up", {}, float(InferenceService.is_ready()))]
+    if InferenceService.is_ready():
+        svc = InferenceService.instance()
+        cache = svc.cache_stats()
+        for k in ("hits", "misses", "evictions", "entries", "bytes", "hit_rate"):
+            gauges.append((f"pose_cache_{k}", f"Landmark cache {k.replace('_', ' ')}", {}, cache[k]))
+        for stage, depth in svc.pipeline_queue_depths().items():
+            gauges.append(("pose_pipeline_queue_depth", "Frames waiting in front of a pipeline stage", {"stage": stage}, depth))
+        policy = svc.variant_stats()
+        gauges.append(("pose_inflight_requests", "Requests submitted and not yet finished", {}, policy["inflight"]))
+        for v in policy["variants"]:
+            gauges.append(("pose_landmark_variant_active", "1 for the variant the adaptive policy serves",
+                           {"variant": v}, float(v == policy["current"])))
+    return PlainTextResponse(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+def stats():
+    out = {"startup": InferenceService.readiness()}
+    if InferenceService.is_ready():
+        svc = InferenceService.instance()
+        out["cache"] = svc.cache_stats()
+        out["landmark_variants"] = svc.variant_stats()
+        out["backends"] = svc.backend_report()
+    return out
+
+
 @app.get("/targets")
 def list_targets():
     reg = TargetRegistry.instance()
     return {"targets": reg.list_targets()}
 
-@app.post("/similarity", response_model=SimilarityResponse)
-def similarity(req: SimilarityRequest, response: Response):
-    # Basic validation
-    if not req.image_path:
-        raise HTTPException(status_code=400, detail={"error_code": "INVALID_REQUEST", "message": "image_path is required"})
+@app.delete("/sessions/{session_id}")
+def end_session(session_id: str):
+    _require_ready()
+    InferenceService.instance().end_session(session_id)
+    return {"ok": True}
+
+
+_RAW_IMAGE_TYPES = ("application/octet-stream", "image/jpeg", "image/png")
+_FORM_FIELDS = ("target_pose", "angles", "session_id", "variant", "multi_person", "max_persons", "metric")
+_METRICS = ("angles", "procrustes")
+_RECOGNIZE_FIELDS = ("top_k", "angles", "session_id", "variant")
+
+_Req = TypeVar("_Req", bound=BaseModel)
 
-    reg = TargetRegistry.instance()
-    t = reg.get(req.target_pose)
-    if not t:
-        raise HTTPException(status_code=404, detail={"error_code": "TARGET_NOT_FOUND", "message": f"Unknown target_pose: {req.target_pose}"})
 
-    # Inference with timeout and mapped error responses
+async def _parse_similarity_request(request: Request) -> Tuple[SimilarityRequest, Optional[bytes]]:
+    """Accepts three body types:
+    - application/json: SimilarityRequest with image_path
+    - multipart/form-data: file field "image" + form fields target_pose, angles, session_id, variant,
+      multi_person, max_persons
+    - application/octet-stream (or image/*): raw image bytes + the same fields as query params
+    angles is a comma-separated list in the form/query variants.
+    """
+    return await _parse_image_request(request, SimilarityRequest, _FORM_FIELDS)
+
+
+async def _parse_image_request(request: Request, model: Type[_Req],
+                               field_names: Tuple[str, ...]) -> Tuple[_Req, Optional[bytes]]:
+    """Body parsing shared by /similarity and /recognize (see _parse_similarity_request)."""
+    ctype = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    image_bytes: Optional[bytes] = None
+    if ctype == "multipart/form-data":
+        form = await request.form()
+        upload = form.get("image")
+        if upload is not None and hasattr(upload, "read"):
+            image_bytes = await upload.read()
+        fields = {k: form.get(k) for k in field_names + ("image_path",)}
+    elif ctype in _RAW_IMAGE_TYPES:
+        image_bytes = await request.body()
+        fields = {k: request.query_params.get(k) for k in field_names}
+    else:
+        try:
+            return model.model_validate(await request.json()), None
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        except ValueError:
+            raise HTTPException(status_code=400, detail={"error_code": "INVALID_REQUEST", "message": "Malformed JSON body"})
+    if isinstance(fields.get("angles"), str):
+        fields["angles"] = [a.strip() for a in fields["angles"].split(",") if a.strip()] or None
+    try:
+        req = model.model_validate({k: v for k, v in fields.items() if v is not None})
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    return req, image_bytes
+
+
+async def _await_inference(submit: Callable[[], Future], image_path: Optional[str]):
+    """Call submit (returns an InferenceService future) off the event loop and wait for the
+    result, submit time included, with INFER_TIMEOUT_SEC; failures map to HTTP errors.
+    Submitting inside the guard matters: an unreadable image_path already raises
+    FileNotFoundError at submit time.
+    """
     try:
-        future = _EXECUTOR.submit(InferenceService.instance().infer_keypoints, req.image_path)
-        kps = future.result(timeout=INFER_TIMEOUT_SEC)
-    except FuturesTimeoutError:
+        return await asyncio.wait_for(_submit_and_wait(submit), timeout=INFER_TIMEOUT_SEC)
+    except asyncio.TimeoutError:
+        METRICS.inc("pose_inference_timeouts_total")
+        METRICS.inc("pose_requests_total", outcome="timeout")
         raise HTTPException(status_code=504, detail={"error_code": "INFERENCE_TIMEOUT", "message": f"Inference exceeded {INFER_TIMEOUT_SEC:.1f}s"})
+    except SessionBusy:
+        METRICS.inc("pose_requests_total", outcome="session_busy")
+        raise HTTPException(status_code=429, detail={"error_code": "SESSION_BUSY", "message": "Previous frame of this session is still being processed"},
+                            headers={"Retry-After": "1"})
+    except queue.Full:
+        METRICS.inc("pose_requests_total", outcome="overloaded")
+        raise HTTPException(status_code=503, detail={"error_code": "PIPELINE_BUSY", "message": "Inference pipeline is full"},
+                            headers={"Retry-After": "1"})
     except FileNotFoundError:
-        raise HTTPException(status_code=404, detail={"error_code": "IMAGE_NOT_FOUND", "message": f"Image not found: {req.image_path}"})
+        METRICS.inc("pose_requests_total", outcome="image_not_found")
+        raise HTTPException(status_code=404, detail={"error_code": "IMAGE_NOT_FOUND", "message": f"Image not found: {image_path}"})
     except UnidentifiedImageError:
+        METRICS.inc("pose_requests_total", outcome="invalid_image")
         raise HTTPException(status_code=400, detail={"error_code": "INVALID_IMAGE_FORMAT", "message": "Unsupported or corrupt image"})
     except Exception as e:
         # Catch-all for TFLite/OpenCV/Numpy errors
+        METRICS.inc("pose_requests_total", outcome="error")
         raise HTTPException(status_code=500, detail={"error_code": "INFERENCE_ERROR", "message": str(e)})
 
-    percent = compute_similarity_percent(kps, t, selected=req.angles)
-    body_found = bool(kps)
+
+async def _submit_and_wait(submit: Callable[[], Future]):
+    """Run submit on _SUBMIT_POOL, then wait for the future it returns. If the caller gives
+    up while submit is still blocked, the frame it queues later is cancelled right away."""
+    submitted = _SUBMIT_POOL.submit(submit)
+    try:
+        future = await asyncio.wrap_future(submitted)
+    except asyncio.CancelledError:
+        submitted.add_done_callback(_cancel_submitted)
+        raise
+    return await asyncio.wrap_future(future)
+
+
+def _cancel_submitted(submitted: Future):
+    if not submitted.cancelled() and submitted.exception() is None:
+        submitted.result().cancel()
+
+
+def _resolve_variant(svc: InferenceService, requested: Optional[str]) -> str:
+    try:
+        return svc.resolve_variant(requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error_code": "UNKNOWN_MODEL_VARIANT", "message": str(e)})
+
+
+@app.post("/similarity", response_model=SimilarityResponse)
+async def similarity(request: Request, response: Response):
+    req, image_bytes = await _parse_similarity_request(request)
+
+    # Basic validation
+    if not image_bytes and not req.image_path:
+        raise HTTPException(status_code=400, detail={"error_code": "INVALID_REQUEST", "message": "image_path or image bytes are required"})
+
+    if req.metric not in _METRICS:
+        raise HTTPException(status_code=400, detail={"error_code": "UNKNOWN_METRIC", "message": f"metric must be one of {', '.join(_METRICS)}"})
+
+    reg = TargetRegistry.instance()
+    t = reg.get(req.target_pose)
+    if not t:
+        raise HTTPException(status_code=404, detail={"error_code": "TARGET_NOT_FOUND", "message": f"Unknown target_pose: {req.target_pose}"})
+
+    _require_ready()
+
+    # Inference with timeout and mapped error responses. Frames go through the staged
+    # pipeline (one thread per stage), so concurrent requests overlap across stages.
+    # In-memory images are decoded straight from the request body.
+    svc = InferenceService.instance()
+    variant = _resolve_variant(svc, req.variant)
+
+    t_start = time.perf_counter()
+    timings = StageTimings()
+    if req.multi_person:
+        people = await _await_inference(
+            lambda: svc.submit_multi(image_bytes or req.image_path, variant=variant,
+                                     max_persons=req.max_persons, timings=timings),
+            req.image_path)
+    else:
+        kps = await _await_inference(
+            lambda: svc.submit_packed(image_bytes or req.image_path, req.session_id, variant=variant, timings=timings,
+                                      timeout=SUBMIT_TIMEOUT_SEC),
+            req.image_path)
+
+    t_sim = time.perf_counter()
+    if req.metric == "procrustes":
+        score = lambda p: compute_procrustes_percent(p, t)
+    else:
+        score = lambda p: compute_similarity_percent(p, t, selected=req.angles)
+    persons = None
+    if req.multi_person:
+        persons = [PersonSimilarity(similarity=score(p)) for p in people]
+        percent = max((p.similarity for p in persons), default=0.0)
+        body_found = bool(persons)
+    else:
+        # Packed keypoints go straight into the scorer; [0,4] when nobody was found
+        percent = score(kps)
+        body_found = len(kps) > 0
+    timings.add("similarity", time.perf_counter() - t_sim)
+    total = time.perf_counter() - t_start
+    METRICS.observe("pose_stage_duration_seconds", timings["similarity"], stage="similarity")
+    METRICS.observe("pose_request_duration_seconds", total, variant=variant)
+    METRICS.inc("pose_requests_total", outcome="ok" if body_found else "no_person")
 
     # Signal no-person-detected via header while keeping success payload minimal
     if not body_found:
         response.headers["X-Pose-Status"] = "no_person"
+    response.headers["X-Pose-Variant"] = variant
+    response.headers["Server-Timing"] = timings.server_timing(total)
 
-    return SimilarityResponse(similarity=float(percent), body_found=body_found)
+    return SimilarityResponse(similarity=float(percent), body_found=body_found, variant=variant, persons=persons)
+
+
+@app.post("/recognize", response_model=RecognizeResponse)
+async def recognize(request: Request, response: Response):
+    """Top-k closest target poses for a frame (mirroring included), from one inference.
+    Accepts the same body types as /similarity, with top_k instead of target_pose.
+    """
+    req, image_bytes = await _parse_image_request(request, RecognizeRequest, _RECOGNIZE_FIELDS)
+    if not image_bytes and not req.image_path:
+        raise HTTPException(status_code=400, detail={"error_code": "INVALID_REQUEST", "message": "image_path or image bytes are required"})
+    if req.top_k < 1:
+        raise HTTPException(status_code=400, detail={"error_code": "INVALID_REQUEST", "message": "top_k must be >= 1"})
+
+    _require_ready()
+    svc = InferenceService.instance()
+    variant = _resolve_variant(svc, req.variant)
+
+    t_start = time.perf_counter()
+    timings = StageTimings()
+    kps = await _await_inference(
+        lambda: svc.submit_packed(image_bytes or req.image_path, req.session_id, variant=variant, timings=timings,
+                                  timeout=SUBMIT_TIMEOUT_SEC),
+        req.image_path)
+
+    t_rec = time.perf_counter()
+    body_found = len(kps) > 0
+    matches = []
+    if body_found:
+        angles = compute_angles(pack_keypoints(kps))
+        matches = TargetRegistry.instance().recognition_index().query(angles, top_k=req.top_k, selected=req.angles)
+    timings.add("recognize", time.perf_counter() - t_rec)
+    total = time.perf_counter() - t_start
+    METRICS.observe("pose_stage_duration_seconds", timings["recognize"], stage="recognize")
+    METRICS.observe("pose_request_duration_seconds", total, variant=variant)
+    METRICS.inc("pose_requests_total", outcome="ok" if body_found else "no_person")
+
+    if not body_found:
+        response.headers["X-Pose-Status"] = "no_person"
+    response.headers["X-Pose-Variant"] = variant
+    response.headers["Server-Timing"] = timings.server_timing(total)
+    return RecognizeResponse(
+        matches=[PoseMatchModel(target_pose=m.name, similarity=m.similarity, mirrored=m.mirrored) for m in matches],
+        body_found=body_found,
+        variant=variant,
+    )
 
 
 # Convenience for `python -m api.server`
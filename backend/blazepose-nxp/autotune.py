@@ -0,0 +1,152 @@
+"""Startup backend auto-tuning for the pose models.
+
+For each model the candidate backends (Ethos-U delegate, builtin CPU kernels
+with 1..N threads, XNNPACK with 1..N threads when the runtime has it and it
+supports part of the model) are timed on synthetic frames
+and the fastest is kept. The choice is persisted in a small JSON file keyed by
+the model's content hash (plus machine and delegate), so later starts skip the
+benchmark until the model file changes.
+
+Candidates that cannot run are skipped: the Vela-compiled models only run on
+the delegate (their ethos-u custom op has no CPU kernel), and dev machines have
+no delegate at all, so there the tuner ends up choosing the best CPU setup.
+
+    import autotune
+    det, info = autotune.tuned_model(bp.PoseDetector, det_path, delegate)
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import platform
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+AUTOTUNE_CACHE = os.getenv(
+    "BLAZEPOSE_BACKEND_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "blazepose-nxp", "backends.json")
+)
+AUTOTUNE_MAX_THREADS = int(os.getenv("AUTOTUNE_MAX_THREADS", str(min(4, os.cpu_count() or 1))))
+AUTOTUNE_ITERATIONS = int(os.getenv("AUTOTUNE_ITERATIONS", "5"))
+
+_cache_lock = threading.Lock()
+
+
+def model_digest(model_path: str) -> str:
+    h = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:32]
+
+
+def cache_key(model_path: str, ethosu_delegate: Optional[str]) -> str:
+    """Model content + the things that change which backend wins."""
+    delegate = os.path.basename(ethosu_delegate) if ethosu_delegate else "none"
+    return f"{model_digest(model_path)}:{platform.machine()}:{os.cpu_count()}:{delegate}"
+
+
+def candidate_backends(ethosu_delegate: Optional[str], max_threads: int = AUTOTUNE_MAX_THREADS,
+                       xnnpack: bool = True) -> List[str]:
+    cands = ["ethosu"] if ethosu_delegate else []
+    threads = range(1, max(1, max_threads) + 1)
+    if xnnpack:
+        cands += [f"xnnpack:{n}" for n in threads]
+    cands += [f"cpu:{n}" for n in threads]
+    return cands
+
+
+def load_cache(path: str = AUTOTUNE_CACHE) -> Dict[str, dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_choice(key: str, entry: dict, path: str = AUTOTUNE_CACHE):
+    """Merge one entry into the cache file (atomic replace; unwritable locations are ignored)."""
+    with _cache_lock:
+        data = load_cache(path)
+        data[key] = entry
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[WARN] Could not write backend cache {path}: {e}")
+
+
+def time_model(model, iterations: int = AUTOTUNE_ITERATIONS) -> float:
+    """Median ms per infer() on a synthetic frame at the model's input size, after one warm-up call."""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=tuple(model._in_hw) + (3,), dtype=np.uint8)
+    model.infer(frame)
+    times = []
+    for _ in range(max(1, iterations)):
+        t0 = time.perf_counter()
+        model.infer(frame)
+        times.append(1e3 * (time.perf_counter() - t0))
+    return float(np.median(times))
+
+
+def tune(model_cls, model_path: str, ethosu_delegate: Optional[str],
+         candidates: Optional[List[str]] = None, iterations: int = AUTOTUNE_ITERATIONS) -> Tuple[object, dict]:
+    """Time every candidate; returns (fastest model instance, report)."""
+    best = None
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    if candidates is None:
+        # Without XNNPACK "xnnpack:N" would be the plain CPU interpreter again: probe once
+        xnnpack = True
+        try:
+            model_cls(model_path, ethosu_delegate=ethosu_delegate, backend="xnnpack:1")
+        except Exception as e:
+            errors["xnnpack"] = f"{type(e).__name__}: {e}"
+            xnnpack = False
+        candidates = candidate_backends(ethosu_delegate, xnnpack=xnnpack)
+    for backend in candidates:
+        try:
+            model = model_cls(model_path, ethosu_delegate=ethosu_delegate, backend=backend)
+            ms = time_model(model, iterations)
+        except Exception as e:
+            errors[backend] = f"{type(e).__name__}: {e}"
+            continue
+        timings[backend] = ms
+        if best is None or ms < timings[best[0]]:
+            best = (backend, model)
+    if best is None:
+        raise RuntimeError(f"No usable backend for {model_path}: {errors}")
+    report = {
+        "model": os.path.basename(model_path),
+        "backend": best[0],
+        "ms": timings[best[0]],
+        "timings_ms": timings,
+        "skipped": errors,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return best[1], report
+
+
+def tuned_model(model_cls, model_path: str, ethosu_delegate: Optional[str], retune: bool = False,
+                cache_path: str = AUTOTUNE_CACHE) -> Tuple[object, dict]:
+    """Model on its fastest backend: the cached choice when present and still loadable, else tuned now.
+    The returned report has "source": "cache" or "tuned".
+    """
+    key = cache_key(model_path, ethosu_delegate)
+    if not retune:
+        entry = load_cache(cache_path).get(key)
+        if entry is not None:
+            try:
+                model = model_cls(model_path, ethosu_delegate=ethosu_delegate, backend=entry["backend"])
+                return model, {**entry, "source": "cache"}
+            except Exception as e:
+                print(f"[WARN] Cached backend {entry.get('backend')} failed for {model_path}: {e}. Re-tuning.")
+    model, report = tune(model_cls, model_path, ethosu_delegate)
+    save_choice(key, report, cache_path)
+    return model, {**report, "source": "tuned"}
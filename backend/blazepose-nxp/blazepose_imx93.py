@@ -16,23 +16,49 @@ Usage:
     --out_img output_annotated.png \
     --out_json output_landmarks.json
 
+Batch mode (models loaded once; decode/preprocess overlapped with inference):
+  python blazepose_imx93.py --inputs targets/*.png snaps/ @more.txt \
+    --det pose_detection_quant_vela.tflite \
+    --lmk pose_landmark_full_quant_vela.tflite \
+    --out_dir out/ [--jsonl out/all.jsonl] [--annotate]
+
+Stream mode (video file, image sequence or the camera server's MJPEG /video), NDJSON per frame:
+  python blazepose_imx93.py --video http://192.168.0.174:5000/video \
+    --det pose_detection_quant_vela.tflite \
+    --lmk pose_landmark_full_quant_vela.tflite \
+    --target_fps 10 --decode_min_side 320 > poses.ndjson
+
 Requires:
   pip install pillow numpy opencv-python tflite-runtime
 """
 from __future__ import annotations
 import argparse
+import io
+import itertools
 import json
 import math
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple
 
 import numpy as np
-import cv2
-from PIL import Image
 
-# TensorFlow Lite Runtime (embedded)
-from tflite_runtime.interpreter import Interpreter as TFLiteInterpreter
-from tflite_runtime.interpreter import load_delegate
+import frame_sources
+import preprocess
+import transform
+from lazy_import import lazy_import
+
+# OpenCV / Pillow load on first use so importing this module (and the API server) stays fast
+cv2 = lazy_import("cv2")
+Image = lazy_import("PIL.Image")
+
+# TensorFlow Lite Runtime (embedded); resolved by _open_interpreter on first model load.
+# Off-board tools may assign a stand-in class to TFLiteInterpreter before constructing models.
+TFLiteInterpreter = None
+load_delegate = None
 
 # ------------------------------------------------------------
 # Constants
@@ -75,11 +101,45 @@ SKELETON_CONNECTIONS = [
 # ------------------------------------------------------------
 # Utilities
 # ------------------------------------------------------------
-def _load_image_any(path: str) -> np.ndarray:
-    img = Image.open(path).convert("RGB")
+def _load_image_any(src: str | bytes) -> np.ndarray:
+    """Decode an image file path, or encoded image bytes straight from memory, to RGB."""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = io.BytesIO(src)
+    img = Image.open(src).convert("RGB")
     return np.array(img)
 
 
+def _load_image_reduced(src: str | bytes, min_long_side: int) -> Tuple[np.ndarray, Tuple[float, float]]:
+    """Decode at the smallest JPEG DCT scale (1/2, 1/4, 1/8) whose long side stays >= min_long_side.
+    libjpeg does the downscale and YCbCr->RGB conversion while decoding, so large frames
+    never exist at full resolution in memory. Non-JPEG inputs decode at full size.
+    Returns (rgb, (scale_x, scale_y)) where scale maps decoded pixels back to original pixels.
+    The array is read-only (it wraps the decoder's buffer without another copy).
+    """
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = io.BytesIO(src)
+    img = Image.open(src)
+    full_w, full_h = img.size
+    long_side = max(full_w, full_h)
+    if img.format == "JPEG" and min_long_side > 0 and long_side >= 2 * min_long_side:
+        r = min_long_side / float(long_side)
+        # draft() picks the largest reduction that keeps the size >= the requested one
+        img.draft("RGB", (int(math.ceil(full_w * r)), int(math.ceil(full_h * r))))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    arr = np.asarray(img)
+    h, w = arr.shape[:2]
+    return arr, (full_w / float(w), full_h / float(h))
+
+
+def roi_decode_min_side(roi_side: float, size: int = 256) -> int:
+    """Long side a frame must keep for an ROI spanning roi_side of it (normalized to the
+    letterboxed square) to still be sampled with at least size px: the min_long_side
+    for _load_image_reduced that never upsamples the model input.
+    """
+    return int(math.ceil(size / max(float(roi_side), 1e-3)))
+
+
 def _letterbox_to_square_rgb(img_rgb: np.ndarray, size_square: int = 256) -> Tuple[np.ndarray, Tuple[int,int,int,int]]:
     """Pad to square on longer side, then resize to size_square.
     Returns (resized_square_rgb, (orig_h, orig_w, pad_y, pad_x)).
@@ -130,10 +190,10 @@ def _calc_scale(min_scale, max_scale, stride_index, num_strides):
 def generate_pose_det_anchors(options=POSE_DET_ANCHOR_OPTIONS) -> np.ndarray:
     strides_size = len(options["strides"])
     assert options["num_layers"] == strides_size
-    anchors = []
+    layers = []
     layer_id = 0
     while layer_id < strides_size:
-        anchor_h, anchor_w, aspect_ratios, scales = [], [], [], []
+        aspect_ratios, scales = [], []
         last_same = layer_id
         while last_same < strides_size and options["strides"][last_same] == options["strides"][layer_id]:
             scale = _calc_scale(options["min_scale"], options["max_scale"], last_same, strides_size)
@@ -145,184 +205,408 @@ def generate_pose_det_anchors(options=POSE_DET_ANCHOR_OPTIONS) -> np.ndarray:
                 scales.append(np.sqrt(scale * scale_next))
                 aspect_ratios.append(options["interpolated_scale_aspect_ratio"])
             last_same += 1
-        for i in range(len(aspect_ratios)):
-            r = math.sqrt(aspect_ratios[i])
-            anchor_h.append(scales[i] / r)
-            anchor_w.append(scales[i] * r)
+        r = np.sqrt(np.asarray(aspect_ratios, dtype=np.float64))
+        anchor_h = np.asarray(scales, dtype=np.float64) / r
+        anchor_w = np.asarray(scales, dtype=np.float64) * r
         stride = options["strides"][layer_id]
         fm_h = int(math.ceil(options["input_size_height"] / stride))
         fm_w = int(math.ceil(options["input_size_width"] / stride))
-        for y in range(fm_h):
-            for x in range(fm_w):
-                for _ in range(len(anchor_h)):
-                    x_center = (x + options["anchor_offset_x"]) / fm_w
-                    y_center = (y + options["anchor_offset_y"]) / fm_h
-                    if options["fixed_anchor_size"]:
-                        anchors.append([x_center, y_center, 1.0, 1.0])
-                    else:
-                        anchors.append([x_center, y_center, anchor_w[_], anchor_h[_]])
+        # Row-major grid (y, x), each cell repeated once per anchor
+        gy, gx = np.meshgrid(np.arange(fm_h), np.arange(fm_w), indexing="ij")
+        n_per_cell = len(anchor_h)
+        layer = np.empty((fm_h * fm_w * n_per_cell, 4), dtype=np.float64)
+        layer[:, 0] = np.repeat((gx.reshape(-1) + options["anchor_offset_x"]) / fm_w, n_per_cell)
+        layer[:, 1] = np.repeat((gy.reshape(-1) + options["anchor_offset_y"]) / fm_h, n_per_cell)
+        if options["fixed_anchor_size"]:
+            layer[:, 2:] = 1.0
+        else:
+            layer[:, 2] = np.tile(anchor_w, fm_h * fm_w)
+            layer[:, 3] = np.tile(anchor_h, fm_h * fm_w)
+        layers.append(layer)
         layer_id = last_same
-    return np.array(anchors, dtype=np.float32)  # [2254,4]
+    return np.concatenate(layers, axis=0).astype(np.float32)  # [2254,4]
+
+
+_DEFAULT_ANCHORS: np.ndarray | None = None
+
+
+def default_pose_det_anchors() -> np.ndarray:
+    """Process-wide cached anchors for POSE_DET_ANCHOR_OPTIONS (read-only)."""
+    global _DEFAULT_ANCHORS
+    if _DEFAULT_ANCHORS is None:
+        anchors = generate_pose_det_anchors()
+        anchors.setflags(write=False)
+        _DEFAULT_ANCHORS = anchors
+    return _DEFAULT_ANCHORS
+
+
+def _logit(p: float) -> float:
+    """Inverse sigmoid, so score thresholds can be applied to raw logits."""
+    if p <= 0.0:
+        return -math.inf
+    if p >= 1.0:
+        return math.inf
+    return math.log(p / (1.0 - p))
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -80, 80)))
+
+
+def decode_det_boxes(raw_boxes_nx12: np.ndarray, anchors_nx4: np.ndarray, scale: float = 224.0) -> np.ndarray:
+    """Decode raw detector regressors for the given anchors.
+    Returns [N,6,2] => [box_min, box_max, mid_hip, full_body, kp2, kp3] in [0,1].
+    """
+    num_points = raw_boxes_nx12.shape[-1] // 2  # 6 points => center/size + keypoints
+    boxes = raw_boxes_nx12.reshape(-1, num_points, 2).astype(np.float32) / scale
+    # Center and keypoints are offsets from the anchor position; size is not
+    boxes[:, 0] += anchors_nx4[:, :2]
+    boxes[:, 2:] += anchors_nx4[:, None, :2]
+    # Convert center/size to corners
+    center = boxes[:, 0].copy()
+    half_size = boxes[:, 1] / 2.0
+    boxes[:, 0] = center - half_size  # xmin,ymin
+    boxes[:, 1] = center + half_size  # xmax,ymax
+    return boxes
+
+
+def _det_to_dict(score: float, box_kps: np.ndarray) -> dict:
+    return dict(
+        score=float(score),
+        box=box_kps[0:2, :].reshape(4),    # xmin,ymin,xmax,ymax in [0,1] of 256x256 frame
+        mid_hip=box_kps[2].reshape(2),     # [0,1]
+        size_rot=box_kps[3].reshape(2),    # [0,1]
+    )
+
+
+# ------------------------------------------------------------
+# Quantization-aware tensor I/O
+# ------------------------------------------------------------
+QuantParams = Tuple[float, int]  # (scale, zero_point); scale == 0 means float tensor
+
+
+def _quant_params(detail: dict) -> QuantParams:
+    scale, zero_point = detail.get("quantization", (0.0, 0))
+    if not np.issubdtype(np.dtype(detail["dtype"]), np.integer):
+        return 0.0, 0
+    return float(scale), int(zero_point)
+
+
+def _input_lut(detail: dict, alpha: float, beta: float) -> np.ndarray:
+    """256-entry lookup table mapping a uint8 pixel p to the model input value.
+    The model expects alpha * p + beta; for int8/uint8 inputs this is folded into
+    the tensor's quantization params, so preprocessing is one uint8 -> dtype gather.
+    """
+    dtype = np.dtype(detail["dtype"])
+    vals = alpha * np.arange(256, dtype=np.float64) + beta
+    scale, zero_point = _quant_params(detail)
+    if scale == 0.0:
+        return vals.astype(dtype)
+    info = np.iinfo(dtype)
+    q = np.round(vals / scale) + zero_point
+    return np.clip(q, info.min, info.max).astype(dtype)
+
+
+def _dequantize(arr: np.ndarray, qp: QuantParams) -> np.ndarray:
+    """Dequantize an output slice; float tensors are returned as-is (no copy)."""
+    scale, zero_point = qp
+    if scale == 0.0:
+        return arr
+    return (arr.astype(np.float32) - zero_point) * scale
 
 
 # ------------------------------------------------------------
 # Detection stage (TFLite + Ethos-U delegate)
 # ------------------------------------------------------------
+def _open_interpreter(model_path: str, ethosu_delegate: str | None = None, backend: str | None = None):
+    """Interpreter with tensors allocated.
+    backend:
+      None        -> Ethos-U delegate when it loads, default CPU interpreter otherwise
+      "ethosu"    -> Ethos-U delegate, raises if it cannot be loaded
+      "cpu:N"     -> builtin CPU kernels with N threads, XNNPACK disabled
+      "xnnpack:N" -> XNNPACK with N threads; raises if XNNPACK does not take over any part
+                     of the graph (runtime built without it, or no op it supports)
+    """
+    global TFLiteInterpreter, load_delegate
+    if TFLiteInterpreter is None:
+        from tflite_runtime.interpreter import Interpreter as TFLiteInterpreter
+    if load_delegate is None and ethosu_delegate:
+        from tflite_runtime.interpreter import load_delegate
+    kind, _, threads = (backend or "").partition(":")
+    kwargs = {}
+    delegates = []
+    if kind == "ethosu":
+        if not ethosu_delegate:
+            raise ValueError("backend 'ethosu' requires an Ethos-U delegate path")
+        delegates = [load_delegate(ethosu_delegate, {})]
+    elif kind in ("cpu", "xnnpack"):
+        kwargs["num_threads"] = int(threads) if threads else 1
+        if kind == "cpu":
+            from tflite_runtime.interpreter import OpResolverType
+            kwargs["experimental_op_resolver_type"] = OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    elif kind:
+        raise ValueError(f"Unknown backend: {backend}")
+    elif ethosu_delegate:
+        try:
+            delegates = [load_delegate(ethosu_delegate, {})]
+        except Exception as e:
+            print(f"[WARN] Failed to load Ethos-U delegate: {e}. Falling back to CPU.")
+            delegates = []
+    interp = TFLiteInterpreter(model_path=model_path, experimental_delegates=delegates, **kwargs)
+    interp.allocate_tensors()
+    if kind == "xnnpack" and not _default_delegate_applied(interp):
+        raise RuntimeError(f"XNNPACK not applied to {os.path.basename(model_path)} "
+                           f"(TFLite runtime built without it, or no supported op)")
+    return interp
+
+
+def _default_delegate_applied(interp) -> bool:
+    """True if the op resolver's default delegate (XNNPACK, in runtimes built with it) took over
+    part of the graph: allocate_tensors then appends a DELEGATE node to the execution plan."""
+    ops_details = getattr(interp, "_get_ops_details", None)
+    if ops_details is None:
+        return False
+    try:
+        return any(op.get("op_name") == "DELEGATE" for op in ops_details())
+    except Exception:
+        return False
+
+
 class PoseDetector:
-    def __init__(self, model_path: str, ethosu_delegate: str | None = "libethosu_delegate.so"):
-        delegates = []
-        if ethosu_delegate:
-            try:
-                delegates = [load_delegate(ethosu_delegate, {})]
-            except Exception as e:
-                print(f"[WARN] Failed to load Ethos-U delegate: {e}. Falling back to CPU.")
-                delegates = []
-        self.interp = TFLiteInterpreter(model_path=model_path, experimental_delegates=delegates)
-        self.interp.allocate_tensors()
+    def __init__(self, model_path: str, ethosu_delegate: str | None = "libethosu_delegate.so", backend: str | None = None):
+        self.backend = backend  # see _open_interpreter; None = delegate with CPU fallback
+        self.interp = _open_interpreter(model_path, ethosu_delegate, backend)
         self.inp = self.interp.get_input_details()[0]
         outs = self.interp.get_output_details()
         # Identify outputs by size: scores [N,2254,1], boxes [N,2254,12]
         self.out_scores = min(outs, key=lambda d: np.prod(d["shape"]))
         self.out_boxes  = max(outs, key=lambda d: np.prod(d["shape"]))
-        self.anchors = generate_pose_det_anchors()
+        self.anchors = default_pose_det_anchors()
         assert self.anchors.shape[0] == self.out_scores["shape"][1], "Anchor count mismatch"
-
-    @staticmethod
-    def _preprocess(img_256_rgb: np.ndarray) -> np.ndarray:
-        x = cv2.resize(img_256_rgb, (224, 224))
-        x = (x.astype(np.float32) / 255.0 - 0.5) * 2.0  # [-1,1]
-        return np.expand_dims(x, 0)
-
-    def infer(self, img_256_rgb: np.ndarray, score_thresh: float = 0.5, nms_thresh: float = 0.3):
-        inp = self._preprocess(img_256_rgb)
-        self.interp.set_tensor(self.inp["index"], inp)
+        # Input normalization to [-1,1] folded into a uint8 -> input dtype table
+        self._in_lut = _input_lut(self.inp, 2.0 / 255.0, -1.0)
+        self._scores_q = _quant_params(self.out_scores)
+        self._boxes_q = _quant_params(self.out_boxes)
+        # Zero-copy tensor access: accessors returning views into the interpreter's buffers
+        self._input = self.interp.tensor(self.inp["index"])
+        self._scores = self.interp.tensor(self.out_scores["index"])
+        self._boxes = self.interp.tensor(self.out_boxes["index"])
+        self._in_hw = (int(self.inp["shape"][1]), int(self.inp["shape"][2]))
+        self._resize_buf = np.empty(self._in_hw + (3,), dtype=np.uint8)
+
+    def _preprocess(self, img_256_rgb: np.ndarray):
+        """Resize (if needed) and normalize/quantize straight into the input tensor."""
+        x = img_256_rgb
+        if x.shape[:2] != self._in_hw:
+            x = cv2.resize(x, self._in_hw[::-1], dst=self._resize_buf)
+        cv2.LUT(x, self._in_lut, dst=self._input()[0])
+
+    def _run(self, img_256_rgb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Invoke the detector and return raw (score logits [2254], regressors [2254,12]).
+        Both are views into the interpreter and are only valid until the next invoke.
+        """
+        self._preprocess(img_256_rgb)
         self.interp.invoke()
-        raw_scores = self.interp.get_tensor(self.out_scores["index"])  # [1,2254,1]
-        raw_boxes  = self.interp.get_tensor(self.out_boxes["index"])   # [1,2254,12]
-        scores = 1.0 / (1.0 + np.exp(-np.clip(raw_scores, -80, 80)))
-        dets = self._decode_boxes(raw_boxes[0])  # [2254, num_points(=6),2] -> boxes & 2 keypoints
-        # Filter scores
-        mask = (scores[0,:,0] > score_thresh)
-        boxes_kps = dets[mask]
-        sc = scores[0, mask, 0]
-        # NMS by IoU on boxes
-        keep = nms_iou(boxes_kps[:,0:2,:].reshape(-1,4), sc, nms_thresh)
-        boxes_kps = boxes_kps[keep]
-        sc = sc[keep]
-        # Return best only (single person)
-        if boxes_kps.shape[0] == 0:
+        return self._scores().reshape(-1), self._boxes()[0]
+
+    def infer(self, img_256_rgb: np.ndarray, score_thresh: float = 0.5, nms_thresh: float = 0.3, timer=None):
+        """Single-person fast path: best detection or None.
+        The best detection always survives NMS, so only the argmax anchor is decoded.
+        timer (anything with add(stage, seconds)) receives detector_invoke / detector_decode.
+        """
+        t0 = time.perf_counter() if timer is not None else 0.0
+        raw_scores, raw_boxes = self._run(img_256_rgb)
+        if timer is None:
+            return self.postprocess_single(raw_scores, raw_boxes, score_thresh)
+        t1 = time.perf_counter()
+        det = self.postprocess_single(raw_scores, raw_boxes, score_thresh)
+        timer.add("detector_invoke", t1 - t0)
+        timer.add("detector_decode", time.perf_counter() - t1)
+        return det
+
+    def infer_all(self, img_256_rgb: np.ndarray, score_thresh: float = 0.5, nms_thresh: float = 0.3,
+                  top_k: int = 100, max_detections: int | None = None, weighted: bool = False, timer=None) -> List[dict]:
+        """Multi-candidate mode: all post-NMS detections, highest score first."""
+        t0 = time.perf_counter() if timer is not None else 0.0
+        raw_scores, raw_boxes = self._run(img_256_rgb)
+        t1 = time.perf_counter() if timer is not None else 0.0
+        dets = self.postprocess_multi(raw_scores, raw_boxes, score_thresh, nms_thresh, top_k, max_detections, weighted)
+        if timer is not None:
+            timer.add("detector_invoke", t1 - t0)
+            timer.add("detector_decode", time.perf_counter() - t1)
+        return dets
+
+    def postprocess_single(self, raw_scores: np.ndarray, raw_boxes: np.ndarray, score_thresh: float = 0.5):
+        # Dequantization is monotonic, so argmax works on the raw tensor
+        raw = raw_scores.reshape(-1)
+        best = int(np.argmax(raw))
+        logit = float(_dequantize(raw[best:best + 1], self._scores_q)[0])
+        # Threshold in logit space so the "no person" case exits before any decode
+        if not logit > _logit(score_thresh):
             return None
-        best = 0
-        box_xyxy = boxes_kps[best, 0:2, :].reshape(4)    # xmin,ymin,xmax,ymax in [0,1] of 256x256 frame
-        mid_hip   = boxes_kps[best, 2].reshape(2)         # [0,1]
-        full_body = boxes_kps[best, 3].reshape(2)         # [0,1]
-        return dict(score=float(sc[best]), box=box_xyxy, mid_hip=mid_hip, size_rot=full_body)
+        box_raw = _dequantize(raw_boxes[best:best + 1], self._boxes_q)
+        box_kps = decode_det_boxes(box_raw, self.anchors[best:best + 1])[0]
+        return _det_to_dict(_sigmoid(logit), box_kps)
+
+    def postprocess_multi(self, raw_scores: np.ndarray, raw_boxes: np.ndarray, score_thresh: float = 0.5,
+                          nms_thresh: float = 0.3, top_k: int = 100, max_detections: int | None = None,
+                          weighted: bool = False) -> List[dict]:
+        logits = _dequantize(raw_scores.reshape(-1), self._scores_q)
+        cand = np.nonzero(logits > _logit(score_thresh))[0]
+        if cand.size == 0:
+            return []
+        # Decode only the top-k survivors
+        if top_k and cand.size > top_k:
+            cand = cand[np.argpartition(-logits[cand], top_k - 1)[:top_k]]
+        cand = cand[np.argsort(-logits[cand], kind="stable")]
+        sc = _sigmoid(logits[cand].astype(np.float32))
+        boxes_kps = decode_det_boxes(_dequantize(raw_boxes[cand], self._boxes_q), self.anchors[cand])
+        if weighted:
+            boxes_kps, sc = weighted_nms(boxes_kps, sc, nms_thresh)
+        else:
+            keep = nms_iou(boxes_kps[:, 0:2, :].reshape(-1, 4), sc, nms_thresh)
+            boxes_kps, sc = boxes_kps[keep], sc[keep]
+        if max_detections is not None:
+            boxes_kps, sc = boxes_kps[:max_detections], sc[:max_detections]
+        return [_det_to_dict(s, bk) for s, bk in zip(sc, boxes_kps)]
 
     def _decode_boxes(self, raw_boxes_2254x12: np.ndarray) -> np.ndarray:
         # Following models/preprocess_data.py logic from imx-smart-fitness
-        scale = 224.0
-        num_points = raw_boxes_2254x12.shape[-1] // 2  # 6 points => center/size + 2 keypoints
-        boxes = raw_boxes_2254x12.reshape(-1, num_points, 2).astype(np.float32) / scale
-        # Adjust to anchor positions for center and keypoints
-        boxes[:, 0] += self.anchors[:, :2]  # center x,y
-        for i in range(2, num_points):
-            boxes[:, i] += self.anchors[:, :2]  # keypoints
-        # Convert center/size to corners
-        center = np.array(boxes[:, 0])
-        half_size = boxes[:, 1] / 2.0
-        boxes[:, 0] = center - half_size  # xmin,ymin
-        boxes[:, 1] = center + half_size  # xmax,ymax
-        return boxes  # [2254, 6, 2] => [box_min, box_max, mid_hip, full_body]
+        return decode_det_boxes(_dequantize(raw_boxes_2254x12, self._boxes_q), self.anchors)  # [2254, 6, 2]
 
 
 # ------------------------------------------------------------
 # Landmark stage (TFLite + Ethos-U delegate)
 # ------------------------------------------------------------
 class PoseLandmarkerLite:
-    def __init__(self, model_path: str, ethosu_delegate: str | None = "libethosu_delegate.so"):
-        delegates = []
-        if ethosu_delegate:
-            try:
-                delegates = [load_delegate(ethosu_delegate, {})]
-            except Exception as e:
-                print(f"[WARN] Failed to load Ethos-U delegate: {e}. Falling back to CPU.")
-                delegates = []
-        self.interp = TFLiteInterpreter(model_path=model_path, experimental_delegates=delegates)
-        self.interp.allocate_tensors()
+    def __init__(self, model_path: str, ethosu_delegate: str | None = "libethosu_delegate.so", backend: str | None = None):
+        self.backend = backend  # see _open_interpreter; None = delegate with CPU fallback
+        self.interp = _open_interpreter(model_path, ethosu_delegate, backend)
         self.inp = self.interp.get_input_details()[0]
         self.outs = self.interp.get_output_details()
-
-    @staticmethod
-    def _preprocess(img_roi_rgb: np.ndarray) -> np.ndarray:
-        x = cv2.resize(img_roi_rgb, (256, 256)).astype(np.float32) / 255.0  # [0,1]
-        return np.expand_dims(x, 0)
-
-    def _find_heatmap(self) -> np.ndarray | None:
-        """Try to locate heatmap tensor in outputs. Expect HxWxC with C in {33,39}. Returns array HxWxC or None."""
-        for o in self.outs:
-            arr = self.interp.get_tensor(o["index"])
-            shape = arr.shape
-            # Prefer BHWC
-            if arr.ndim == 4 and shape[0] == 1 and shape[-1] in (33, 39) and (shape[1] * shape[2] >= 1024):
-                return arr[0]
-            # HWC
-            if arr.ndim == 3 and shape[-1] in (33, 39) and (shape[0] * shape[1] >= 1024):
-                return arr
-        return None
-
-    def infer(self, img_roi_rgb: np.ndarray):
-        inp = self._preprocess(img_roi_rgb)
-        self.interp.set_tensor(self.inp["index"], inp)
+        # Input normalization to [0,1] folded into a uint8 -> input dtype table
+        self._in_lut = _input_lut(self.inp, 1.0 / 255.0, 0.0)
+        self._in_hw = (int(self.inp["shape"][1]), int(self.inp["shape"][2]))
+        self._resize_buf = np.empty(self._in_hw + (3,), dtype=np.uint8)
+        self._input = self.interp.tensor(self.inp["index"])
+        # Output roles resolved once; each role is (accessor to a zero-copy view, layout, quant params)
+        self._roles = self._resolve_output_roles(self.outs)
+        # Heatmap refinement of the image landmarks (off only to measure its effect)
+        self.refine = True
+
+    def _resolve_output_roles(self, outs: List[dict]) -> dict:
+        """Identify outputs by shape. MediaPipe BlazePose Lite/Full typically returns:
+        - 195: image landmarks (39 x 5: x,y,z,visibility,presence)
+        - 117: world landmarks (39 x 3)
+        -   1: presence scalar
+        - 1xHxWx39: heatmap logits
+        Some variants return 165 (33 x 5) or 99 (33 x 3), or a 33-channel heatmap.
+        """
+        by_size = {int(np.prod(o["shape"])): o for o in outs}
+
+        def role(detail, rows, cols):
+            return (self.interp.tensor(detail["index"]), (rows, cols), _quant_params(detail))
+
+        roles: dict = {"landmarks": None, "world": None, "presence": None, "heatmap": None}
+        for size, rows, cols in ((195, 39, 5), (165, 33, 5), (99, 33, 3)):
+            if size in by_size:
+                roles["landmarks"] = role(by_size[size], rows, cols)
+                break
+        for size, rows in ((117, 39), (99, 33)):
+            if size in by_size:
+                roles["world"] = role(by_size[size], rows, 3)
+                break
+        if 1 in by_size:
+            roles["presence"] = role(by_size[1], 1, 1)
+        for o in outs:
+            shape = tuple(int(v) for v in o["shape"])
+            # Prefer BHWC, else HWC
+            if len(shape) == 4 and shape[0] == 1 and shape[-1] in (33, 39) and shape[1] * shape[2] >= 1024:
+                roles["heatmap"] = role(o, shape[1], shape[2])
+                break
+            if len(shape) == 3 and shape[-1] in (33, 39) and shape[0] * shape[1] >= 1024:
+                roles["heatmap"] = role(o, shape[0], shape[1])
+                break
+        return roles
+
+    def _preprocess(self, img_roi_rgb: np.ndarray):
+        """Resize (if needed) and normalize/quantize straight into the input tensor."""
+        x = img_roi_rgb
+        if x.shape[:2] != self._in_hw:
+            x = cv2.resize(x, self._in_hw[::-1], dst=self._resize_buf)
+        cv2.LUT(x, self._in_lut, dst=self._input()[0])
+
+    def _heatmap_view(self):
+        """Zero-copy HxWxC heatmap view and its quant params, or (None, None)."""
+        hm = self._roles["heatmap"]
+        if hm is None:
+            return None, None
+        get, (h, w), q = hm
+        arr = get()
+        return arr.reshape(h, w, arr.shape[-1]), q
+
+    def infer(self, img_roi_rgb: np.ndarray, return_aux: bool = False, timer=None):
+        """Returns (lmks_img, lmks_world, kp_scores, presence).
+        With return_aux=True a fifth item is appended: the auxiliary alignment landmarks
+        [2,2] (hip center, full-body scale/rotation point) in ROI-normalized coords,
+        or None when the model only outputs 33 landmarks.
+        Outputs are read through views of the interpreter tensors; only the used
+        slices are copied out (and dequantized), the heatmap is never copied.
+        timer (anything with add(stage, seconds)) receives landmark_invoke and
+        refine (output decoding + heatmap refinement).
+        """
+        t0 = time.perf_counter() if timer is not None else 0.0
+        self._preprocess(img_roi_rgb)
         self.interp.invoke()
-        # Identify outputs by total element count. MediaPipe BlazePose Lite typically returns:
-        # - 195: image landmarks (39 x 5: x,y,z,visibility,presence)
-        # - 117: world landmarks (39 x 3)
-        # -   1: presence scalar
-        # Some variants return 165 (33 x 5) or 99 (33 x 3).
-        out_tensors = {int(np.prod(o["shape"])): self.interp.get_tensor(o["index"]) for o in self.outs}
+        t1 = time.perf_counter() if timer is not None else 0.0
+        roles = self._roles
 
         lmks_img = np.zeros((33, 3), dtype=np.float32)
         kp_scores = None  # per-keypoint score if available
+        aux_img = None  # landmarks 33/34: alignment points used for ROI tracking
         # Image landmarks parsing
-        if 195 in out_tensors:
-            vec = out_tensors[195].reshape(-1)
-            if vec.size == 195:
-                arr = vec.reshape(39, 5)
-                lmks_img = arr[:33, :3].astype(np.float32)
-                kp_scores = arr[:33, 4].astype(np.float32)  # presence per keypoint
-        elif 165 in out_tensors:
-            arr = out_tensors[165].reshape(33, 5)
-            lmks_img = arr[:, :3].astype(np.float32)
-            kp_scores = arr[:, 4].astype(np.float32)
-        elif 99 in out_tensors:
-            lmks_img = out_tensors[99].reshape(33, 3).astype(np.float32)
-            kp_scores = None
+        if roles["landmarks"] is not None:
+            get, (rows, cols), q = roles["landmarks"]
+            arr = get().reshape(rows, cols)
+            lmks_img = np.array(_dequantize(arr[:33, :3], q), dtype=np.float32)
+            if cols == 5:
+                kp_scores = np.array(_dequantize(arr[:33, 4], q), dtype=np.float32)  # presence per keypoint
+            if return_aux and rows > 33:
+                aux_img = np.array(_dequantize(arr[33:35, :2], q), dtype=np.float32)
 
         # World landmarks parsing
-        if 117 in out_tensors:
-            lmks_world = out_tensors[117].reshape(39, 3).astype(np.float32)[:33]
-        elif 99 in out_tensors:
-            lmks_world = out_tensors[99].reshape(33, 3).astype(np.float32)
+        if roles["world"] is not None:
+            get, (rows, cols), q = roles["world"]
+            lmks_world = np.array(_dequantize(get().reshape(rows, cols)[:33], q), dtype=np.float32)
         else:
             lmks_world = np.zeros((33, 3), dtype=np.float32)
 
         # Presence scalar (pose presence)
-        presence_scalar = float(out_tensors[1].reshape(-1)[0]) if 1 in out_tensors else 1.0
+        presence_scalar = 1.0
+        if roles["presence"] is not None:
+            get, _, q = roles["presence"]
+            presence_scalar = float(_dequantize(get().reshape(-1)[:1], q)[0])
 
         # Normalize image landmarks to [0,1] if model outputs pixels in [0,256]
-        if lmks_img.shape[0] == 33:
-            lmks_img = lmks_img.astype(np.float32)
-            # If typical value range looks like [0..256] for x,y, normalize; otherwise assume already normalized
-            if (lmks_img[:, :2].max() > 1.5):
-                lmks_img[:, :2] /= 256.0
-                # z is typically relative to input size 256 too
-                lmks_img[:, 2] /= 256.0
+        # If typical value range looks like [0..256] for x,y, normalize; otherwise assume already normalized
+        if (lmks_img[:, :2].max() > 1.5):
+            lmks_img[:, :2] /= 256.0
+            # z is typically relative to input size 256 too
+            lmks_img[:, 2] /= 256.0
+            if aux_img is not None:
+                aux_img /= 256.0
 
         # Heatmap refinement (MediaPipe's RefineLandmarksFromHeatmapCalculator)
-        heatmap = self._find_heatmap()
-        if heatmap is not None:
-            lmks_img = refine_landmarks_from_heatmap(lmks_img, heatmap, kernel_size=7, min_confidence=0.0)
-
+        heatmap, hm_q = self._heatmap_view()
+        if heatmap is not None and self.refine:
+            lmks_img = refine_landmarks_from_heatmap(lmks_img, heatmap, kernel_size=7, min_confidence=0.0, quant=hm_q)
+        del heatmap
+        if timer is not None:
+            timer.add("landmark_invoke", t1 - t0)
+            timer.add("refine", time.perf_counter() - t1)
+
+        if return_aux:
+            return lmks_img, lmks_world, kp_scores, presence_scalar, aux_img
         return lmks_img, lmks_world, kp_scores, presence_scalar
 
 
@@ -330,29 +614,59 @@ class PoseLandmarkerLite:
 # Geometry helpers
 # ------------------------------------------------------------
 
+def _pairwise_iou(boxes_xyxy: np.ndarray) -> np.ndarray:
+    """IoU matrix [N,N] for xyxy boxes."""
+    b = boxes_xyxy.astype(np.float32)
+    xx1 = np.maximum(b[:, None, 0], b[None, :, 0])
+    yy1 = np.maximum(b[:, None, 1], b[None, :, 1])
+    xx2 = np.minimum(b[:, None, 2], b[None, :, 2])
+    yy2 = np.minimum(b[:, None, 3], b[None, :, 3])
+    inter = np.maximum(0.0, xx2 - xx1) * np.maximum(0.0, yy2 - yy1)
+    area = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area[:, None] + area[None, :] - inter + 1e-8)
+
+
 def nms_iou(boxes_xyxy: np.ndarray, scores: np.ndarray, iou_thresh: float) -> List[int]:
-    order = scores.argsort()[::-1]
+    """Greedy NMS over a precomputed IoU matrix. Returns kept indices, best score first."""
+    if scores.shape[0] == 0:
+        return []
+    order = scores.argsort(kind="stable")[::-1]
+    iou = _pairwise_iou(boxes_xyxy[order])
+    suppressed = np.zeros(order.shape[0], dtype=bool)
     keep = []
-    while order.size > 0:
-        i = order[0]
-        keep.append(int(i))
-        if order.size == 1:
-            break
-        xx1 = np.maximum(boxes_xyxy[i,0], boxes_xyxy[order[1:],0])
-        yy1 = np.maximum(boxes_xyxy[i,1], boxes_xyxy[order[1:],1])
-        xx2 = np.minimum(boxes_xyxy[i,2], boxes_xyxy[order[1:],2])
-        yy2 = np.minimum(boxes_xyxy[i,3], boxes_xyxy[order[1:],3])
-        w = np.maximum(0.0, xx2 - xx1)
-        h = np.maximum(0.0, yy2 - yy1)
-        inter = w * h
-        area_i = (boxes_xyxy[i,2]-boxes_xyxy[i,0]) * (boxes_xyxy[i,3]-boxes_xyxy[i,1])
-        area_o = (boxes_xyxy[order[1:],2]-boxes_xyxy[order[1:],0]) * (boxes_xyxy[order[1:],3]-boxes_xyxy[order[1:],1])
-        iou = inter / (area_i + area_o - inter + 1e-8)
-        inds = np.where(iou <= iou_thresh)[0]
-        order = order[inds + 1]
+    for i in range(order.shape[0]):
+        if suppressed[i]:
+            continue
+        keep.append(int(order[i]))
+        suppressed |= iou[i] > iou_thresh
     return keep
 
 
+def weighted_nms(boxes_kps: np.ndarray, scores: np.ndarray, iou_thresh: float) -> Tuple[np.ndarray, np.ndarray]:
+    """MediaPipe-style weighted NMS on decoded [N,6,2] detections.
+    Each kept detection is the score-weighted average of the candidates it suppresses
+    (itself included) and keeps the cluster's top score.
+    """
+    if scores.shape[0] == 0:
+        return boxes_kps[:0], scores[:0]
+    order = scores.argsort(kind="stable")[::-1]
+    boxes_kps = boxes_kps[order]
+    scores = scores[order]
+    iou = _pairwise_iou(boxes_kps[:, 0:2, :].reshape(-1, 4))
+    remaining = np.ones(scores.shape[0], dtype=bool)
+    out_boxes, out_scores = [], []
+    for i in range(scores.shape[0]):
+        if not remaining[i]:
+            continue
+        cluster = remaining & (iou[i] > iou_thresh)
+        cluster[i] = True
+        w = scores[cluster]
+        out_boxes.append((boxes_kps[cluster] * w[:, None, None]).sum(axis=0) / w.sum())
+        out_scores.append(scores[i])
+        remaining &= ~cluster
+    return np.stack(out_boxes).astype(np.float32), np.asarray(out_scores, dtype=np.float32)
+
+
 def _normalize_radians(angle: float) -> float:
     return angle - 2 * math.pi * math.floor((angle - (-math.pi)) / (2 * math.pi))
 
@@ -456,13 +770,15 @@ def _roi_affine_from_rect(rect: dict, img_wh: Tuple[int,int], dst_size: int = 25
 
 
 
-def refine_landmarks_from_heatmap(lmks_img: np.ndarray, heatmap: np.ndarray, kernel_size: int = 7, min_confidence: float = 0.0) -> np.ndarray:
+def refine_landmarks_from_heatmap(lmks_img: np.ndarray, heatmap: np.ndarray, kernel_size: int = 7, min_confidence: float = 0.0,
+                                  quant: QuantParams = (0.0, 0)) -> np.ndarray:
     """Mirror of MediaPipe RefineLandmarksFromHeatmapCalculator.
     Args:
         lmks_img: [33,3] landmarks normalized to ROI input space [0,1].
         heatmap: HxWxC (or 1xHxWxC) heatmap logits where C in {33,39}. Uses first 33 channels.
         kernel_size: odd window size (MediaPipe uses 7).
         min_confidence: minimum max(sigmoid(heat)) in window to apply refinement.
+        quant: (scale, zero_point) of a quantized heatmap; only the gathered windows are dequantized.
     Returns:
         Refined lmks_img with updated x,y (z unchanged).
     """
@@ -478,38 +794,39 @@ def refine_landmarks_from_heatmap(lmks_img: np.ndarray, heatmap: np.ndarray, ker
         return lmks_img
     num = min(33, C)
     out = lmks_img.copy().astype(np.float32)
-    # Stable sigmoid
-    def _sigmoid(x):
-        return 1.0 / (1.0 + np.exp(-np.clip(x, -80.0, 80.0)))
-    hm_conf = _sigmoid(hm.astype(np.float32))
     half = kernel_size // 2
-    for i in range(num):
-        x = float(out[i, 0])
-        y = float(out[i, 1])
-        if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
-            continue
-        cx = int(x * W)
-        cy = int(y * H)
-        if cx < 0 or cx >= W or cy < 0 or cy >= H:
-            continue
-        x0 = max(0, cx - half)
-        x1 = min(W - 1, cx + half)
-        y0 = max(0, cy - half)
-        y1 = min(H - 1, cy + half)
-        patch = hm_conf[y0:y1+1, x0:x1+1, i]
-        if patch.size == 0:
-            continue
-        max_conf = float(patch.max())
-        sum_w = float(patch.sum())
-        if sum_w <= 0.0 or max_conf < min_confidence:
-            continue
-        # Weighted average of (x,y) pixel indices in the window
-        xs = np.arange(x0, x1 + 1, dtype=np.float32)[None, :]
-        ys = np.arange(y0, y1 + 1, dtype=np.float32)[:, None]
-        weighted_x = float((patch * xs).sum())
-        weighted_y = float((patch * ys).sum())
-        out[i, 0] = (weighted_x / sum_w) / float(W)
-        out[i, 1] = (weighted_y / sum_w) / float(H)
+    # Window centers; NaN / out-of-range landmarks are skipped like MediaPipe does
+    x = out[:num, 0]
+    y = out[:num, 1]
+    with np.errstate(invalid="ignore"):
+        in_range = (x >= 0.0) & (x <= 1.0) & (y >= 0.0) & (y <= 1.0)
+    cx = np.where(in_range, x * W, -1.0).astype(np.int64)
+    cy = np.where(in_range, y * H, -1.0).astype(np.int64)
+    valid = in_range & (cx < W) & (cy < H)
+    if not valid.any():
+        return out
+    idx = np.nonzero(valid)[0]
+    cx = cx[idx]
+    cy = cy[idx]
+    # Gather all kxk windows at once: [n,k] rows/cols, out-of-bounds cells masked to zero weight
+    offs = np.arange(-half, half + 1, dtype=np.int64)
+    xs = cx[:, None] + offs[None, :]
+    ys = cy[:, None] + offs[None, :]
+    x_ok = (xs >= 0) & (xs < W)
+    y_ok = (ys >= 0) & (ys < H)
+    patches = hm[np.clip(ys, 0, H - 1)[:, :, None], np.clip(xs, 0, W - 1)[:, None, :], idx[:, None, None]]
+    # Stable sigmoid on the gathered windows only
+    patches = _dequantize(patches, quant).astype(np.float32, copy=False)
+    conf = 1.0 / (1.0 + np.exp(-np.clip(patches, -80.0, 80.0)))
+    conf *= (y_ok[:, :, None] & x_ok[:, None, :])
+    sum_w = conf.sum(axis=(1, 2))
+    max_conf = conf.max(axis=(1, 2))
+    weighted_x = (conf.sum(axis=1) * xs).sum(axis=1)
+    weighted_y = (conf.sum(axis=2) * ys).sum(axis=1)
+    apply = (sum_w > 0.0) & (max_conf >= min_confidence)
+    sel = idx[apply]
+    out[sel, 0] = (weighted_x[apply] / sum_w[apply]) / float(W)
+    out[sel, 1] = (weighted_y[apply] / sum_w[apply]) / float(H)
     return out
 
 
@@ -547,47 +864,129 @@ def to_sample_json(keypoints_xyzc: np.ndarray, keypoints3d_xyzc: np.ndarray) ->
 
 
 # ------------------------------------------------------------
-# Main
+# Stream mode
 # ------------------------------------------------------------
-
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--image", required=True, help="Path to input image (JPEG/PNG)")
-    ap.add_argument("--det", required=True, help="Path to pose_detection_quant_vela.tflite")
-    ap.add_argument("--lmk", required=True, help="Path to pose_landmark_lite_quant_vela.tflite")
-    ap.add_argument("--out_img", default=None, help="Output annotated image path")
-    ap.add_argument("--out_json", default=None, help="Output JSON path")
-    ap.add_argument("--delegate", default="libethosu_delegate.so", help="Ethos-U delegate .so name or empty for CPU")
-    ap.add_argument("--score_thresh", type=float, default=0.5)
-    ap.add_argument("--nms_thresh", type=float, default=0.3)
-    args = ap.parse_args()
-
-    img_rgb = _load_image_any(args.image)
-    img_256, meta_letter = _letterbox_to_square_rgb(img_rgb, 256)
+def _decode_stream_frame(frame: "frame_sources.Frame", decode_min_side: int):
+    t0 = time.perf_counter()
+    if isinstance(frame.image, np.ndarray):
+        img_rgb, scale = frame.image, (1.0, 1.0)
+    elif decode_min_side > 0:
+        img_rgb, scale = _load_image_reduced(frame.image, decode_min_side)
+    else:
+        img_rgb, scale = _load_image_any(frame.image), (1.0, 1.0)
+    t1 = time.perf_counter()
+    img_det, meta_letter = preprocess.detector_input(img_rgb, 224)
+    return frame, img_rgb, scale, img_det, meta_letter, t1 - t0, time.perf_counter() - t1
+
+
+def iter_stream_poses(frames, detector: PoseDetector, landmarker: PoseLandmarkerLite, score_thresh: float = 0.5,
+                      nms_thresh: float = 0.3, decode_min_side: int = 0, latest_only: bool = False,
+                      timer: StageTimer | None = None):
+    """Yield one dict per frame: {"frame", "t", "keypoints", "keypoints3D"}.
+    Decoding and detector letterboxing of the next frame overlap inference of the
+    current one; at most two decoded frames are held in memory.
+    """
+    decoded = frame_sources.prefetch(frames, lambda fr: _decode_stream_frame(fr, decode_min_side),
+                                     depth=2, latest_only=latest_only)
+    for frame, img_rgb, scale, img_det, meta_letter, t_decode, t_prep in decoded:
+        if timer is not None:
+            timer.add("decode", t_decode)
+            timer.add("detector_input", t_prep)
+        res = estimate_pose(detector, landmarker, img_rgb, img_det, meta_letter, score_thresh, nms_thresh, timer,
+                            decode_scale=scale)
+        payload = {"keypoints": [], "keypoints3D": []} if res is None else to_sample_json(*res)
+        yield {"frame": frame.index, "t": round(float(frame.timestamp), 4), **payload}
+
+
+def run_stream(args, detector: PoseDetector, landmarker: PoseLandmarkerLite) -> dict:
+    """Video file, image sequence or MJPEG URL -> NDJSON (one line per processed frame).
+    Ctrl-C stops a live stream cleanly; the sustained-FPS summary goes to stderr.
+    """
+    live = frame_sources.is_stream_url(args.video[0])
+    frames = frame_sources.decimate(
+        frame_sources.open_source(args.video, sequence_fps=args.sequence_fps),
+        every=args.every, target_fps=args.target_fps, max_frames=args.max_frames,
+    )
+    out = sys.stdout if args.jsonl in (None, "-") else open(args.jsonl, "w", encoding="utf-8")
+    timer = StageTimer()
+    n = n_person = 0
+    start = time.perf_counter()
+    try:
+        for rec in iter_stream_poses(frames, detector, landmarker, args.score_thresh, args.nms_thresh,
+                                     args.decode_min_side, latest_only=live, timer=timer):
+            out.write(json.dumps(rec) + "\n")
+            if live:
+                out.flush()
+            n += 1
+            n_person += bool(rec["keypoints"])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    summary = {
+        "frames": n, "with_person": n_person, "seconds": elapsed,
+        "fps": (n / elapsed) if elapsed > 0 else 0.0, "stage_avg_ms": timer.averages_ms(),
+    }
+    print(f"Processed {n} frames in {elapsed:.2f}s ({summary['fps']:.2f} FPS sustained), {n_person} with person",
+          file=sys.stderr)
+    for stage, ms in summary["stage_avg_ms"].items():
+        print(f"  {stage:15s} {ms:8.2f} ms", file=sys.stderr)
+    return summary
+
+
+class StageTimer:
+    """Accumulates wall time per named stage (seconds)."""
+
+    def __init__(self):
+        self.totals: dict = {}
+        self.counts: dict = {}
+
+    def add(self, stage: str, seconds: float):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def averages_ms(self) -> dict:
+        return {k: 1e3 * v / max(1, self.counts[k]) for k, v in self.totals.items()}
+
+
+def estimate_pose(detector: PoseDetector, landmarker: PoseLandmarkerLite, img_rgb: np.ndarray,
+                  img_det: np.ndarray | None = None, meta_letter: Tuple[int, int, int, int] | None = None,
+                  score_thresh: float = 0.5, nms_thresh: float = 0.3, timer: StageTimer | None = None,
+                  decode_scale: Tuple[float, float] = (1.0, 1.0)):
+    """Run both stages on one RGB frame.
+    Returns (keypoints_xyzc [33,4] in original pixels, keypoints3d_xyzc [33,4]) or None if no person.
+    img_det/meta_letter may be precomputed with preprocess.detector_input (e.g. on a worker thread).
+    decode_scale maps img_rgb pixels to original pixels (the scale returned by _load_image_reduced).
+    """
+    clock = time.perf_counter
+    t0 = clock()
+    if img_det is None or meta_letter is None:
+        # Letterbox + resize in one warp; detections are normalized to the letterboxed square
+        img_det, meta_letter = preprocess.detector_input(img_rgb, 224)
 
     # Stage 1: detector
-    detector = PoseDetector(args.det, ethosu_delegate=(args.delegate or None))
-    det = detector.infer(img_256, score_thresh=args.score_thresh, nms_thresh=args.nms_thresh)
+    t1 = clock()
+    det = detector.infer(img_det, score_thresh=score_thresh, nms_thresh=nms_thresh)
+    t2 = clock()
+    if timer is not None:
+        timer.add("detector_input", t1 - t0)
+        timer.add("detect", t2 - t1)
     if det is None:
-        print("No person detected. Saving original image and empty JSON.")
-        out_img = args.out_img or os.path.splitext(args.image)[0] + "_annotated.png"
-        out_json = args.out_json or os.path.splitext(args.image)[0] + "_landmarks.json"
-        cv2.imwrite(out_img, cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR))
-        with open(out_json, "w") as f:
-            json.dump({"keypoints": [], "keypoints3D": []}, f, indent=2)
-        return
+        return None
 
     # MediaPipe-identical ROI: AlignmentPointsRectsCalculator + RectTransformationCalculator
     rect0 = _compute_roi_normrect_256(det["mid_hip"], det["size_rot"])  # on 256x256 frame
     rect = _rect_transform_norm(rect0, (256, 256), scale_x=1.25, scale_y=1.25, square_long=True)
 
-    # Crop ROI with affine warp (BORDER_REPLICATE), destination 256x256
-    M_affine, _ = _roi_affine_from_rect(rect, (256, 256), dst_size=256)
-    roi_rgb = cv2.warpAffine(img_256, M_affine, (256, 256), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    # Crop ROI from the full-resolution frame with one affine warp (BORDER_REPLICATE), destination 256x256
+    roi_rgb = preprocess.roi_input(img_rgb, rect, meta_letter, 256)
+    t3 = clock()
 
     # Stage 2: landmark
-    landmarker = PoseLandmarkerLite(args.lmk, ethosu_delegate=(args.delegate or None))
     lm_img, lm_world, kp_scores, presence = landmarker.infer(roi_rgb)
+    t4 = clock()
     # Apply sigmoid to logits if needed (some models output raw presence values)
     sigmoid = lambda x: 1.0 / (1.0 + np.exp(-x))
     if kp_scores is not None:
@@ -598,57 +997,212 @@ def main():
     if lm_img.shape[0] == 33 and (lm_img[:, :2].max() > 1.5):
         lm_img = lm_img.astype(np.float32) / 256.0
 
-    # Project ROI-normalized landmarks back to 256x256 padded frame using MediaPipe matrix
-    proj_mat = _get_rotated_subrect_to_rect_matrix(rect, (256, 256))  # 4x4
-    pts = lm_img[:, :2].astype(np.float32)
-    x_norm = pts[:, 0] * proj_mat[0, 0] + pts[:, 1] * proj_mat[0, 1] + proj_mat[0, 3]
-    y_norm = pts[:, 0] * proj_mat[1, 0] + pts[:, 1] * proj_mat[1, 1] + proj_mat[1, 3]
-    x_256 = (x_norm * 256.0)
-    y_256 = (y_norm * 256.0)
-    pts_256 = np.stack([x_256, y_256], axis=1)
-
-    # Map from 256 padded frame back to original image via inverse letterbox
-    pts_orig = np.array([_inv_letterbox_coords(float(x), float(y), meta_letter, 256) for x, y in pts_256], dtype=np.float32)
-    # Clamp to image bounds to avoid drawing outside canvas
-    H0, W0 = img_rgb.shape[:2]
-    pts_orig[:, 0] = np.clip(pts_orig[:, 0], 0, W0 - 1)
-    pts_orig[:, 1] = np.clip(pts_orig[:, 1], 0, H0 - 1)
-
-    # Compose output arrays
-    if lm_img.shape[1] >= 3:
-        z_scale = _calc_z_scale(proj_mat)
-        z_img = (lm_img[:, 2].astype(np.float32) * float(z_scale))
-    else:
-        z_img = np.zeros((33,), np.float32)
     # Prefer per-keypoint scores if available; otherwise use presence scalar
     if kp_scores is not None and kp_scores.shape[0] == 33:
         c = kp_scores.astype(np.float32)
     else:
         c = np.full((33,), float(presence), dtype=np.float32)
 
+    # ROI -> letterboxed square -> original pixels as one composed affine (z scaled like MediaPipe,
+    # reduced-decode scale folded in), clamped to the original image bounds
+    h, w = img_rgb.shape[:2]
+    clip_hw = (int(round(h * decode_scale[1])), int(round(w * decode_scale[0])))
+    keypoints_xyzc = transform.project_landmarks(lm_img, rect, meta_letter, decode_scale, scores=c, clip_hw=clip_hw)
+
     # For 3D, use world landmarks directly; keep same score vector
     lm_world = lm_world.astype(np.float32)
-    keypoints_xyzc = np.zeros((33, 4), dtype=np.float32)
-    keypoints_xyzc[:, 0:2] = pts_orig
-    keypoints_xyzc[:, 2] = z_img
-    keypoints_xyzc[:, 3] = c
-
     keypoints3d_xyzc = np.zeros((33, 4), dtype=np.float32)
     keypoints3d_xyzc[:, 0:3] = lm_world
     keypoints3d_xyzc[:, 3] = c
+    if timer is not None:
+        timer.add("roi_warp", t3 - t2)
+        timer.add("landmark", t4 - t3)
+        timer.add("project", clock() - t4)
+    return keypoints_xyzc, keypoints3d_xyzc
 
-    # Draw on original image
+
+def render_annotated(img_rgb: np.ndarray, keypoints_xyzc: np.ndarray | None) -> np.ndarray:
+    """BGR copy of the frame with the skeleton drawn (unchanged frame if no person)."""
     img_bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
-    keypoints_list = [
-        {"name": LANDMARK_NAMES[i], "x": float(keypoints_xyzc[i,0]), "y": float(keypoints_xyzc[i,1]), "z": float(keypoints_xyzc[i,2]), "score": float(keypoints_xyzc[i,3])}
-        for i in range(33)
-    ]
-    draw_skeleton(img_bgr, keypoints_list)
+    if keypoints_xyzc is not None:
+        draw_skeleton(img_bgr, transform.keypoints_to_dicts(keypoints_xyzc, LANDMARK_NAMES, with_z=True))
+    return img_bgr
+
 
-    # Save outputs
+# ------------------------------------------------------------
+# Batch mode
+# ------------------------------------------------------------
+def expand_inputs(items: List[str]) -> List[str]:
+    """Directories (non-recursive), glob patterns, plain paths and @filelist entries -> image paths."""
+    return frame_sources.expand_image_paths(items)
+
+
+def _prepare_frame(path: str, decode_min_side: int):
+    """CPU-side work for one image, run on the worker pool ahead of the NPU."""
+    t0 = time.perf_counter()
+    if decode_min_side > 0:
+        img_rgb, scale = _load_image_reduced(path, decode_min_side)
+    else:
+        img_rgb, scale = _load_image_any(path), (1.0, 1.0)
+    t1 = time.perf_counter()
+    img_det, meta_letter = preprocess.detector_input(img_rgb, 224)
+    return img_rgb, scale, img_det, meta_letter, t1 - t0, time.perf_counter() - t1
+
+
+def run_batch(args, detector: PoseDetector, landmarker: PoseLandmarkerLite) -> dict:
+    """Process many images with the models loaded once.
+    Decode + detector preprocessing run on a thread pool (prefetching up to 2x workers
+    frames) while the main thread drives the interpreters; annotated rendering, when
+    enabled, runs on its own thread off the critical path.
+    With --annotate, images decode at full resolution so the annotated output keeps it.
+    """
+    paths = expand_inputs(args.inputs)
+    decode_min_side = 0 if args.annotate else args.decode_min_side
+    if decode_min_side != args.decode_min_side:
+        print("[INFO] --annotate: decoding at full resolution (--decode_min_side ignored)", file=sys.stderr)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    timer = StageTimer()
+    jsonl = open(args.jsonl, "w", encoding="utf-8") if args.jsonl else None
+    renderer = ThreadPoolExecutor(max_workers=1) if args.annotate else None
+    render_futures = []
+    n_ok = n_empty = n_fail = 0
+    start = time.perf_counter()
+
+    def out_path(path: str, suffix: str) -> str:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        base = os.path.join(args.out_dir, stem) if args.out_dir else os.path.splitext(path)[0]
+        return base + suffix
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        pending = deque()
+        it = iter(paths)
+        for path in itertools.islice(it, 2 * max(1, args.workers)):
+            pending.append((path, pool.submit(_prepare_frame, path, decode_min_side)))
+        while pending:
+            path, fut = pending.popleft()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append((nxt, pool.submit(_prepare_frame, nxt, decode_min_side)))
+            try:
+                img_rgb, scale, img_det, meta_letter, t_decode, t_prep = fut.result()
+                timer.add("decode", t_decode)
+                timer.add("detector_input", t_prep)
+                res = estimate_pose(detector, landmarker, img_rgb, img_det, meta_letter,
+                                    args.score_thresh, args.nms_thresh, timer, decode_scale=scale)
+            except Exception as e:
+                print(f"[WARN] {path}: {e}")
+                n_fail += 1
+                continue
+            t0 = time.perf_counter()
+            if res is None:
+                payload = {"keypoints": [], "keypoints3D": []}
+                n_empty += 1
+            else:
+                payload = to_sample_json(*res)
+                n_ok += 1
+            if jsonl is not None:
+                jsonl.write(json.dumps({"image": path, **payload}) + "\n")
+            else:
+                with open(out_path(path, "_landmarks.json"), "w") as f:
+                    json.dump(payload, f, indent=2)
+            if renderer is not None:
+                kps = None if res is None else res[0]
+                render_futures.append(renderer.submit(
+                    lambda im, k, p: cv2.imwrite(p, render_annotated(im, k)),
+                    img_rgb, kps, out_path(path, "_annotated.png")))
+            timer.add("write", time.perf_counter() - t0)
+
+    elapsed = time.perf_counter() - start
+    if renderer is not None:
+        for f in render_futures:
+            f.result()
+        renderer.shutdown()
+    if jsonl is not None:
+        jsonl.close()
+    total = n_ok + n_empty + n_fail
+    summary = {
+        "images": total, "with_person": n_ok, "no_person": n_empty, "failed": n_fail,
+        "seconds": elapsed, "images_per_sec": (total / elapsed) if elapsed > 0 else 0.0,
+        "stage_avg_ms": timer.averages_ms(),
+    }
+    print(f"Processed {total} images in {elapsed:.2f}s ({summary['images_per_sec']:.2f} images/s): "
+          f"{n_ok} with person, {n_empty} without, {n_fail} failed")
+    for stage, ms in summary["stage_avg_ms"].items():
+        print(f"  {stage:15s} {ms:8.2f} ms")
+    return summary
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser()
+    src_group = ap.add_mutually_exclusive_group(required=True)
+    src_group.add_argument("--image", help="Path to input image (JPEG/PNG)")
+    src_group.add_argument("--inputs", nargs="+", help="Batch mode: directories, glob patterns, image paths or @filelist")
+    src_group.add_argument("--video", nargs="+",
+                           help="Stream mode: video file, MJPEG URL (e.g. http://cam:5000/video) or image sequence")
+    ap.add_argument("--det", required=True, help="Path to pose_detection_quant_vela.tflite")
+    ap.add_argument("--lmk", required=True, help="Path to pose_landmark_lite_quant_vela.tflite")
+    ap.add_argument("--out_img", default=None, help="Output annotated image path")
+    ap.add_argument("--out_json", default=None, help="Output JSON path")
+    ap.add_argument("--delegate", default="libethosu_delegate.so", help="Ethos-U delegate .so name or empty for CPU")
+    ap.add_argument("--backend", default=None,
+                    help="Interpreter backend: auto (benchmark candidates, cached per model), ethosu, cpu:N or xnnpack:N "
+                         "(default: Ethos-U delegate with CPU fallback)")
+    ap.add_argument("--score_thresh", type=float, default=0.5)
+    ap.add_argument("--nms_thresh", type=float, default=0.3)
+    # Batch mode options
+    ap.add_argument("--out_dir", default=None, help="Batch: directory for per-file outputs (default: next to each image)")
+    ap.add_argument("--jsonl", default=None,
+                    help="Batch: write all results to this JSON Lines file instead of per-file JSON; "
+                         "Stream: NDJSON destination (default '-' = stdout)")
+    ap.add_argument("--annotate", action="store_true", help="Batch: also render *_annotated.png (off the critical path)")
+    ap.add_argument("--workers", type=int, default=2, help="Batch: decode/preprocess threads")
+    ap.add_argument("--decode_min_side", type=int, default=0,
+                    help="Batch/Stream: JPEG reduced-resolution decode keeping the long side >= this "
+                         "(0 = full resolution; batch ignores it with --annotate)")
+    # Stream mode options
+    ap.add_argument("--every", type=int, default=1, help="Stream: process every Nth source frame")
+    ap.add_argument("--target_fps", type=float, default=0.0, help="Stream: at most this many frames per source second (0 = all)")
+    ap.add_argument("--max_frames", type=int, default=0, help="Stream: stop after this many processed frames (0 = no limit)")
+    ap.add_argument("--sequence_fps", type=float, default=30.0, help="Stream: timestamp rate for image sequences")
+    args = ap.parse_args()
+
+    def build(model_cls, path):
+        if args.backend == "auto":
+            import autotune
+
+            model, report = autotune.tuned_model(model_cls, path, args.delegate or None)
+            print(f"{report['model']}: {report['backend']} ({report['ms']:.1f} ms, {report['source']})", file=sys.stderr)
+            return model
+        return model_cls(path, ethosu_delegate=(args.delegate or None), backend=args.backend)
+
+    detector = build(PoseDetector, args.det)
+    landmarker = build(PoseLandmarkerLite, args.lmk)
+    if args.inputs:
+        run_batch(args, detector, landmarker)
+        return
+    if args.video:
+        run_stream(args, detector, landmarker)
+        return
+
+    img_rgb = _load_image_any(args.image)
+    res = estimate_pose(detector, landmarker, img_rgb, score_thresh=args.score_thresh, nms_thresh=args.nms_thresh)
     out_img = args.out_img or os.path.splitext(args.image)[0] + "_annotated.png"
     out_json = args.out_json or os.path.splitext(args.image)[0] + "_landmarks.json"
-    cv2.imwrite(out_img, img_bgr)
+    if res is None:
+        print("No person detected. Saving original image and empty JSON.")
+        cv2.imwrite(out_img, cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR))
+        with open(out_json, "w") as f:
+            json.dump({"keypoints": [], "keypoints3D": []}, f, indent=2)
+        return
+    keypoints_xyzc, keypoints3d_xyzc = res
+
+    # Draw on original image and save outputs
+    cv2.imwrite(out_img, render_annotated(img_rgb, keypoints_xyzc))
     with open(out_json, "w") as f:
         json.dump(to_sample_json(keypoints_xyzc, keypoints3d_xyzc), f, indent=2)
     print(f"Saved: {out_img}\nSaved: {out_json}")
@@ -656,5 +1210,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,214 @@
+"""Frame sources for the pose CLI: video files, image sequences and MJPEG streams.
+
+Every source is a generator of Frame(index, timestamp, image), pulled one
+frame at a time, so memory stays bounded regardless of the input length:
+
+  - video files (anything cv2.VideoCapture opens): image is an RGB ndarray,
+    timestamp is the container's presentation time;
+  - image sequences (directory, glob or @filelist): image is the file path,
+    timestamp is index / fps;
+  - HTTP multipart/x-mixed-replace streams (the camera server's /video):
+    image is the encoded JPEG bytes, timestamp is seconds since the stream
+    opened.
+
+Encoded frames are decoded by the consumer (see blazepose_imx93.run_stream),
+which lets it decode at reduced JPEG scale and only for frames it keeps.
+"""
+from __future__ import annotations
+import glob
+import os
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class Frame(NamedTuple):
+    index: int          # position in the source, before decimation
+    timestamp: float    # seconds
+    image: Union[np.ndarray, bytes, str]
+
+
+def is_stream_url(spec: str) -> bool:
+    return spec.startswith("http://") or spec.startswith("https://")
+
+
+def expand_image_paths(items: List[str]) -> List[str]:
+    """Directories (non-recursive), glob patterns, plain paths and @filelist entries -> image paths."""
+    paths: List[str] = []
+    for item in items:
+        if item.startswith("@"):
+            with open(item[1:], "r", encoding="utf-8") as f:
+                paths.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+        elif os.path.isdir(item):
+            paths.extend(sorted(
+                os.path.join(item, n) for n in os.listdir(item)
+                if n.lower().endswith(IMAGE_EXTS) and not n.endswith("_annotated.png")
+            ))
+        else:
+            matches = sorted(glob.glob(item))
+            paths.extend(matches if matches else [item])
+    # De-duplicate while keeping order
+    seen = set()
+    return [p for p in paths if not (p in seen or seen.add(p))]
+
+
+def iter_video(path: str) -> Iterator[Frame]:
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Cannot open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    try:
+        index = 0
+        while True:
+            ok, bgr = cap.read()
+            if not ok:
+                return
+            t_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            t = t_ms / 1000.0 if t_ms > 0 or index == 0 else (index / fps if fps > 0 else float(index))
+            yield Frame(index, t, cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+            index += 1
+    finally:
+        cap.release()
+
+
+def iter_image_sequence(paths: List[str], fps: float = 30.0) -> Iterator[Frame]:
+    for index, path in enumerate(paths):
+        yield Frame(index, index / fps, path)
+
+
+def iter_mjpeg(url: str, timeout: float = 10.0, chunk_size: int = 64 * 1024) -> Iterator[Frame]:
+    """Parse a multipart/x-mixed-replace JPEG stream.
+    Uses each part's Content-Length when present (the camera server sends it),
+    otherwise scans for the JPEG SOI/EOI markers. Only the current part is buffered.
+    """
+    import urllib.request  # only needed for live streams
+
+    resp = urllib.request.urlopen(url, timeout=timeout)
+    start = time.monotonic()
+    buf = bytearray()
+    index = 0
+    try:
+        while True:
+            # Part headers end with a blank line
+            sep = buf.find(b"\r\n\r\n")
+            while sep < 0:
+                chunk = resp.read1(chunk_size) if hasattr(resp, "read1") else resp.read(chunk_size)
+                if not chunk:
+                    return
+                buf += chunk
+                sep = buf.find(b"\r\n\r\n")
+            headers = bytes(buf[:sep]).decode("latin-1").lower()
+            del buf[:sep + 4]
+            length = None
+            for line in headers.split("\r\n"):
+                if line.startswith("content-length:"):
+                    length = int(line.split(":", 1)[1].strip())
+            if length is not None:
+                while len(buf) < length:
+                    chunk = resp.read(length - len(buf))
+                    if not chunk:
+                        return
+                    buf += chunk
+                jpg = bytes(buf[:length])
+                del buf[:length]
+            else:
+                eoi = buf.find(b"\xff\xd9")
+                while eoi < 0:
+                    chunk = resp.read1(chunk_size) if hasattr(resp, "read1") else resp.read(chunk_size)
+                    if not chunk:
+                        return
+                    buf += chunk
+                    eoi = buf.find(b"\xff\xd9")
+                soi = buf.find(b"\xff\xd8")
+                jpg = bytes(buf[max(soi, 0):eoi + 2])
+                del buf[:eoi + 2]
+            yield Frame(index, time.monotonic() - start, jpg)
+            index += 1
+    finally:
+        resp.close()
+
+
+def open_source(specs: List[str], sequence_fps: float = 30.0) -> Iterator[Frame]:
+    """One video file or stream URL, or any number of image-sequence entries."""
+    if len(specs) == 1 and is_stream_url(specs[0]):
+        return iter_mjpeg(specs[0])
+    if len(specs) == 1 and os.path.isfile(specs[0]) and not specs[0].lower().endswith(IMAGE_EXTS):
+        return iter_video(specs[0])
+    return iter_image_sequence(expand_image_paths(specs), sequence_fps)
+
+
+def decimate(frames: Iterable[Frame], every: int = 1, target_fps: float = 0.0,
+             max_frames: int = 0) -> Iterator[Frame]:
+    """Keep every Nth frame, then at most target_fps frames per second of source time."""
+    period = 1.0 / target_fps if target_fps > 0 else 0.0
+    next_t = None
+    kept = 0
+    for i, fr in enumerate(frames):
+        if every > 1 and i % every:
+            continue
+        if period > 0:
+            if next_t is not None and fr.timestamp < next_t:
+                continue
+            # Advance on the source clock; resync after gaps instead of bursting
+            next_t = fr.timestamp + period if next_t is None or fr.timestamp - next_t > period else next_t + period
+        yield fr
+        kept += 1
+        if max_frames and kept >= max_frames:
+            return
+
+
+_END = object()
+
+
+def prefetch(items: Iterable, fn: Optional[Callable] = None, depth: int = 2, latest_only: bool = False) -> Iterator:
+    """Pull items (optionally mapped through fn) on a background thread, buffering at most depth.
+    latest_only drops queued items when the consumer falls behind, for live streams
+    where the freshest frame matters more than completeness.
+    """
+    q: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item, droppable=True):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if latest_only and droppable:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def worker():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                put(fn(item) if fn is not None else item)
+        except BaseException as e:
+            put(e, droppable=False)
+        finally:
+            put(_END, droppable=False)
+
+    t = threading.Thread(target=worker, name="frame-prefetch", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
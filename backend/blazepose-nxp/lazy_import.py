@@ -0,0 +1,46 @@
+"""Deferred imports for the heavy native modules (cv2, PIL.Image).
+
+lazy_import("cv2") returns a placeholder module immediately and performs the
+real import on first attribute access, so `import blazepose_imx93` (and the
+API server) start without paying for OpenCV/Pillow initialization. Code keeps
+using the usual `cv2.resize(...)` spelling.
+
+The first access may come from several worker threads at once (batch prefetch,
+pipeline stages), so loading is serialized with a lock; afterwards attributes
+are served from the placeholder's own namespace without locking.
+"""
+from __future__ import annotations
+import importlib
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _lazy_load(self) -> ModuleType:
+        with self._lazy_lock:
+            module = self._lazy_module
+            if module is None:
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(module.__dict__)
+                self.__dict__["_lazy_module"] = module
+            return module
+
+    def __getattr__(self, attr: str):
+        # Only reached for names not yet copied into this placeholder
+        return getattr(self._lazy_load(), attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
@@ -0,0 +1,80 @@
+"""Single-warp preprocessing from the source frame to the model inputs.
+
+The letterbox (pad to square), the resize to the model input and, for the
+landmark model, the ROI rotation are composed into one 2x3 affine per
+model input, so each input is produced by a single cv2.warpAffine of the
+original frame without intermediate canvases.
+
+Coordinates returned by the detector are normalized to the letterboxed
+square, i.e. the same space as the former 256x256 frame, so the ROI math in
+blazepose_imx93 (_compute_roi_normrect_256, _rect_transform_norm) and the
+back-projection in transform work unchanged with the returned letterbox meta.
+"""
+from __future__ import annotations
+import math
+from typing import Tuple
+
+import numpy as np
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+LetterboxMeta = Tuple[int, int, int, int]  # (orig_h, orig_w, pad_y, pad_x)
+
+
+def letterbox_meta(img_hw: Tuple[int, int]) -> LetterboxMeta:
+    """Same padding as blazepose_imx93._letterbox_to_square_rgb."""
+    h, w = int(img_hw[0]), int(img_hw[1])
+    S = max(h, w)
+    return (h, w, (S - h) // 2, (S - w) // 2)
+
+
+def letterbox_affine(meta: LetterboxMeta, dst_size: int) -> np.ndarray:
+    """2x3 affine: original pixel -> dst_size x dst_size letterboxed pixel.
+    Uses cv2.resize's pixel-center convention: dst = s * (src + 0.5) - 0.5.
+    """
+    h, w, pad_y, pad_x = meta
+    s = dst_size / float(max(h, w))
+    return np.array(
+        [[s, 0.0, s * (pad_x + 0.5) - 0.5],
+         [0.0, s, s * (pad_y + 0.5) - 0.5]],
+        dtype=np.float64,
+    )
+
+
+def roi_affine(rect: dict, meta: LetterboxMeta, dst_size: int = 256) -> np.ndarray:
+    """2x3 affine: original pixel -> ROI crop pixel.
+    rect is a NormalizedRect {xc, yc, w, h, rot} in the letterboxed square.
+    Maps the rotated rect's top-left, top-right and bottom-left corners to
+    (0,0), (dst_size-1,0), (0,dst_size-1), like _roi_affine_from_rect.
+    """
+    _, _, pad_y, pad_x = meta
+    S = float(max(meta[0], meta[1]))
+    cx, cy = rect["xc"] * S - pad_x, rect["yc"] * S - pad_y
+    w, h = rect["w"] * S, rect["h"] * S
+    ca, sa = math.cos(rect["rot"]), math.sin(rect["rot"])
+    # Rect frame -> original pixels: p = c + R @ (u*w - w/2, v*h - h/2) for u,v in [0,1]
+    # Inverse: dst = k * R^T @ (p - c) + k * (w/2, h/2), scaled per axis to dst_size-1
+    kx = (dst_size - 1) / w
+    ky = (dst_size - 1) / h
+    a = np.array([[ca * kx, sa * kx], [-sa * ky, ca * ky]], dtype=np.float64)
+    t = np.array([0.5 * w * kx, 0.5 * h * ky]) - a @ np.array([cx, cy])
+    return np.hstack([a, t[:, None]])
+
+
+def detector_input(img_rgb: np.ndarray, size: int = 224) -> Tuple[np.ndarray, LetterboxMeta]:
+    """Letterboxed, resized detector input straight from the original frame."""
+    meta = letterbox_meta(img_rgb.shape[:2])
+    M = letterbox_affine(meta, size)
+    out = cv2.warpAffine(img_rgb, M, (size, size), flags=cv2.INTER_LINEAR,
+                         borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+    return out, meta
+
+
+def roi_input(img_rgb: np.ndarray, rect: dict, meta: LetterboxMeta, size: int = 256) -> np.ndarray:
+    """Rotated ROI crop for the landmark model, sampled from full-resolution pixels.
+    Uses BORDER_REPLICATE on the original frame like MediaPipe's ImageToTensor.
+    """
+    M = roi_affine(rect, meta, size)
+    return cv2.warpAffine(img_rgb, M, (size, size), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
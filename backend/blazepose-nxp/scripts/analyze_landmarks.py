@@ -3,6 +3,90 @@ import numpy as np
 from pathlib import Path
 import statistics as stats
 
+def similarity_transform(A, B, w=None):
+    """Weighted best-fit similarity transform B ~ s*R@A + t (Umeyama), batched.
+    A, B: [..., N, 2]; w: [..., N] point weights (default 1). Leading dims broadcast,
+    so one pose can be aligned against a stack of poses with stacked 2x2 SVDs.
+    Returns (s [...], R [..., 2, 2] proper rotation, t [..., 2], ratio [...]) where ratio is
+    the weighted residual after alignment divided by B's spread (0 = identical shape,
+    1 = no fit; degenerate inputs give 1).
+    """
+    A = np.asarray(A, float)
+    B = np.asarray(B, float)
+    if w is None:
+        w = np.ones(np.broadcast_shapes(A.shape, B.shape)[:-1])
+    w = np.asarray(w, float)
+    wsum = w.sum(-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        muA = (w[..., None] * A).sum(-2) / wsum[..., None]
+        muB = (w[..., None] * B).sum(-2) / wsum[..., None]
+        A0 = A - muA[..., None, :]
+        B0 = B - muB[..., None, :]
+        C = np.einsum('...n,...ni,...nj->...ij', w, B0, A0) / wsum[..., None, None]
+        varA = (w * (A0 ** 2).sum(-1)).sum(-1) / wsum
+        varB = (w * (B0 ** 2).sum(-1)).sum(-1) / wsum
+        C = np.nan_to_num(C)
+        U, Sig, Vt = np.linalg.svd(C)
+        # Reflection guard: flip the weakest axis when det(U Vt) < 0
+        d = np.sign(np.linalg.det(U) * np.linalg.det(Vt))
+        d = np.where(d == 0, 1.0, d)
+        D = np.stack([np.ones_like(d), d], -1)
+        R = U @ (D[..., :, None] * Vt)
+        tr = Sig[..., 0] + d * Sig[..., 1]
+        s = tr / varA
+        t = muB - s[..., None] * np.einsum('...ij,...j->...i', R, muA)
+        ratio = 1.0 - tr ** 2 / (varA * varB)
+    ok = (wsum >= 3) & (varA > 0) & (varB > 0)
+    return (np.where(ok, s, 0.0), R, np.where(ok[..., None], t, 0.0),
+            np.where(ok, np.clip(np.nan_to_num(ratio, nan=1.0), 0.0, 1.0), 1.0))
+
+
+REGIONS={
+    'upper': {'left_shoulder','right_shoulder','left_elbow','right_elbow','left_wrist','right_wrist','left_eye','right_eye','nose','left_ear','right_ear','mouth_left','mouth_right'},
+    'torso': {'left_shoulder','right_shoulder','left_hip','right_hip'},
+    'lower': {'left_hip','right_hip','left_knee','right_knee','left_ankle','right_ankle','left_heel','right_heel','left_foot_index','right_foot_index'},
+}
+
+
+def xy_errors(A, B):
+    """Per-keypoint pixel distance between [..., N, >=2] landmark arrays -> [..., N]."""
+    A = np.asarray(A, float); B = np.asarray(B, float)
+    return np.sqrt(((A[..., :2]-B[..., :2])**2).sum(-1))
+
+
+def error_stats(e):
+    """mean/median/p90/max over all entries of an error array (any shape); NaN entries are skipped."""
+    e = np.asarray(e, float).reshape(-1)
+    e = e[~np.isnan(e)]
+    if e.size == 0:
+        return dict(mean=float('nan'), median=float('nan'), p90=float('nan'), max=float('nan'))
+    return dict(mean=float(e.mean()), median=float(np.median(e)), p90=float(np.percentile(e, 90)), max=float(e.max()))
+
+
+def region_errors(e, names):
+    """{region: error_stats} over the keypoints of each REGIONS group; e is [..., N] in names order."""
+    out = {}
+    for g, members in REGIONS.items():
+        idx = [i for i, n in enumerate(names) if n in members]
+        out[g] = error_stats(np.asarray(e)[..., idx])
+    return out
+
+
+def vec_stats(v):
+    v = np.asarray(v, float)
+    return dict(min=float(v.min()), max=float(v.max()), mean=float(v.mean()), std=float(v.std()))
+
+
+def z_fit(Az, Bz):
+    """Least-squares linear map Bz ~ scale*Az + offset (all entries pooled) with its RMSE and correlation."""
+    Az = np.asarray(Az, float).reshape(-1); Bz = np.asarray(Bz, float).reshape(-1)
+    A1 = np.vstack([Az, np.ones_like(Az)]).T
+    s, t = np.linalg.lstsq(A1, Bz, rcond=None)[0]
+    rmse = float(np.sqrt(np.mean((s*Az+t-Bz)**2)))
+    corr = float(np.corrcoef(Az, Bz)[0, 1]) if Az.std() > 0 and Bz.std() > 0 else float('nan')
+    return dict(scale=float(s), offset=float(t), rmse=rmse, corr=corr)
+
+
 def main(a_path='yoga1_landmarks.json', b_path='sample-output.json'):
     p1=Path(a_path); p2=Path(b_path)
     print('Files:', p1.exists(), p2.exists())
@@ -20,49 +104,28 @@ def main(a_path='yoga1_landmarks.json', b_path='sample-output.json'):
 
     # XY errors
     D=Axy-Bxy
-    e=np.sqrt((D**2).sum(1))
+    e=xy_errors(Axy, Bxy)
     order=np.argsort(-e)
     print('\nTop-10 XY pixel errors:')
     for i in order[:10]:
         print(f"{names_ref[i]:18s} err={e[i]:7.2f} (dx={D[i,0]:7.2f}, dy={D[i,1]:7.2f})")
     print(f"\nSummary XY error: mean={e.mean():.2f}, median={np.median(e):.2f}, max={e.max():.2f} ({names_ref[order[0]]})")
 
-    GROUPS={
-        'upper': {'left_shoulder','right_shoulder','left_elbow','right_elbow','left_wrist','right_wrist','left_eye','right_eye','nose','left_ear','right_ear','mouth_left','mouth_right'},
-        'torso': {'left_shoulder','right_shoulder','left_hip','right_hip'},
-        'lower': {'left_hip','right_hip','left_knee','right_knee','left_ankle','right_ankle','left_heel','right_heel','left_foot_index','right_foot_index'},
-    }
     print('\nRegion XY error stats (mean, median, max):')
-    for g,names in GROUPS.items():
-        idx=[i for i,n in enumerate(names_ref) if n in names]
-        vals=e[idx]
-        print(f"{g:6s} mean={vals.mean():.2f} median={np.median(vals):.2f} max={vals.max():.2f}")
+    for g,st in region_errors(e, names_ref).items():
+        print(f"{g:6s} mean={st['mean']:.2f} median={st['median']:.2f} max={st['max']:.2f}")
 
     # Z analysis
-    def vec_stats(v):
-        return dict(min=float(v.min()), max=float(v.max()), mean=float(v.mean()), std=float(v.std()))
     print('\nZ stats ours:', vec_stats(Az))
     print('Z stats ref :', vec_stats(Bz))
-    A1=np.vstack([Az, np.ones_like(Az)]).T
-    s,t=np.linalg.lstsq(A1, Bz, rcond=None)[0]
-    pred=s*Az+t
-    rmse=float(np.sqrt(np.mean((pred-Bz)**2)))
-    corr=float(np.corrcoef(Az,Bz)[0,1]) if Az.std()>0 and Bz.std()>0 else float('nan')
-    print(f"Z linear map ref ≈ {s:.3f}*ours + {t:.3f}, RMSE={rmse:.3f}, corr={corr:.3f}")
+    z=z_fit(Az, Bz)
+    print(f"Z linear map ref ≈ {z['scale']:.3f}*ours + {z['offset']:.3f}, RMSE={z['rmse']:.3f}, corr={z['corr']:.3f}")
 
     # Similarity transform A->B
-    muA=Axy.mean(0); muB=Bxy.mean(0)
-    A0=Axy-muA; B0=Bxy-muB
-    C=(A0.T@B0)/len(Axy)
-    U,Sig,Vt=np.linalg.svd(C)
-    R=U@Vt
-    if np.linalg.det(R)<0:
-        Vt[-1,:]*=-1
-        R=U@Vt
-    varA=(A0**2).sum()/len(Axy)
-    s_scale=float(np.trace(np.diag(Sig))/varA)
+    s_scale,R,t,_=similarity_transform(Axy, Bxy)
+    s_scale=float(s_scale)
     angle=float(math.degrees(math.atan2(R[1,0], R[0,0])))
-    A_align = s_scale*(A0@R.T)+muB
+    A_align = s_scale*(Axy@R.T)+t
     res=np.linalg.norm(A_align-Bxy, axis=1)
     print(f"\nBest-fit similarity A->B: scale={s_scale:.4f}, rot={angle:.2f} deg")
     print(f"Residuals after alignment: mean={res.mean():.2f}, median={np.median(res):.2f}, max={res.max():.2f}")
@@ -73,4 +136,3 @@ def main(a_path='yoga1_landmarks.json', b_path='sample-output.json'):
 
 if __name__=='__main__':
     main()
-
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Per-frame allocation check for the detector + landmark stages (tracemalloc).
+
+"before" replays the former access pattern on the same interpreters: float32
+preprocessing with expand_dims + set_tensor, get_tensor() on every output, a
+second get_tensor() pass to find the heatmap and a full-heatmap sigmoid.
+"after" is the current PoseDetector.infer / PoseLandmarkerLite.infer, which
+write inputs and read outputs through interpreter.tensor() views.
+
+Runs off-board with scripts.fake_interpreter. Usage (from backend/blazepose-nxp):
+  python -m scripts.bench_alloc --frames 50
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+import cv2
+
+import blazepose_imx93 as bp
+from scripts.bench_refine import refine_landmarks_loop
+from scripts.fake_interpreter import FakeInterpreter
+
+
+def legacy_detect(det: bp.PoseDetector, img: np.ndarray):
+    x = cv2.resize(img, (224, 224))
+    x = (x.astype(np.float32) / 255.0 - 0.5) * 2.0
+    det.interp.set_tensor(det.inp["index"], np.expand_dims(x, 0))
+    det.interp.invoke()
+    raw_scores = det.interp.get_tensor(det.out_scores["index"])
+    raw_boxes = det.interp.get_tensor(det.out_boxes["index"])
+    scores = 1.0 / (1.0 + np.exp(-np.clip(raw_scores, -80, 80)))
+    dets = bp.decode_det_boxes(raw_boxes[0], det.anchors)
+    mask = scores[0, :, 0] > 0.5
+    return dets[mask], scores[0, mask, 0]
+
+
+def legacy_landmark(lmk: bp.PoseLandmarkerLite, roi: np.ndarray):
+    x = cv2.resize(roi, (256, 256)).astype(np.float32) / 255.0
+    lmk.interp.set_tensor(lmk.inp["index"], np.expand_dims(x, 0))
+    lmk.interp.invoke()
+    out_tensors = {int(np.prod(o["shape"])): lmk.interp.get_tensor(o["index"]) for o in lmk.outs}
+    arr = out_tensors[195].reshape(39, 5)
+    lmks_img = arr[:33, :3].astype(np.float32) / 256.0
+    heatmap = None
+    for o in lmk.outs:
+        t = lmk.interp.get_tensor(o["index"])
+        if t.ndim == 4 and t.shape[-1] in (33, 39) and t.shape[1] * t.shape[2] >= 1024:
+            heatmap = t[0]
+            break
+    return refine_landmarks_loop(lmks_img, heatmap)
+
+
+def per_frame_peak(fn, frames: int) -> float:
+    """Mean transient allocation high-water mark per call, in bytes."""
+    fn()  # warm-up (lazy init, caches)
+    tracemalloc.start()
+    total = 0
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - base
+    tracemalloc.stop()
+    return total / frames
+
+
+def main():
+    ap = argparse.ArgumentParser(description="tracemalloc allocations per frame, before vs after zero-copy I/O")
+    ap.add_argument("--frames", type=int, default=50)
+    args = ap.parse_args()
+
+    bp.TFLiteInterpreter = FakeInterpreter
+    det = bp.PoseDetector("pose_detection_quant_vela.tflite", ethosu_delegate=None)
+    lmk = bp.PoseLandmarkerLite("pose_landmark_full_quant_vela.tflite", ethosu_delegate=None)
+    rng = np.random.default_rng(0)
+    img_det = rng.integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+    roi = rng.integers(0, 256, size=(256, 256, 3), dtype=np.uint8)
+
+    rows = [
+        ("detector", lambda: legacy_detect(det, img_det), lambda: det.infer(img_det)),
+        ("landmark", lambda: legacy_landmark(lmk, roi), lambda: lmk.infer(roi)),
+    ]
+    print(f"{'stage':10s} {'before KiB/frame':>17s} {'after KiB/frame':>16s}")
+    for name, before, after in rows:
+        b = per_frame_peak(before, args.frames) / 1024.0
+        a = per_frame_peak(after, args.frames) / 1024.0
+        print(f"{name:10s} {b:17.1f} {a:16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Benchmark + equivalence check for the NumPy angle engine in pose_similarity.
+
+Compares get_selected_angles / compute_similarity_percent against the original
+dict-based implementation (three math.hypot calls per angle, mirrored pose built
+as a left/right-renamed copy of the keypoint dicts) on the target library and on
+random poses, including low-confidence, missing and coincident keypoints.
+
+Timings: the serving path is the packed one. The inference service hands
+/similarity and /recognize a read-only float32 [33,4] array, and nothing is
+converted to dicts. Dict input is only used for loading targets and by the
+CLI. For a single 8-angle pose, packing the dicts costs about as much as the
+original loop.
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.bench_angles --iters 2000
+"""
+import argparse
+import glob
+import math
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from scripts.pose_similarity import (
+    ANGLE_NAMES,
+    CONF_THRESHOLD,
+    DEFAULT_SELECTED_ANGLES,
+    KEYPOINT_NAMES,
+    adjust_similarity,
+    get_selected_angles,
+    load_pose,
+)
+from service.targets import TargetPose, compute_similarity_percent
+
+
+# ---- Reference implementation (the original per-angle Python code) ----
+def _distance(a, b):
+    return math.hypot(float(a["x"]) - float(b["x"]), float(a["y"]) - float(b["y"]))
+
+
+def _calc_angle(a, b, c) -> Optional[float]:
+    ab, bc, ac = _distance(a, b), _distance(b, c), _distance(a, c)
+    if ab == 0 or bc == 0:
+        return None
+    cos_angle = ((ab ** 2) + (bc ** 2) - (ac ** 2)) / (2 * ab * bc)
+    cos_angle = max(-1.0, min(1.0, cos_angle))
+    return math.degrees(math.acos(cos_angle))
+
+
+def _angle_with_confidence(a, b, c) -> Optional[float]:
+    if not a or not b or not c:
+        return None
+    if all(float(k.get("score", 0.0)) >= CONF_THRESHOLD for k in (a, b, c)):
+        return _calc_angle(a, b, c)
+    return None
+
+
+_REF_TRIPLETS = [
+    ("leftElbowAngle", "left_shoulder", "left_elbow", "left_wrist"),
+    ("leftShoulderAngle", "left_elbow", "left_shoulder", "left_hip"),
+    ("leftHipAngle", "left_shoulder", "left_hip", "left_knee"),
+    ("leftKneeAngle", "left_hip", "left_knee", "left_ankle"),
+    ("rightElbowAngle", "right_shoulder", "right_elbow", "right_wrist"),
+    ("rightShoulderAngle", "right_elbow", "right_shoulder", "right_hip"),
+    ("rightHipAngle", "right_shoulder", "right_hip", "right_knee"),
+    ("rightKneeAngle", "right_hip", "right_knee", "right_ankle"),
+]
+
+
+def selected_angles_ref(keypoints: List[dict], selected: List[str]) -> List[Optional[float]]:
+    kps = {str(kp.get("name")): kp for kp in keypoints if "name" in kp}
+    return [_angle_with_confidence(kps.get(a), kps.get(b), kps.get(c))
+            for name, a, b, c in _REF_TRIPLETS if name in selected]
+
+
+def _swap(name: str) -> str:
+    if name.startswith("left_"):
+        return "right_" + name[len("left_"):]
+    if name.startswith("right_"):
+        return "left_" + name[len("right_"):]
+    return name
+
+
+def _similarity_ref(origin, target) -> float:
+    total = sum(abs(a - b) for a, b in zip(origin, target) if a is not None and b is not None)
+    if all(a is None for a in origin):
+        return 0.0
+    sim = max(0.0, 1.0 - (total / max(1, len(origin))) / 180.0)
+    return adjust_similarity(sim) * 100.0
+
+
+def similarity_percent_ref(keypoints: List[dict], target_angles, selected: List[str]) -> float:
+    base = _similarity_ref(selected_angles_ref(keypoints, selected), target_angles)
+    swapped = [{**kp, "name": _swap(str(kp.get("name", "")))} for kp in keypoints]
+    return max(base, _similarity_ref(selected_angles_ref(swapped, selected), target_angles))
+
+
+# ---- Cases ----
+def _random_pose(rng: np.random.Generator) -> List[dict]:
+    kps = [{"name": n, "x": float(rng.uniform(0, 640)), "y": float(rng.uniform(0, 480)),
+            "score": float(rng.uniform(0, 1))} for n in KEYPOINT_NAMES]
+    # Coincident points (zero-length segments) and missing keypoints
+    if rng.random() < 0.2:
+        kps[13]["x"], kps[13]["y"] = kps[11]["x"], kps[11]["y"]
+    if rng.random() < 0.2:
+        del kps[int(rng.integers(11, 29))]
+    return kps
+
+
+def _random_selection(rng: np.random.Generator) -> List[str]:
+    picked = [n for n in ANGLE_NAMES if rng.random() < 0.6]
+    return picked or DEFAULT_SELECTED_ANGLES
+
+
+def _same(a: List[Optional[float]], b: List[Optional[float]], tol: float) -> bool:
+    return len(a) == len(b) and all(
+        (x is None and y is None) or (x is not None and y is not None and abs(x - y) <= tol) for x, y in zip(a, b))
+
+
+def check_equivalence(poses: List[List[dict]], rng: np.random.Generator, tol: float = 1e-9) -> int:
+    failures = 0
+    for i, pose in enumerate(poses):
+        sel = _random_selection(rng)
+        if not _same(get_selected_angles(pose, sel), selected_angles_ref(pose, sel), tol):
+            failures += 1
+            print(f"[FAIL] angles, case {i}")
+        other = poses[(i + 1) % len(poses)]
+        t_ref = selected_angles_ref(other, sel)
+        target = TargetPose.from_keypoints("t", "", other)
+        got, want = compute_similarity_percent(pose, target, sel), similarity_percent_ref(pose, t_ref, sel)
+        if abs(got - want) > 1e-6:
+            failures += 1
+            print(f"[FAIL] similarity, case {i}: {got} != {want}")
+    return failures
+
+
+def _time(fn, iters: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return 1e3 * (time.perf_counter() - t0) / iters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iters", type=int, default=2000)
+    parser.add_argument("--cases", type=int, default=500, help="random poses for the equivalence check")
+    parser.add_argument("--targets-dir", default=os.path.join(os.path.dirname(__file__), "..", "targets"))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    library = [load_pose(p) for p in sorted(glob.glob(os.path.join(args.targets_dir, "*_landmarks.json")))]
+    poses = library + [_random_pose(rng) for _ in range(args.cases)] + [[]]
+    failures = check_equivalence(poses, rng)
+    print(f"equivalence: {len(poses) - failures}/{len(poses)} cases match")
+
+    pose = library[0] if library else _random_pose(rng)
+    t_ref = selected_angles_ref(pose, DEFAULT_SELECTED_ANGLES)
+    target = TargetPose.from_keypoints("t", "", pose)
+    # What InferenceService.infer_packed returns: float32 [33,4] in KEYPOINT_NAMES order, read-only
+    packed = target.landmarks
+    t_loop = _time(lambda: similarity_percent_ref(pose, t_ref, DEFAULT_SELECTED_ANGLES), args.iters)
+    t_vec = _time(lambda: compute_similarity_percent(pose, target), args.iters)
+    t_packed = _time(lambda: compute_similarity_percent(packed, target), args.iters)
+    print(f"dicts, original loop     : {t_loop:8.4f} ms/pose")
+    print(f"dicts, vectorized        : {t_vec:8.4f} ms/pose  ({t_loop / t_vec:.1f}x)  target loading / CLI only")
+    print(f"packed [33,4], serving   : {t_packed:8.4f} ms/pose  ({t_loop / t_packed:.1f}x)  /similarity path")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
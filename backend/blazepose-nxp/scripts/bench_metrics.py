@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Latency of the /similarity metrics over the whole target set.
+
+Scores one live pose against every target (library targets plus synthetic
+poses: randomly rotated, scaled and shifted copies with landmark noise) with
+  angles       compute_similarity_percent, one target at a time
+  angles-index the recognition index (one vectorized pass over the angle table)
+  procrustes   procrustes_similarity_percent, all targets in one batch
+  procrustes-1 compute_procrustes_percent, one target at a time
+and checks that the batched Procrustes scorer matches the per-target one and
+is invariant to rotation, scale and translation.
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.bench_metrics --poses 10000 --iters 50
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from scripts.pose_similarity import compute_angles, pack_keypoints
+from service.recognition import PoseIndex
+from service.targets import (
+    TargetPose,
+    TargetRegistry,
+    compute_procrustes_percent,
+    compute_similarity_percent,
+    procrustes_similarity_percent,
+)
+
+
+def random_similarity(lm: np.ndarray, rng: np.random.Generator, noise: float = 0.0) -> np.ndarray:
+    """[..., 33, 4] landmarks under a random rotation/scale/shift of x, y (plus pixel noise)."""
+    out = np.array(lm, dtype=np.float32)
+    n = out.shape[0] if out.ndim == 3 else 1
+    flat = out.reshape(n, out.shape[-2], 4)
+    th = rng.uniform(-np.pi, np.pi, size=n)
+    s = rng.uniform(0.5, 2.0, size=n)
+    R = np.stack([np.cos(th), -np.sin(th), np.sin(th), np.cos(th)], -1).reshape(n, 2, 2) * s[:, None, None]
+    xy = flat[..., :2]
+    xy = np.einsum("nij,nkj->nki", R, xy) + rng.uniform(-500, 500, size=(n, 1, 2))
+    xy += rng.normal(0.0, noise, size=xy.shape)
+    flat[..., :2] = xy
+    return out
+
+
+def _time(fn, iters: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return 1e3 * (time.perf_counter() - t0) / iters
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--targets-dir", default=os.path.join(os.path.dirname(__file__), "..", "targets"))
+    ap.add_argument("--poses", type=int, default=10000)
+    ap.add_argument("--iters", type=int, default=50)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    reg = TargetRegistry(args.targets_dir, reload_sec=0)
+    lib_names, lib_lm = reg.landmark_table()
+    if not lib_names:
+        raise SystemExit(f"no targets in {args.targets_dir}")
+    synth = random_similarity(lib_lm[rng.integers(0, len(lib_lm), size=max(0, args.poses - len(lib_lm)))], rng, noise=8.0)
+    landmarks = np.concatenate([np.asarray(lib_lm, dtype=np.float32), synth])
+    names = lib_names + [f"synthetic-{i}" for i in range(len(synth))]
+    targets = [TargetPose.from_keypoints(n, "", lm) for n, lm in zip(names, landmarks)]
+    live = random_similarity(lib_lm[0], rng, noise=4.0)
+
+    # Correctness: batched == per-target; a transformed copy of a target is a perfect match
+    batched = procrustes_similarity_percent(live, landmarks)
+    single = np.array([compute_procrustes_percent(live, t) for t in targets[:500]])
+    ok = np.allclose(batched[:500], single, atol=1e-6)
+    print(f"batched vs per-target procrustes: {'match' if ok else 'MISMATCH'}")
+    exact = procrustes_similarity_percent(random_similarity(lib_lm[0], rng), lib_lm[:1])[0]
+    print(f"rotated/scaled/shifted copy of {lib_names[0]}: {exact:.4f}%")
+    ok = ok and exact > 99.9
+
+    index = PoseIndex(names, np.stack([t.table for t in targets]), tree_min=1 << 30)
+    n = len(targets)
+    rows = [
+        ("angles", _time(lambda: [compute_similarity_percent(live, t) for t in targets], max(1, args.iters // 10))),
+        ("angles-index", _time(lambda: index.query(compute_angles(pack_keypoints(live)), top_k=n), args.iters)),
+        ("procrustes", _time(lambda: procrustes_similarity_percent(live, landmarks), args.iters)),
+        ("procrustes-1", _time(lambda: [compute_procrustes_percent(live, t) for t in targets], max(1, args.iters // 10))),
+    ]
+    print(f"{n} targets")
+    for name, ms in rows:
+        print(f"{name:13s} {ms:9.3f} ms/pose  {1e3 * ms / n:8.3f} us/target")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark + correctness check for the nearest-pose recognition index.
+
+Builds a PoseIndex over the target library plus synthetic poses (jittered
+copies of the targets with some undefined angles) and checks that its top-k
+agrees with scoring every target the way /similarity does, and (with scipy
+installed) that the KD-tree index returns the same top-k as brute force on
+the full table, for queries with and without undefined angles. Then times
+queries, brute force (float32 scan + exact re-scoring) and KD-tree, and marks
+the one a library of this size uses (RECOGNIZE_TREE_MIN).
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.bench_recognize --poses 10000 --iters 500
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from scripts.pose_similarity import ANGLE_MIRROR_INDEX, ANGLE_NAMES
+from service import recognition
+from service.recognition import PoseIndex
+from service.targets import TargetPose, TargetRegistry, similarity_percent_from_angles
+
+
+def synthetic_table(base: np.ndarray, n: int, rng: np.random.Generator, missing: float = 0.05) -> np.ndarray:
+    """[n, 2, A] angle tables: jittered library angles, a `missing` share undefined."""
+    full = base[rng.integers(0, len(base), size=n), 0] + rng.normal(0.0, 15.0, size=(n, len(ANGLE_NAMES)))
+    full = np.clip(full, 0.0, 180.0)
+    full[rng.random(full.shape) < missing] = np.nan
+    return np.stack([full, full[:, ANGLE_MIRROR_INDEX]], axis=1)
+
+
+def disagreements(index: PoseIndex, reference: PoseIndex, queries: np.ndarray, top_k: int) -> int:
+    """Queries whose top-k similarities differ between two indexes (ties may swap names)."""
+    bad = 0
+    for q in queries:
+        got = [m.similarity for m in index.query(q, top_k=top_k)]
+        want = [m.similarity for m in reference.query(q, top_k=top_k)]
+        if len(got) != len(want) or not np.allclose(got, want, atol=1e-9):
+            bad += 1
+    return bad
+
+
+def _time(fn, iters: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return 1e3 * (time.perf_counter() - t0) / iters
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--targets-dir", default=os.path.join(os.path.dirname(__file__), "..", "targets"))
+    ap.add_argument("--poses", type=int, default=10000)
+    ap.add_argument("--iters", type=int, default=500)
+    ap.add_argument("--top-k", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    reg = TargetRegistry(args.targets_dir, reload_sec=0)
+    lib_names = reg.list_targets()
+    base = np.stack([reg.get(n).table for n in lib_names])
+    table = np.concatenate([base, synthetic_table(base, max(0, args.poses - len(base)), rng)])
+    names = lib_names + [f"synthetic-{i}" for i in range(len(table) - len(lib_names))]
+    # Per-angle 20% undefined: most queries miss at least one selected angle
+    queries = synthetic_table(base, 50, rng, missing=0.2)[:, 0]
+    complete = synthetic_table(base, 50, rng, missing=0.0)[:, 0]
+
+    # Correctness: brute-force index vs scoring every target with compute_similarity_percent
+    brute = PoseIndex(names[:2000], table[:2000], tree_min=1 << 30)
+    targets = [TargetPose(name=n, json_path="", table=t) for n, t in zip(names[:2000], table[:2000])]
+    mismatches = 0
+    for q in np.concatenate([queries, complete]):
+        got = brute.query(q, top_k=args.top_k)
+        scores = np.array([similarity_percent_from_angles(q, t) for t in targets])
+        want = np.sort(scores)[::-1][:args.top_k]
+        if not np.allclose([m.similarity for m in got], want, atol=1e-9):
+            mismatches += 1
+    n_checked = len(queries) + len(complete)
+    print(f"top-{args.top_k} brute force vs per-target scoring: {n_checked - mismatches}/{n_checked} queries "
+          f"[{'PASS' if not mismatches else 'FAIL'}]")
+
+    index = PoseIndex(names, table, tree_min=1 << 30)
+    tree = PoseIndex(names, table, tree_min=0) if recognition.SCIPY_AVAILABLE else None
+    if tree is not None:
+        # Same table (targets with undefined angles included), queries with and without them
+        for label, qs in (("with undefined angles", queries), ("complete", complete)):
+            bad = disagreements(tree, index, qs, args.top_k)
+            mismatches += bad
+            print(f"top-{args.top_k} KD-tree vs brute force, {len(names)} poses, queries {label}: "
+                  f"{len(qs) - bad}/{len(qs)} [{'PASS' if not bad else 'FAIL'}]")
+    else:
+        print("KD-tree check skipped (scipy not installed)")
+
+    # The path PoseIndex picks for a library of this size
+    uses_tree = recognition.SCIPY_AVAILABLE and len(names) >= recognition.RECOGNIZE_TREE_MIN
+    mark = {uses_tree: " (default)", not uses_tree: ""}
+    for label, q in (("with undefined angles", queries[np.isnan(queries).any(axis=1)][0]), ("complete", complete[0])):
+        t_brute = _time(lambda: index.query(q, top_k=args.top_k), args.iters)
+        print(f"brute force, {len(names)} poses, query {label}: {t_brute:8.4f} ms/query{mark[False]}")
+        if tree is not None:
+            t_tree = _time(lambda: tree.query(q, top_k=args.top_k), args.iters)
+            print(f"KD-tree,     {len(names)} poses, query {label}: {t_tree:8.4f} ms/query{mark[True]}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
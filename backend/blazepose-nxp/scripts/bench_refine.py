@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark + equivalence check for refine_landmarks_from_heatmap.
+
+Compares the batched (vectorized) refinement in blazepose_imx93 against the
+original per-landmark loop on random heatmaps, including edge cases
+(landmarks near the border, outside [0,1], NaN).
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.bench_refine --iters 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from blazepose_imx93 import refine_landmarks_from_heatmap
+
+
+def refine_landmarks_loop(lmks_img: np.ndarray, heatmap: np.ndarray, kernel_size: int = 7, min_confidence: float = 0.0) -> np.ndarray:
+    """Reference implementation: the original per-landmark Python loop."""
+    hm = heatmap
+    if hm.ndim == 4 and hm.shape[0] == 1:
+        hm = hm[0]
+    H, W, C = hm.shape
+    num = min(33, C)
+    out = lmks_img.copy().astype(np.float32)
+    hm_conf = 1.0 / (1.0 + np.exp(-np.clip(hm.astype(np.float32), -80.0, 80.0)))
+    half = kernel_size // 2
+    for i in range(num):
+        x = float(out[i, 0])
+        y = float(out[i, 1])
+        if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+            continue
+        cx = int(x * W)
+        cy = int(y * H)
+        if cx < 0 or cx >= W or cy < 0 or cy >= H:
+            continue
+        x0 = max(0, cx - half)
+        x1 = min(W - 1, cx + half)
+        y0 = max(0, cy - half)
+        y1 = min(H - 1, cy + half)
+        patch = hm_conf[y0:y1+1, x0:x1+1, i]
+        if patch.size == 0:
+            continue
+        max_conf = float(patch.max())
+        sum_w = float(patch.sum())
+        if sum_w <= 0.0 or max_conf < min_confidence:
+            continue
+        xs = np.arange(x0, x1 + 1, dtype=np.float32)[None, :]
+        ys = np.arange(y0, y1 + 1, dtype=np.float32)[:, None]
+        out[i, 0] = (float((patch * xs).sum()) / sum_w) / float(W)
+        out[i, 1] = (float((patch * ys).sum()) / sum_w) / float(H)
+    return out
+
+
+def _random_case(rng: np.random.Generator, channels: int = 39, size: int = 64):
+    heatmap = rng.normal(0.0, 4.0, size=(1, size, size, channels)).astype(np.float32)
+    lmks = rng.uniform(-0.05, 1.05, size=(33, 3)).astype(np.float32)
+    # Border and degenerate cases
+    lmks[0, :2] = (0.0, 0.0)
+    lmks[1, :2] = (1.0, 1.0)
+    lmks[2, :2] = (0.999, 0.001)
+    lmks[3, 0] = np.nan
+    return lmks, heatmap
+
+
+def check_equivalence(cases: int = 200, seed: int = 0) -> float:
+    rng = np.random.default_rng(seed)
+    worst = 0.0
+    for n in range(cases):
+        lmks, heatmap = _random_case(rng, channels=33 if n % 2 else 39)
+        min_conf = 0.0 if n % 3 else 0.9
+        ref = refine_landmarks_loop(lmks, heatmap, 7, min_conf)
+        new = refine_landmarks_from_heatmap(lmks, heatmap, 7, min_conf)
+        if not np.array_equal(np.isnan(ref), np.isnan(new)):
+            raise AssertionError(f"NaN mismatch in case {n}")
+        diff = float(np.nanmax(np.abs(ref - new)))
+        if diff > 1e-5:
+            raise AssertionError(f"Mismatch in case {n}: max abs diff {diff:.3g}")
+        worst = max(worst, diff)
+    return worst
+
+
+def _time(fn, iters: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    return (time.perf_counter() - start) / iters * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark heatmap refinement (loop vs vectorized)")
+    ap.add_argument("--iters", type=int, default=200)
+    ap.add_argument("--cases", type=int, default=200, help="Random cases for the equivalence check")
+    args = ap.parse_args()
+
+    worst = check_equivalence(args.cases)
+    print(f"Equivalence: OK over {args.cases} cases (max abs diff {worst:.2e})")
+
+    lmks, heatmap = _random_case(np.random.default_rng(1))
+    t_loop = _time(lambda: refine_landmarks_loop(lmks, heatmap), args.iters)
+    t_vec = _time(lambda: refine_landmarks_from_heatmap(lmks, heatmap), args.iters)
+    print(f"loop      : {t_loop:8.3f} ms/frame")
+    print(f"vectorized: {t_vec:8.3f} ms/frame  ({t_loop / t_vec:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Stage-level benchmarks for the pose pipeline, runnable on any Linux box.
+
+Interpreters are replaced by scripts.fake_interpreter: with recordings from
+scripts/record_tensors.py (made on the board) the detector and landmark
+outputs of every targets/ image are replayed; without them the fixed
+synthetic tensors are used and the results say so.
+
+Stages (each timed per call, over all images):
+  letterbox         blazepose_imx93._letterbox_to_square_rgb
+  detector_input    preprocess.detector_input (letterbox + resize in one warp)
+  decode_boxes      PoseDetector._decode_boxes on the raw detector boxes
+  nms               nms_iou over the top-100 decoded boxes
+  refine            refine_landmarks_from_heatmap
+  projection        the ROI -> image projection of InferenceService (_stage_project)
+  similarity        compute_similarity_percent against the image's own target
+                    (packed [33,4] keypoints, as the server passes them)
+  infer_keypoints   InferenceService.infer_keypoints end to end (cache cleared)
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.bench_stages --save-baseline bench_baseline.json
+  python -m scripts.bench_stages --baseline bench_baseline.json --threshold 0.15   # exit 1 on regression
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+import blazepose_imx93 as bp
+import preprocess
+from scripts.fake_interpreter import ReplayInterpreter, load_recordings
+from service import inference
+from service.targets import TargetRegistry, compute_similarity_percent
+
+
+def time_calls(fn: Callable[[], object], repeat: int, warmup: int = 2) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(repeat, dtype=np.float64)
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - t0
+    us = samples * 1e6
+    return {"median_us": float(np.median(us)), "p90_us": float(np.percentile(us, 90)), "calls": int(repeat)}
+
+
+def over_images(make: Callable[[str], Callable[[], object]], stems: List[str]) -> Callable[[], object]:
+    """One callable that runs the per-image closure for every image (cost is divided back out)."""
+    calls = [make(s) for s in stems]
+
+    def run():
+        for c in calls:
+            c()
+    return run
+
+
+def build_cases(targets_dir: str, recordings_dir: str):
+    recs = load_recordings(recordings_dir) if os.path.isdir(recordings_dir) else {}
+    bp.TFLiteInterpreter = functools.partial(ReplayInterpreter, recordings=recs)
+    inference.BLAZEPOSE_AUTOTUNE = "0"  # no backend benchmarking / cache writes with fake interpreters
+    svc = inference.InferenceService("pose_detection_quant_vela.tflite", "pose_landmark_full_quant_vela.tflite", None)
+    reg = TargetRegistry(targets_dir)
+    det = svc._detector
+    lmk = svc._landmarkers[svc.variants[0]]
+
+    paths = {os.path.splitext(os.path.basename(p))[0]: p for p in bp.expand_inputs([targets_dir])}
+    stems = [s for s in paths if s in recs] if recs else list(paths)
+    images = {s: bp._load_image_any(paths[s]) for s in stems}
+    encoded = {s: open(paths[s], "rb").read() for s in stems}
+
+    def select(stem: str):
+        for m in (det, lmk):
+            if stem in m.interp.frames:
+                m.interp.select(stem)
+
+    # Per-image inputs for the isolated stages, taken from the (replayed) model outputs
+    raw: Dict[str, dict] = {}
+    for s in stems:
+        select(s)
+        img_det, meta = preprocess.detector_input(images[s], 224)
+        scores, boxes = det._run(img_det)
+        decoded = det._decode_boxes(boxes)
+        top = np.argsort(-scores)[:100]
+        rect = svc._detect_roi(images[s]) or {"xc": 0.5, "yc": 0.5, "w": 0.5, "h": 0.5, "rot": 0.0}
+        roi = preprocess.roi_input(images[s], rect, meta, 256)
+        lm_img, aux_img, kp_prob, presence = svc._landmark(roi, svc.variants[0])
+        heatmap, _ = lmk._heatmap_view()
+        frame = inference._Frame(image=encoded[s], session_id=None, key=f"bench:{s}", variant=svc.variants[0],
+                                 img_hw=images[s].shape[:2], meta_letter=meta, rect=rect,
+                                 lmk=(lm_img, aux_img, kp_prob, presence))
+        svc._stage_project(frame)
+        raw[s] = {
+            "boxes": np.array(boxes), "xyxy": decoded[top, 0:2, :].reshape(-1, 4), "scores": 1.0 / (1.0 + np.exp(-scores[top])),
+            "lm_img": lm_img.copy(), "heatmap": None if heatmap is None else np.array(heatmap),
+            "frame": frame, "kps": frame.result, "target": reg.get(s) or next((reg.get(n) for n in reg.list_targets()), None),
+        }
+
+    def project(s):
+        f = raw[s]["frame"]
+        return lambda: svc._stage_project(f)
+
+    def infer(s):
+        def run():
+            svc._cache.clear()
+            select(s)
+            return svc.infer_keypoints(encoded[s])
+        return run
+
+    cases = {
+        "letterbox": lambda s: (lambda: bp._letterbox_to_square_rgb(images[s], 256)),
+        "detector_input": lambda s: (lambda: preprocess.detector_input(images[s], 224)),
+        "decode_boxes": lambda s: (lambda: det._decode_boxes(raw[s]["boxes"])),
+        "nms": lambda s: (lambda: bp.nms_iou(raw[s]["xyxy"], raw[s]["scores"], 0.3)),
+        "refine": lambda s: (lambda: bp.refine_landmarks_from_heatmap(raw[s]["lm_img"], raw[s]["heatmap"])),
+        "projection": project,
+        "similarity": lambda s: (lambda: compute_similarity_percent(raw[s]["kps"], raw[s]["target"])),
+        "infer_keypoints": infer,
+    }
+    if any(raw[s]["heatmap"] is None for s in stems):
+        del cases["refine"]
+    if any(raw[s]["target"] is None or len(raw[s]["kps"]) == 0 for s in stems):
+        del cases["similarity"]
+    source = f"recorded ({len(stems)} frames from {recordings_dir})" if recs else "synthetic"
+    return cases, stems, source
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\n{'stage':16s} {'baseline us':>12s} {'now us':>10s} {'ratio':>7s}")
+    for name, r in results.items():
+        b = baseline.get(name)
+        if b is None:
+            print(f"{name:16s} {'-':>12s} {r['median_us']:10.1f}")
+            continue
+        ratio = r["median_us"] / b["median_us"] if b["median_us"] > 0 else float("inf")
+        flag = "  REGRESSION" if ratio > 1.0 + threshold else ""
+        print(f"{name:16s} {b['median_us']:12.1f} {r['median_us']:10.1f} {ratio:7.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stage-level pose pipeline benchmarks (fake/replayed interpreters)")
+    ap.add_argument("--targets", default="targets")
+    ap.add_argument("--recordings", default=os.path.join("scripts", "recordings"))
+    ap.add_argument("--repeat", type=int, default=50, help="Timed rounds per stage (each round covers every image)")
+    ap.add_argument("--only", nargs="+", default=None, help="Subset of stages")
+    ap.add_argument("--baseline", default=None, help="Compare against this JSON baseline")
+    ap.add_argument("--threshold", type=float, default=0.15, help="Allowed median slowdown vs baseline (0.15 = +15%%)")
+    ap.add_argument("--save-baseline", dest="save_baseline", default=None, help="Write results as a baseline JSON")
+    args = ap.parse_args()
+
+    cases, stems, source = build_cases(args.targets, args.recordings)
+    print(f"Tensors: {source}; images: {', '.join(stems)}")
+    results: Dict[str, dict] = {}
+    print(f"{'stage':16s} {'median us':>10s} {'p90 us':>10s}")
+    for name, make in cases.items():
+        if args.only and name not in args.only:
+            continue
+        r = time_calls(over_images(make, stems), args.repeat)
+        # Per image call
+        r = {**r, "median_us": r["median_us"] / len(stems), "p90_us": r["p90_us"] / len(stems)}
+        results[name] = r
+        print(f"{name:16s} {r['median_us']:10.1f} {r['p90_us']:10.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"source": source, "machine": platform.machine(), "python": platform.python_version(),
+                       "stages": results}, f, indent=2)
+        print(f"\nSaved baseline: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if base.get("source") != source:
+            print(f"\n[WARN] Baseline tensors were {base.get('source')!r}, now {source!r}")
+        regressions = compare(results, base.get("stages", {}), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo stage slower than baseline by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
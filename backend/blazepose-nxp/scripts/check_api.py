@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Request-handling checks for the HTTP API, runnable on any Linux box.
+
+Interpreters are replaced by scripts.fake_interpreter (synthetic outputs), so
+these exercise the server's error mapping, not model accuracy:
+  - a missing image_path is 404 IMAGE_NOT_FOUND on /similarity (single- and
+    multi-person) and /recognize
+  - an existing image still returns 200
+  - a session frame arriving while the session's previous one is in flight is
+    429 SESSION_BUSY, and a frame finding the pipeline queue full is
+    503 PIPELINE_BUSY, both after SUBMIT_TIMEOUT_SEC instead of a 504
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.check_api
+"""
+import argparse
+import os
+import threading
+from types import SimpleNamespace
+from typing import Callable, List, Tuple
+
+from fastapi.testclient import TestClient
+
+import blazepose_imx93 as bp
+from scripts.fake_interpreter import FakeInterpreter
+from service import inference
+from service.pipeline import StagedPipeline
+from service.targets import TargetRegistry
+
+
+def start_fake_service(targets_dir: str):
+    """InferenceService on fake interpreters, registered as the ready singleton."""
+    bp.TFLiteInterpreter = FakeInterpreter
+    inference.BLAZEPOSE_AUTOTUNE = "0"
+    svc = inference.InferenceService("pose_detection_quant_vela.tflite", "pose_landmark_full_quant_vela.tflite", None)
+    inference.InferenceService._instance = svc
+    inference.InferenceService._ready.set()
+    TargetRegistry.initialize(targets_dir)
+    return svc
+
+
+def busy_session(svc, client: TestClient, body: dict):
+    """POST /similarity while the session's previous frame is still in flight."""
+    gate = svc._sessions.get(body["session_id"]).gate
+    gate.acquire()
+    try:
+        return client.post("/similarity", json=body)
+    finally:
+        gate.release()
+
+
+def full_pipeline(svc, client: TestClient, body: dict):
+    """POST /similarity while the pipeline is stuck with its input queue full."""
+    release = threading.Event()
+    saved = svc._pipeline
+    svc._pipeline = StagedPipeline([("hold", lambda job: release.wait())], queue_size=1)
+    try:
+        for _ in range(2):  # one held by the stage, one waiting in the queue
+            svc._pipeline.submit(SimpleNamespace(result=None), timeout=5)
+        return client.post("/similarity", json=body)
+    finally:
+        release.set()
+        svc._pipeline.close()
+        svc._pipeline = saved
+
+
+def cases(svc, target: str, image: str) -> List[Tuple[str, Callable[[TestClient], object], int, str]]:
+    missing = os.path.join(os.path.dirname(image), "does-not-exist.jpg")
+    return [
+        ("similarity, missing image", lambda c: c.post("/similarity", json={"image_path": missing, "target_pose": target}),
+         404, "IMAGE_NOT_FOUND"),
+        ("similarity multi-person, missing image",
+         lambda c: c.post("/similarity", json={"image_path": missing, "target_pose": target, "multi_person": True}),
+         404, "IMAGE_NOT_FOUND"),
+        ("recognize, missing image", lambda c: c.post("/recognize", json={"image_path": missing}), 404, "IMAGE_NOT_FOUND"),
+        ("similarity, existing image", lambda c: c.post("/similarity", json={"image_path": image, "target_pose": target}),
+         200, None),
+        ("similarity, session frame in flight",
+         lambda c: busy_session(svc, c, {"image_path": image, "target_pose": target, "session_id": "check-busy"}),
+         429, "SESSION_BUSY"),
+        ("similarity, pipeline queue full",
+         lambda c: full_pipeline(svc, c, {"image_path": image, "target_pose": target, "session_id": "check-full"}),
+         503, "PIPELINE_BUSY"),
+        ("similarity, session frame after the busy one",
+         lambda c: c.post("/similarity", json={"image_path": image, "target_pose": target, "session_id": "check-busy"}),
+         200, None),
+    ]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--targets-dir", default=os.path.join(os.path.dirname(__file__), "..", "targets"))
+    args = ap.parse_args()
+
+    svc = start_fake_service(args.targets_dir)
+    from api import server  # after the fake service is registered
+    server.SUBMIT_TIMEOUT_SEC = 0.2
+
+    target = TargetRegistry.instance().list_targets()[0]
+    image = next(p for p in bp.expand_inputs([args.targets_dir]) if not p.endswith("_annotated.png"))
+    client = TestClient(server.app)  # no context manager: the startup hook would load the real models
+    failures = 0
+    for name, call, status, code in cases(svc, target, image):
+        r = call(client)
+        detail = r.json().get("detail") if r.status_code >= 400 else None
+        got = detail.get("error_code") if isinstance(detail, dict) else None
+        ok = r.status_code == status and got == code
+        failures += not ok
+        print(f"[{'OK' if ok else 'FAIL'}] {name}: {r.status_code} {got or ''}".rstrip())
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Compile the target poses into one binary library (see service.target_library).
+
+By default the existing *_landmarks.json files are ingested. With --from-images
+the pose pipeline runs over the target images instead (on the board, or with
+--backend cpu:N off-board for non-Vela models), so no JSON is needed.
+TargetRegistry maps <targets_dir>/targets.poselib automatically when it exists.
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.compile_targets                      # targets/*_landmarks.json -> targets/targets.poselib
+  python -m scripts.compile_targets --from-images --inputs targets
+"""
+import argparse
+import glob
+import os
+import sys
+from typing import Dict
+
+import numpy as np
+
+from scripts.pose_similarity import load_pose, pack_landmarks
+from service.target_library import TargetLibrary, write_library
+from service.targets import LIBRARY_FILENAME, TargetRegistry
+
+
+def pose_from_json(path: str) -> np.ndarray:
+    """*_landmarks.json -> float32 [33,4] (x, y, z, score); missing keypoints stay zero."""
+    return pack_landmarks(load_pose(path))
+
+
+def poses_from_json(targets_dir: str) -> Dict[str, np.ndarray]:
+    poses = {}
+    for path in sorted(glob.glob(os.path.join(targets_dir, "*_landmarks.json"))):
+        try:
+            poses[TargetRegistry._target_name(path)] = pose_from_json(path)
+        except Exception as e:
+            print(f"[WARN] Skipping {path}: {e}", file=sys.stderr)
+    return poses
+
+
+def poses_from_images(args) -> Dict[str, np.ndarray]:
+    import blazepose_imx93 as bp
+
+    delegate = args.delegate or None
+    detector = bp.PoseDetector(args.det, ethosu_delegate=delegate, backend=args.backend)
+    landmarker = bp.PoseLandmarkerLite(args.lmk, ethosu_delegate=delegate, backend=args.backend)
+    poses = {}
+    for path in bp.expand_inputs(args.inputs):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem.endswith("_annotated"):
+            continue
+        res = bp.estimate_pose(detector, landmarker, bp._load_image_any(path))
+        if res is None:
+            print(f"[WARN] No person in {path}; skipped", file=sys.stderr)
+            continue
+        poses[stem] = res[0]
+    return poses
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile target poses into a memory-mappable library")
+    ap.add_argument("--targets-dir", default="targets", help="Directory with *_landmarks.json (and the images)")
+    ap.add_argument("-o", "--out", default=None, help=f"Output file (default: <targets-dir>/{LIBRARY_FILENAME})")
+    ap.add_argument("--from-images", action="store_true", help="Run the pose pipeline instead of reading JSON")
+    ap.add_argument("--inputs", nargs="+", default=None, help="Images, directories, globs or @filelist (default: targets-dir)")
+    ap.add_argument("--det", default="pose_detection_quant_vela.tflite")
+    ap.add_argument("--lmk", default="pose_landmark_full_quant_vela.tflite")
+    ap.add_argument("--delegate", default="/usr/lib/libethosu_delegate.so")
+    ap.add_argument("--backend", default=None, help="Interpreter backend (see blazepose_imx93 --backend)")
+    args = ap.parse_args()
+
+    if args.from_images:
+        args.inputs = args.inputs or [args.targets_dir]
+        poses = poses_from_images(args)
+    else:
+        poses = poses_from_json(args.targets_dir)
+    out = args.out or os.path.join(args.targets_dir, LIBRARY_FILENAME)
+    write_library(out, poses)
+    lib = TargetLibrary(out)
+    print(f"Wrote {out}: {len(lib)} poses, {os.path.getsize(out)} bytes")
+
+
+if __name__ == "__main__":
+    main()
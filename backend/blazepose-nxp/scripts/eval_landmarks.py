@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Accuracy vs latency evaluation of pipeline variants over an image set.
+
+Runs every image that has reference landmarks (<stem>_landmarks.json next to
+it, or in --refs) through each variant and compares the output with the
+reference using the scripts.analyze_landmarks metrics: per-keypoint XY pixel
+error overall and per region, the linear Z fit, and the residual left after a
+best-fit similarity transform. Per-image latency covers decode through
+projection to original pixels (median over --repeat runs).
+
+A variant is name:key=value,... with keys
+  lmk       landmark model             (default --lmk)
+  det       detector model             (default --det)
+  delegate  delegate library, none = CPU (default --delegate)
+  backend   interpreter backend        (default --backend)
+  decode    reduced JPEG decode, min long side; 0 = full resolution (default --decode-min-side)
+  refine    heatmap refinement 1/0     (default 1)
+The first variant is the baseline: with --tolerance the run exits 1 when
+another variant's mean XY error exceeds the baseline's by more than that many
+pixels.
+
+Usage (from backend/blazepose-nxp):
+  python -m scripts.eval_landmarks --inputs targets -o eval_report.json \\
+      --variant full --variant full-cpu:delegate=none \\
+      --variant full-norefine:refine=0 --variant full-fulldecode:decode=0 \\
+      --variant lite:lmk=pose_landmark_lite_quant_vela.tflite --tolerance 2
+
+Reduced-decode levels of the server (DECODE_MIN_LONG_SIDE; "auto" decodes untracked
+frames with a long side >= 512), full-resolution decode as the baseline:
+  python -m scripts.eval_landmarks --inputs targets -o eval_decode.json \\
+      --variant full-decode:decode=0 --variant decode-512:decode=512 \\
+      --variant decode-320:decode=320 --tolerance 2
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+import blazepose_imx93 as bp
+from scripts.analyze_landmarks import error_stats, region_errors, similarity_transform, xy_errors, z_fit
+from scripts.pose_similarity import KEYPOINT_INDEX, KEYPOINT_NAMES, load_pose, pack_landmarks
+
+VARIANT_KEYS = ("lmk", "det", "delegate", "backend", "decode", "refine")
+
+
+def parse_variant(spec: str, args) -> dict:
+    """name:key=value,... -> variant config, unset keys taken from the command-line defaults."""
+    name, _, rest = spec.partition(":")
+    v = {"name": name.strip(), "lmk": args.lmk, "det": args.det, "delegate": args.delegate,
+         "backend": args.backend, "decode": args.decode_min_side, "refine": "1"}
+    for item in rest.split(","):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition("=")
+        if not sep or key.strip() not in VARIANT_KEYS:
+            raise SystemExit(f"Invalid variant entry {item!r} in {spec!r} (expected key=value, keys: {', '.join(VARIANT_KEYS)})")
+        v[key.strip()] = value.strip()
+    if not v["name"]:
+        raise SystemExit(f"Variant without a name: {spec!r}")
+    v["decode"] = int(v["decode"])
+    v["refine"] = str(v["refine"]).lower() not in ("0", "false", "no", "off")
+    if not v["delegate"] or str(v["delegate"]).lower() == "none":
+        v["delegate"] = None
+    return v
+
+
+def load_references(paths: List[str], refs_dir: Optional[str]):
+    """Images with a reference -> (paths, stems, float32 [n,33,4] references, bool [n,33] keypoint present)."""
+    kept, stems, refs, present = [], [], [], []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem.endswith("_annotated"):
+            continue
+        ref_path = os.path.join(refs_dir or os.path.dirname(path), f"{stem}_landmarks.json")
+        if not os.path.exists(ref_path):
+            print(f"[WARN] No reference for {path}; skipped", file=sys.stderr)
+            continue
+        kps = load_pose(ref_path)
+        mask = np.zeros(len(KEYPOINT_NAMES), dtype=bool)
+        mask[[KEYPOINT_INDEX[k["name"]] for k in kps if k.get("name") in KEYPOINT_INDEX]] = True
+        kept.append(path)
+        stems.append(stem)
+        refs.append(pack_landmarks(kps))
+        present.append(mask)
+    if not kept:
+        raise SystemExit("No images with reference landmarks")
+    return kept, stems, np.stack(refs), np.stack(present)
+
+
+def run_variant(v: dict, paths: List[str], repeat: int):
+    """Landmarks [n,33,4] in original pixels (NaN rows where nobody was found), per-image latency
+    in ms [n], and the average stage times."""
+    detector = bp.PoseDetector(v["det"], ethosu_delegate=v["delegate"], backend=v["backend"])
+    landmarker = bp.PoseLandmarkerLite(v["lmk"], ethosu_delegate=v["delegate"], backend=v["backend"])
+    landmarker.refine = v["refine"]
+    timer = bp.StageTimer()
+
+    def once(path: str, timer=None):
+        t0 = time.perf_counter()
+        img_rgb, scale, img_det, meta_letter, t_decode, t_prep = bp._prepare_frame(path, v["decode"])
+        res = bp.estimate_pose(detector, landmarker, img_rgb, img_det, meta_letter, timer=timer, decode_scale=scale)
+        if timer is not None:
+            timer.add("decode", t_decode)
+            timer.add("detector_input", t_prep)
+        return res, time.perf_counter() - t0
+
+    once(paths[0])  # warm-up: delegate graph compile, first-invoke allocation
+    preds = np.full((len(paths), len(KEYPOINT_NAMES), 4), np.nan, dtype=np.float32)
+    latency = np.empty(len(paths), dtype=np.float64)
+    for i, path in enumerate(paths):
+        samples = []
+        for r in range(max(1, repeat)):
+            res, dt = once(path, timer if r == 0 else None)
+            samples.append(dt)
+        latency[i] = 1e3 * float(np.median(samples))
+        if res is not None:
+            preds[i] = res[0]
+    return preds, latency, timer.averages_ms()
+
+
+def evaluate(preds: np.ndarray, refs: np.ndarray, present: np.ndarray, stems: List[str], latency: np.ndarray) -> dict:
+    """Accuracy metrics of one variant over all images, vectorized across images."""
+    found = ~np.isnan(preds[:, 0, 0])
+    valid = present & found[:, None]
+    e = np.where(valid, xy_errors(np.nan_to_num(preds), refs), np.nan)  # [n,33]
+
+    # Residual after the best-fit similarity transform, all images at once
+    A = np.nan_to_num(preds[..., :2]).astype(np.float64)
+    B = refs[..., :2].astype(np.float64)
+    s, R, t, _ = similarity_transform(A, B, valid)
+    aligned = s[:, None, None] * np.einsum("nij,nkj->nki", R, A) + t[:, None, :]
+    res = np.where(valid, np.sqrt(((aligned - B) ** 2).sum(-1)), np.nan)
+
+    zv = valid & (refs[..., 2] != 0)
+    z = z_fit(preds[..., 2][zv], refs[..., 2][zv]) if zv.sum() >= 2 else None
+    return {
+        "summary": {
+            "images": int(len(stems)),
+            "with_person": int(found.sum()),
+            "no_person": int((~found).sum()),
+            "latency_ms": {"mean": float(latency.mean()), "median": float(np.median(latency)),
+                           "p90": float(np.percentile(latency, 90)), "max": float(latency.max())},
+            "xy_error_px": error_stats(e),
+            "region_xy_error_px": region_errors(e, KEYPOINT_NAMES),
+            "aligned_residual_px": error_stats(res),
+            "z": z,
+        },
+        "images": [
+            {"image": stem, "person": bool(found[i]), "latency_ms": float(latency[i]),
+             "xy_error_mean_px": error_stats(e[i])["mean"], "aligned_residual_mean_px": error_stats(res[i])["mean"]}
+            for i, stem in enumerate(stems)
+        ],
+    }
+
+
+def _json_safe(obj):
+    """NaN/inf -> null so the report stays strict JSON."""
+    if isinstance(obj, dict):
+        return {k: _json_safe(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_json_safe(v) for v in obj]
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--inputs", nargs="+", default=["targets"], help="Images, directories, globs or @filelist")
+    ap.add_argument("--refs", default=None, help="Directory with <stem>_landmarks.json (default: next to each image)")
+    ap.add_argument("--variant", action="append", default=None, help="name:key=value,... (repeatable; see above)")
+    ap.add_argument("--det", default="pose_detection_quant_vela.tflite")
+    ap.add_argument("--lmk", default="pose_landmark_full_quant_vela.tflite")
+    ap.add_argument("--delegate", default="/usr/lib/libethosu_delegate.so")
+    ap.add_argument("--backend", default=None, help="Interpreter backend (see blazepose_imx93 --backend)")
+    ap.add_argument("--decode-min-side", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per image; latency is their median")
+    ap.add_argument("--tolerance", type=float, default=None, help="Max mean XY error increase (px) over the first variant")
+    ap.add_argument("-o", "--out", default="eval_report.json")
+    args = ap.parse_args()
+
+    variants = [parse_variant(s, args) for s in (args.variant or ["default"])]
+    paths, stems, refs, present = load_references(bp.expand_inputs(args.inputs), args.refs)
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "platform": platform.platform(),
+              "images": len(paths), "variants": []}
+    for v in variants:
+        print(f"[{v['name']}] {len(paths)} images ...", flush=True)
+        try:
+            preds, latency, stages = run_variant(v, paths, args.repeat)
+        except Exception as e:
+            print(f"[WARN] variant {v['name']} failed: {e}", file=sys.stderr)
+            report["variants"].append({"name": v["name"], "config": v, "error": str(e)})
+            continue
+        out = evaluate(preds, refs, present, stems, latency)
+        out["summary"]["stage_avg_ms"] = stages
+        report["variants"].append({"name": v["name"], "config": v, **out})
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(_json_safe(report), f, indent=2)
+
+    done = [r for r in report["variants"] if "summary" in r]
+    print(f"\n{'variant':18s} {'lat ms':>8s} {'p90 ms':>8s} {'xy mean':>8s} {'xy p90':>8s} {'aligned':>8s} {'z corr':>7s} {'miss':>5s}")
+    for r in done:
+        s = r["summary"]
+        zc = s["z"]["corr"] if s["z"] else float("nan")
+        print(f"{r['name']:18s} {s['latency_ms']['median']:8.2f} {s['latency_ms']['p90']:8.2f} "
+              f"{s['xy_error_px']['mean']:8.2f} {s['xy_error_px']['p90']:8.2f} "
+              f"{s['aligned_residual_px']['mean']:8.2f} {zc:7.3f} {s['no_person']:5d}")
+    print(f"Report: {args.out}")
+
+    failed = len(done) < len(report["variants"])
+    if args.tolerance is not None and done:
+        base = done[0]["summary"]["xy_error_px"]["mean"]
+        for r in done[1:]:
+            delta = r["summary"]["xy_error_px"]["mean"] - base
+            if not delta <= args.tolerance:
+                print(f"[FAIL] {r['name']}: mean XY error {delta:+.2f} px vs {done[0]['name']} (tolerance {args.tolerance})")
+                failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Stand-in for tflite_runtime's Interpreter, for benchmarking off-board.
+
+The Vela models only run with the Ethos-U delegate, so scripts that need to
+exercise PoseDetector / PoseLandmarkerLite on a dev box swap this class in:
+
+    import blazepose_imx93 as bp
+    from scripts.fake_interpreter import FakeInterpreter
+    bp.TFLiteInterpreter = FakeInterpreter
+
+Tensor specs match the shipped *_quant_vela.tflite models. invoke() copies
+fixed synthetic outputs into preallocated buffers, so it allocates nothing
+itself and per-frame measurements only see the pipeline's own work.
+
+ReplayInterpreter serves output tensors recorded on the board instead
+(scripts/record_tensors.py writes one <image>.npz per targets/ image):
+
+    recs = load_recordings("scripts/recordings")
+    bp.TFLiteInterpreter = functools.partial(ReplayInterpreter, recordings=recs)
+    det.interp.select("tree")   # next invoke() returns tree.png's detector outputs
+"""
+from __future__ import annotations
+import glob
+import os
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def _detail(name: str, index: int, shape, dtype=np.float32, quantization=(0.0, 0)) -> dict:
+    return {"name": name, "index": index, "shape": np.array(shape, dtype=np.int32), "dtype": dtype, "quantization": quantization}
+
+
+DETECTOR_SPEC = {
+    "inputs": [_detail("input_1:0", 0, [1, 224, 224, 3])],
+    "outputs": [_detail("Identity_1:0", 1, [1, 2254, 1]), _detail("Identity:0", 2, [1, 2254, 12])],
+}
+
+LANDMARK_SPEC = {
+    "inputs": [_detail("input_1:0", 0, [1, 256, 256, 3])],
+    "outputs": [
+        _detail("Identity_2:0", 1, [1, 256, 256, 1]),   # segmentation
+        _detail("Identity_3:0", 2, [1, 64, 64, 39]),    # heatmap
+        _detail("Identity_1:0", 3, [1, 1]),             # presence
+        _detail("Identity:0", 4, [1, 195]),             # image landmarks 39x5
+        _detail("Identity_4:0", 5, [1, 117]),           # world landmarks 39x3
+    ],
+}
+
+
+def spec_for_model(model_path: str) -> dict:
+    return DETECTOR_SPEC if "detection" in model_path else LANDMARK_SPEC
+
+
+def model_kind(model_path: str) -> str:
+    """Recording section for a model: "detector" or "landmark"."""
+    return "detector" if "detection" in model_path else "landmark"
+
+
+# Recording = {image stem: {"detector": {tensor name: array}, "landmark": {tensor name: array}}}
+Recording = Dict[str, Dict[str, Dict[str, np.ndarray]]]
+
+
+def save_recording(path: str, tensors: Dict[str, Dict[str, np.ndarray]]):
+    """One image's outputs as an .npz with keys "<kind>/<tensor name>"."""
+    np.savez_compressed(path, **{f"{kind}/{name}": arr for kind, outs in tensors.items() for name, arr in outs.items()})
+
+
+def load_recordings(directory: str) -> Recording:
+    recs: Recording = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.npz"))):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        with np.load(path) as data:
+            frame: Dict[str, Dict[str, np.ndarray]] = {}
+            for key in data.files:
+                kind, _, name = key.partition("/")
+                frame.setdefault(kind, {})[name] = data[key]
+        recs[stem] = frame
+    return recs
+
+
+def synthetic_outputs(spec: dict, seed: int = 0) -> Dict[int, np.ndarray]:
+    """Plausible outputs: one confident detection / a standing pose with a peaked heatmap."""
+    rng = np.random.default_rng(seed)
+    outs: Dict[int, np.ndarray] = {}
+    if spec is DETECTOR_SPEC:
+        scores = rng.normal(-6.0, 1.0, size=(1, 2254, 1)).astype(np.float32)
+        scores[0, 1000, 0] = 4.0
+        boxes = rng.normal(0.0, 2.0, size=(1, 2254, 12)).astype(np.float32)
+        boxes[0, 1000, 2:4] = (120.0, 180.0)     # box size in 224 px
+        boxes[0, 1000, 4:6] = (0.0, 10.0)        # mid hip
+        boxes[0, 1000, 6:8] = (0.0, -80.0)       # full-body scale/rotation point
+        outs[1], outs[2] = scores, boxes
+        return outs
+    lmk = np.zeros((39, 5), dtype=np.float32)
+    lmk[:, 0] = rng.uniform(96.0, 160.0, size=39)
+    lmk[:, 1] = np.linspace(40.0, 220.0, 39)
+    lmk[:, 2] = rng.normal(0.0, 10.0, size=39)
+    lmk[:, 3:] = 3.0
+    heat = np.full((1, 64, 64, 39), -6.0, dtype=np.float32)
+    for c in range(39):
+        heat[0, int(lmk[c, 1] / 4), int(lmk[c, 0] / 4), c] = 4.0
+    outs[1] = np.zeros((1, 256, 256, 1), dtype=np.float32)
+    outs[2] = heat
+    outs[3] = np.array([[5.0]], dtype=np.float32)
+    outs[4] = lmk.reshape(1, 195)
+    outs[5] = rng.normal(0.0, 0.3, size=(1, 117)).astype(np.float32)
+    return outs
+
+
+class FakeInterpreter:
+    """Duck-typed tflite_runtime.interpreter.Interpreter."""
+
+    def __init__(self, model_path: str, experimental_delegates: Optional[list] = None, num_threads: Optional[int] = None,
+                 experimental_op_resolver_type=None, outputs: Optional[Dict[int, np.ndarray]] = None):
+        self.model_path = model_path
+        self._spec = spec_for_model(model_path)
+        self._buffers: Dict[int, np.ndarray] = {
+            d["index"]: np.zeros(tuple(d["shape"]), dtype=d["dtype"]) for d in self._spec["inputs"] + self._spec["outputs"]
+        }
+        self._outputs = outputs if outputs is not None else synthetic_outputs(self._spec)
+        self.invocations = 0
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self) -> List[dict]:
+        return [dict(d) for d in self._spec["inputs"]]
+
+    def get_output_details(self) -> List[dict]:
+        return [dict(d) for d in self._spec["outputs"]]
+
+    def set_tensor(self, index: int, value: np.ndarray):
+        buf = self._buffers[index]
+        if value.dtype != buf.dtype or value.shape != buf.shape:
+            raise ValueError(f"Cannot set tensor {index}: got {value.dtype}{value.shape}, expected {buf.dtype}{buf.shape}")
+        np.copyto(buf, value)
+
+    def get_tensor(self, index: int) -> np.ndarray:
+        return self._buffers[index].copy()
+
+    def tensor(self, index: int) -> Callable[[], np.ndarray]:
+        buf = self._buffers[index]
+        return lambda: buf
+
+    def invoke(self):
+        for index, value in self._outputs.items():
+            np.copyto(self._buffers[index], value)
+        self.invocations += 1
+
+
+class ReplayInterpreter(FakeInterpreter):
+    """FakeInterpreter whose outputs come from recorded tensors (matched by tensor name).
+    select(stem) picks the recorded frame; without a recording for this model kind
+    it keeps the synthetic outputs.
+    """
+
+    def __init__(self, model_path: str, experimental_delegates: Optional[list] = None, num_threads: Optional[int] = None,
+                 experimental_op_resolver_type=None, recordings: Optional[Recording] = None):
+        super().__init__(model_path, experimental_delegates, num_threads, experimental_op_resolver_type)
+        self._kind = model_kind(model_path)
+        self._by_name = {d["name"]: d["index"] for d in self._spec["outputs"]}
+        self._recordings = {stem: frame[self._kind] for stem, frame in (recordings or {}).items() if self._kind in frame}
+        self.selected: Optional[str] = None
+        if self._recordings:
+            self.select(next(iter(self._recordings)))
+
+    @property
+    def frames(self) -> List[str]:
+        return list(self._recordings)
+
+    def select(self, stem: str):
+        outs = self._recordings[stem]
+        missing = set(self._by_name) - set(outs)
+        if missing:
+            raise KeyError(f"Recording {stem!r} has no {self._kind} tensors {sorted(missing)}")
+        self._outputs = {self._by_name[name]: np.asarray(outs[name], dtype=self._buffers[self._by_name[name]].dtype)
+                         .reshape(self._buffers[self._by_name[name]].shape) for name in self._by_name}
+        self.selected = stem
@@ -4,6 +4,8 @@ import json
 import math
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
 Keypoint = Dict[str, float]
 Pose = Dict[str, List[Keypoint]]
 
@@ -33,97 +35,158 @@ def load_pose(path: str) -> List[Keypoint]:
     raise ValueError(f"Unrecognized landmark JSON format in {path}")
 
 
-def kpd_by_name(keypoints: List[Keypoint]) -> Dict[str, Keypoint]:
-    return {str(kp.get("name")): kp for kp in keypoints if "name" in kp}
-
-
-def distance(a: Keypoint, b: Keypoint) -> float:
-    return math.hypot(float(a["x"]) - float(b["x"]), float(a["y"]) - float(b["y"]))
-
-
-def calc_angle(a: Keypoint, b: Keypoint, c: Keypoint) -> Optional[float]:
-    ab = distance(a, b)
-    bc = distance(b, c)
-    ac = distance(a, c)
-    if ab == 0 or bc == 0:
-        return None
-    # Law of cosines, clamp numerical noise
-    cos_angle = ((ab ** 2) + (bc ** 2) - (ac ** 2)) / (2 * ab * bc)
-    cos_angle = max(-1.0, min(1.0, cos_angle))
-    angle_deg = math.degrees(math.acos(cos_angle))
-    return angle_deg
-
-
-def angle_with_confidence(a: Optional[Keypoint], b: Optional[Keypoint], c: Optional[Keypoint]) -> Optional[float]:
-    if not a or not b or not c:
-        return None
-    if (
-        float(a.get("score", 0.0)) >= CONF_THRESHOLD
-        and float(b.get("score", 0.0)) >= CONF_THRESHOLD
-        and float(c.get("score", 0.0)) >= CONF_THRESHOLD
-    ):
-        return calc_angle(a, b, c)
-    return None
-
-
-def get_selected_angles(keypoints: List[Keypoint], selected: List[str]) -> List[Optional[float]]:
-    kps = kpd_by_name(keypoints)
-    leftShoulder = kps.get("left_shoulder")
-    leftElbow = kps.get("left_elbow")
-    leftWrist = kps.get("left_wrist")
-    leftHip = kps.get("left_hip")
-    leftKnee = kps.get("left_knee")
-    leftAnkle = kps.get("left_ankle")
-
-    rightShoulder = kps.get("right_shoulder")
-    rightElbow = kps.get("right_elbow")
-    rightWrist = kps.get("right_wrist")
-    rightHip = kps.get("right_hip")
-    rightKnee = kps.get("right_knee")
-    rightAnkle = kps.get("right_ankle")
-
-    angles: List[Optional[float]] = []
-
-    if "leftElbowAngle" in selected:
-        angles.append(angle_with_confidence(leftShoulder, leftElbow, leftWrist))
-    if "leftShoulderAngle" in selected:
-        angles.append(angle_with_confidence(leftElbow, leftShoulder, leftHip))
-    if "leftHipAngle" in selected:
-        angles.append(angle_with_confidence(leftShoulder, leftHip, leftKnee))
-    if "leftKneeAngle" in selected:
-        angles.append(angle_with_confidence(leftHip, leftKnee, leftAnkle))
-
-    if "rightElbowAngle" in selected:
-        angles.append(angle_with_confidence(rightShoulder, rightElbow, rightWrist))
-    if "rightShoulderAngle" in selected:
-        angles.append(angle_with_confidence(rightElbow, rightShoulder, rightHip))
-    if "rightHipAngle" in selected:
-        angles.append(angle_with_confidence(rightShoulder, rightHip, rightKnee))
-    if "rightKneeAngle" in selected:
-        angles.append(angle_with_confidence(rightHip, rightKnee, rightAnkle))
-
-    return angles
-
-
-def key_angles_similarity(pose1: List[Keypoint], pose2: List[Keypoint], selected: List[str]) -> float:
-    """Implements app/lib/poseSim.ts + simPose.ts KEY_ANGLES strategy.
-    Returns similarity in [0,1].
+# BlazePose keypoint order; packed arrays are indexed by it
+KEYPOINT_NAMES = [
+    "nose",
+    "left_eye_inner", "left_eye", "left_eye_outer",
+    "right_eye_inner", "right_eye", "right_eye_outer",
+    "left_ear", "right_ear",
+    "mouth_left", "mouth_right",
+    "left_shoulder", "right_shoulder",
+    "left_elbow", "right_elbow",
+    "left_wrist", "right_wrist",
+    "left_pinky", "right_pinky",
+    "left_index", "right_index",
+    "left_thumb", "right_thumb",
+    "left_hip", "right_hip",
+    "left_knee", "right_knee",
+    "left_ankle", "right_ankle",
+    "left_heel", "right_heel",
+    "left_foot_index", "right_foot_index",
+]
+KEYPOINT_INDEX = {name: i for i, name in enumerate(KEYPOINT_NAMES)}
+
+
+def _swap_side(name: str) -> str:
+    if name.startswith("left_"):
+        return "right_" + name[len("left_"):]
+    if name.startswith("right_"):
+        return "left_" + name[len("right_"):]
+    return name
+
+
+# Left/right mirror as an index permutation: packed[MIRROR_INDEX] is the swapped pose
+MIRROR_INDEX = np.array([KEYPOINT_INDEX[_swap_side(n)] for n in KEYPOINT_NAMES], dtype=np.intp)
+
+# Angle name -> (a, b, c) keypoints; the angle is measured at b. Table order is output order.
+ANGLE_TRIPLETS: Dict[str, Tuple[str, str, str]] = {
+    "leftElbowAngle": ("left_shoulder", "left_elbow", "left_wrist"),
+    "leftShoulderAngle": ("left_elbow", "left_shoulder", "left_hip"),
+    "leftHipAngle": ("left_shoulder", "left_hip", "left_knee"),
+    "leftKneeAngle": ("left_hip", "left_knee", "left_ankle"),
+    "rightElbowAngle": ("right_shoulder", "right_elbow", "right_wrist"),
+    "rightShoulderAngle": ("right_elbow", "right_shoulder", "right_hip"),
+    "rightHipAngle": ("right_shoulder", "right_hip", "right_knee"),
+    "rightKneeAngle": ("right_hip", "right_knee", "right_ankle"),
+}
+ANGLE_NAMES = list(ANGLE_TRIPLETS)
+# [num_angles, 3] keypoint indices
+ANGLE_INDEX = np.array([[KEYPOINT_INDEX[n] for n in t] for t in ANGLE_TRIPLETS.values()], dtype=np.intp)
+
+
+def _swap_angle_side(name: str) -> str:
+    if name.startswith("left"):
+        return "right" + name[len("left"):]
+    if name.startswith("right"):
+        return "left" + name[len("right"):]
+    return name
+
+
+# The mirrored pose's angles are a column permutation of the pose's own: angles[..., ANGLE_MIRROR_INDEX]
+ANGLE_MIRROR_INDEX = np.array([ANGLE_NAMES.index(_swap_angle_side(n)) for n in ANGLE_NAMES], dtype=np.intp)
+
+
+def pack_keypoints(keypoints) -> np.ndarray:
+    """Keypoints -> float64 [33,3] (x, y, score) in KEYPOINT_NAMES order.
+    Accepts a list of {name, x, y, score} dicts or an already packed array: [33,3]
+    (x, y, score) or [33,4] (x, y, z, score) as produced by the inference service.
+    Missing keypoints get score 0, so their angles are dropped like before.
+    """
+    if isinstance(keypoints, np.ndarray):
+        arr = keypoints.astype(np.float64, copy=False)
+        arr = arr[:, [0, 1, 3]] if arr.shape[-1] == 4 else arr
+        if arr.shape[0] < len(KEYPOINT_NAMES):  # e.g. [0,4] for "no person"
+            arr = np.concatenate([arr, np.zeros((len(KEYPOINT_NAMES) - arr.shape[0], 3))])
+        return arr
+    packed = np.zeros((len(KEYPOINT_NAMES), 3), dtype=np.float64)
+    for kp in keypoints:
+        i = KEYPOINT_INDEX.get(str(kp.get("name")))
+        if i is not None:
+            packed[i] = (float(kp["x"]), float(kp["y"]), float(kp.get("score", 0.0)))
+    return packed
+
+
+def pack_landmarks(keypoints: List[Keypoint]) -> np.ndarray:
+    """Keypoint dicts -> float32 [33,4] (x, y, z, score) in KEYPOINT_NAMES order; missing keypoints stay zero."""
+    packed = np.zeros((len(KEYPOINT_NAMES), 4), dtype=np.float32)
+    for kp in keypoints:
+        i = KEYPOINT_INDEX.get(str(kp.get("name")))
+        if i is not None:
+            packed[i] = (float(kp["x"]), float(kp["y"]), float(kp.get("z", 0.0)), float(kp.get("score", 0.0)))
+    return packed
+
+
+def angle_columns(selected: List[str]) -> np.ndarray:
+    """Indices into ANGLE_NAMES of the selected angles, in table order (unknown names are ignored)."""
+    return np.array([i for i, n in enumerate(ANGLE_NAMES) if n in selected], dtype=np.intp)
+
+
+def compute_angles(packed: np.ndarray, columns: Optional[np.ndarray] = None) -> np.ndarray:
+    """Joint angles in degrees for packed [..., 33, 3] keypoints -> [..., K]; NaN where an
+    angle is undefined (a keypoint below CONF_THRESHOLD or a zero-length segment).
+    Same law-of-cosines formula as the TS implementation, over all angles at once.
     """
-    origin_angles = get_selected_angles(pose1, selected)
-    target_angles = get_selected_angles(pose2, selected)
+    tri = ANGLE_INDEX if columns is None else ANGLE_INDEX[columns]
+    pts = packed[..., tri, :]  # [..., K, 3, 3]
+    a, b, c = pts[..., 0, :], pts[..., 1, :], pts[..., 2, :]
+    ab = np.hypot(a[..., 0] - b[..., 0], a[..., 1] - b[..., 1])
+    bc = np.hypot(b[..., 0] - c[..., 0], b[..., 1] - c[..., 1])
+    ac = np.hypot(a[..., 0] - c[..., 0], a[..., 1] - c[..., 1])
+    valid = (pts[..., 2] >= CONF_THRESHOLD).all(axis=-1) & (ab != 0) & (bc != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_angle = (ab ** 2 + bc ** 2 - ac ** 2) / (2 * ab * bc)
+    angles = np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+    return np.where(valid, angles, np.nan)
+
+
+def compute_angles_mirrored(packed: np.ndarray, columns: Optional[np.ndarray] = None) -> np.ndarray:
+    """[2, K] angles: row 0 as given, row 1 with left and right swapped."""
+    return compute_angles(np.stack([packed, packed[MIRROR_INDEX]]), columns)
+
 
-    # Sum differences only where both are present, divide by total slots (TS code behavior)
-    total_diff = 0.0
-    for a, b in zip(origin_angles, target_angles):
-        if a is not None and b is not None:
-            total_diff += abs(a - b)
+def angles_to_list(angles: np.ndarray) -> List[Optional[float]]:
+    return [None if math.isnan(a) else a for a in angles.tolist()]
 
-    if all(a is None for a in origin_angles):
-        return 0.0
 
-    avg_diff = total_diff / max(1, len(origin_angles))
-    similarity = max(0.0, 1.0 - (avg_diff / 180.0))
-    return similarity
+def get_selected_angles(keypoints, selected: List[str]) -> List[Optional[float]]:
+    return angles_to_list(compute_angles(pack_keypoints(keypoints), angle_columns(selected)))
+
+
+def similarity_from_angles(origin: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """KEY_ANGLES similarity in [0,1] (before adjust_similarity) for origin [..., K] vs target [K].
+    Differences are summed where both angles exist and divided by all K slots (TS behavior);
+    0 when the origin has no valid angle. A target of another length is truncated or
+    NaN-padded to K, matching the zip() pairing of the original implementation.
+    """
+    origin = np.asarray(origin, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    k = origin.shape[-1]
+    if target.shape[-1] != k:
+        target = np.concatenate([target[:k], np.full(max(0, k - target.shape[-1]), np.nan)])
+    diff = np.abs(origin - target)
+    total = np.where(np.isnan(diff), 0.0, diff).sum(axis=-1)
+    sim = np.maximum(0.0, 1.0 - (total / max(1, k)) / 180.0)
+    return np.where(np.isnan(origin).all(axis=-1), 0.0, sim)
+
+
+def key_angles_similarity(pose1, pose2, selected: List[str]) -> float:
+    """Implements app/lib/poseSim.ts + simPose.ts KEY_ANGLES strategy.
+    Returns similarity in [0,1].
+    """
+    cols = angle_columns(selected)
+    origin = compute_angles(pack_keypoints(pose1), cols)
+    target = compute_angles(pack_keypoints(pose2), cols)
+    return float(similarity_from_angles(origin, target))
 
 
 def adjust_similarity(sim: float) -> float:
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Record detector + landmark output tensors for the targets/ images (run on the board).
+
+Runs the real interpreters (Ethos-U delegate) through estimate_pose() and
+saves every output tensor of each invoke() to <out_dir>/<image stem>.npz.
+scripts.bench_stages replays them off-board with ReplayInterpreter, so the
+benchmarks see real detector scores, boxes, landmarks and heatmaps.
+
+Usage (from backend/blazepose-nxp, on the i.MX93):
+  python -m scripts.record_tensors --out_dir scripts/recordings
+"""
+import argparse
+import os
+from typing import Dict
+
+import numpy as np
+
+import blazepose_imx93 as bp
+from scripts.fake_interpreter import save_recording
+
+
+def capture_outputs(model, sink: Dict[str, np.ndarray]):
+    """Wrap model.interp.invoke so each call copies all outputs into sink (by tensor name)."""
+    interp = model.interp
+    invoke = interp.invoke
+    outs = interp.get_output_details()
+
+    def recording_invoke():
+        invoke()
+        for d in outs:
+            sink[d["name"]] = interp.get_tensor(d["index"])
+
+    interp.invoke = recording_invoke
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Record model output tensors for off-board benchmarks")
+    ap.add_argument("--inputs", nargs="+", default=["targets"], help="Images, directories, globs or @filelist")
+    ap.add_argument("--det", default="pose_detection_quant_vela.tflite")
+    ap.add_argument("--lmk", default="pose_landmark_full_quant_vela.tflite")
+    ap.add_argument("--delegate", default="/usr/lib/libethosu_delegate.so")
+    ap.add_argument("--out_dir", default=os.path.join("scripts", "recordings"))
+    args = ap.parse_args()
+
+    detector = bp.PoseDetector(args.det, ethosu_delegate=args.delegate or None)
+    landmarker = bp.PoseLandmarkerLite(args.lmk, ethosu_delegate=args.delegate or None)
+    det_out: Dict[str, np.ndarray] = {}
+    lmk_out: Dict[str, np.ndarray] = {}
+    capture_outputs(detector, det_out)
+    capture_outputs(landmarker, lmk_out)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for path in bp.expand_inputs(args.inputs):
+        det_out.clear()
+        lmk_out.clear()
+        res = bp.estimate_pose(detector, landmarker, bp._load_image_any(path))
+        stem = os.path.splitext(os.path.basename(path))[0]
+        tensors = {"detector": dict(det_out)}
+        if lmk_out:
+            tensors["landmark"] = dict(lmk_out)
+        out = os.path.join(args.out_dir, f"{stem}.npz")
+        save_recording(out, tensors)
+        print(f"{path}: {'person' if res is not None else 'no person'} -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Optional faster hash; blake2b (stdlib) otherwise
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+LANDMARK_CACHE_MAX_ENTRIES = int(os.getenv("LANDMARK_CACHE_MAX_ENTRIES", "64"))
+LANDMARK_CACHE_MAX_BYTES = int(os.getenv("LANDMARK_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+
+def content_key(data: bytes) -> str:
+    """Fast content hash of encoded image bytes."""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _approx_size(value: Any) -> int:
+    """Rough in-memory size of a cached value (packed keypoints array or nested lists/dicts)."""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(_approx_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class LandmarkCache:
+    """Thread-safe LRU bounded by entry count and approximate byte budget.
+    Lookups, inserts and evictions are O(1) (OrderedDict move_to_end / popitem).
+    """
+
+    def __init__(self, max_entries: int = LANDMARK_CACHE_MAX_ENTRIES, max_bytes: int = LANDMARK_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, value: Any):
+        size = _approx_size(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if self.max_entries <= 0 or size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
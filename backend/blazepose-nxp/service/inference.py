@@ -1,13 +1,76 @@
 from __future__ import annotations
 import os
+import queue
 import threading
 import time
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
 
 import numpy as np
 
 # Import the existing inference implementation
+import autotune
 import blazepose_imx93 as bp
+import preprocess
+import transform
+from service import tracking
+from service.cache import LandmarkCache, content_key
+from service.metrics import METRICS, StageTimings
+from service.pipeline import StagedPipeline
+from service.variants import AdaptiveVariantPolicy, order_variants, parse_variant_models
+
+# Max frames waiting between two pipeline stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+# JPEGs are DCT-downscaled while decoding as long as the long side stays >= this (0 = full size).
+# "auto": as long as the person's ROI crop still has at least the landmark input's 256 px,
+# i.e. a long side of 256 / ROI side (normalized to the letterboxed square). Tracked session
+# frames use the previous frame's ROI; other frames assume a person spanning DECODE_ROI_PRIOR
+# of the frame's long side (0.5: >= 512 px, so 640x480 frames decode at full size)
+DECODE_MIN_LONG_SIDE = os.getenv("DECODE_MIN_LONG_SIDE", "auto").strip().lower()
+DECODE_ROI_PRIOR = float(os.getenv("DECODE_ROI_PRIOR", "0.5"))
+# Synthetic inferences per model at startup (delegate graph compile, first-invoke allocation)
+WARMUP_ITERATIONS = int(os.getenv("WARMUP_ITERATIONS", "3"))
+# Backend selection per model: "1" = auto-tune (cached by model hash), "retune" = ignore the cache,
+# "0" = Ethos-U delegate with the default CPU fallback
+BLAZEPOSE_AUTOTUNE = os.getenv("BLAZEPOSE_AUTOTUNE", "1").strip().lower()
+# Multi-person mode: cap on people landmarked per frame and threads for their crop/projection work
+MULTI_PERSON_MAX = int(os.getenv("MULTI_PERSON_MAX", "4"))
+MULTI_PERSON_WORKERS = int(os.getenv("MULTI_PERSON_WORKERS", "4"))
+
+
+def _decode_min_side(session: Optional[tracking.TrackingSession]) -> int:
+    """Reduced-decode floor for the next frame (see DECODE_MIN_LONG_SIDE)."""
+    if DECODE_MIN_LONG_SIDE != "auto":
+        return int(DECODE_MIN_LONG_SIDE)
+    rect = session.rect if session is not None else None
+    roi = max(rect["w"], rect["h"]) if rect is not None else DECODE_ROI_PRIOR
+    return bp.roi_decode_min_side(roi, 256)
+
+
+class SessionBusy(queue.Full):
+    """A tracking session's previous frame was still in flight when the submit timeout ran out."""
+
+
+@dataclass
+class _Frame:
+    """Per-frame state handed from one pipeline stage to the next."""
+    image: bytes
+    session_id: Optional[str]
+    key: Optional[str]  # cache key; None for tracked session frames (not cached)
+    variant: str = ""
+    img_rgb: Optional[np.ndarray] = None
+    decode_scale: Tuple[float, float] = (1.0, 1.0)  # decoded -> original pixels
+    img_hw: Optional[Tuple[int, int]] = None  # decoded size
+    src_hw: Optional[Tuple[int, int]] = None  # original size (tracking state is kept per original size)
+    meta_letter: Optional[Tuple[int, int, int, int]] = None
+    session: Optional[tracking.TrackingSession] = None
+    rect: Optional[dict] = None
+    tracked: bool = False
+    roi_rgb: Optional[np.ndarray] = None
+    lmk: Optional[tuple] = None
+    result: Optional[np.ndarray] = None  # packed [N,4] keypoints (x, y, z, score)
+    timings: StageTimings = field(default_factory=StageTimings)
 
 
 class InferenceService:
@@ -16,120 +79,522 @@ class InferenceService:
     Usage:
         InferenceService.initialize(det_model_path, lmk_model_path, delegate_path)
         kps = InferenceService.instance().infer_keypoints(image_path)
+        kps = InferenceService.instance().submit(image_path).result()  # pipelined
+        kps = InferenceService.instance().infer_keypoints(jpeg_bytes)  # in-memory image
+        kps = InferenceService.instance().infer_keypoints(image_path, variant="lite")
+        people = InferenceService.instance().infer_multi(image_path, max_persons=3)  # one array per person
+
+    lmk_model is one path or a {variant: path} map (lite/full/heavy); every variant gets
+    its own interpreter. Requests without a variant use AdaptiveVariantPolicy, which
+    falls back to lighter variants under load and returns to the most accurate one when idle.
+
+    At server startup use start_background() instead of initialize(): models load and
+    warm up on a worker thread while the port is already bound; readiness() reports progress.
     """
 
     _instance: Optional["InferenceService"] = None
     _global_lock = threading.Lock()
+    _init_thread: Optional[threading.Thread] = None
+    _ready = threading.Event()
+    _readiness: dict = {"phase": "not_started"}
 
-    def __init__(self, det_model: str, lmk_model: str, delegate: Optional[str]):
+    def __init__(self, det_model: str, lmk_model: Union[str, Dict[str, str]], delegate: Optional[str]):
         self.det_model = det_model
-        self.lmk_model = lmk_model
+        self.lmk_models = parse_variant_models(None, lmk_model) if isinstance(lmk_model, str) else dict(lmk_model)
+        if not self.lmk_models:
+            raise ValueError("At least one landmark model is required")
         self.delegate = delegate or None
-        self._detector = bp.PoseDetector(self.det_model, ethosu_delegate=self.delegate)
-        self._landmarker = bp.PoseLandmarkerLite(self.lmk_model, ethosu_delegate=self.delegate)
-        # Serialize interpreter access (tflite runtime is not inherently thread-safe)
-        self._infer_lock = threading.Lock()
-        # Simple LRU-like cache: (path, mtime) -> keypoints list
-        self._cache: Dict[Tuple[str, float], List[dict]] = {}
-        self._cache_order: List[Tuple[str, float]] = []
-        self._cache_max = 64
+        # Backend chosen for each interpreter ("detector", "landmark:<variant>") and how
+        self._backends: Dict[str, dict] = {}
+        self._detector = self._load_model(bp.PoseDetector, self.det_model, "detector")
+        self._landmarkers: Dict[str, bp.PoseLandmarkerLite] = {
+            name: self._load_model(bp.PoseLandmarkerLite, path, f"landmark:{name}") for name, path in self.lmk_models.items()
+        }
+        self.variants = order_variants(list(self._landmarkers))
+        # Serialize access per interpreter (tflite runtime is not inherently thread-safe);
+        # separate locks let the detector and landmark stages of different frames overlap
+        self._det_lock = threading.Lock()
+        self._lmk_locks: Dict[str, threading.Lock] = {name: threading.Lock() for name in self._landmarkers}
+        self._policy = AdaptiveVariantPolicy(self.variants)
+        self._pipeline: Optional[StagedPipeline] = None
+        self._pipeline_lock = threading.Lock()
+        # Thread-safe LRU: content hash of the encoded image -> packed keypoints array
+        self._cache = LandmarkCache()
+        # ROI tracking sessions keyed by client-provided session_id
+        self._sessions = tracking.SessionStore()
+        # Multi-person mode: requests run one at a time on their own thread (they hold the
+        # interpreters for several invokes); per-person crops and projections fan out to a pool
+        self._multi_exec: Optional[ThreadPoolExecutor] = None
+        self._crop_pool: Optional[ThreadPoolExecutor] = None
+        self._multi_lock = threading.Lock()
 
     @classmethod
-    def initialize(cls, det_model: str, lmk_model: str, delegate: Optional[str]):
+    def initialize(cls, det_model: str, lmk_model: Union[str, Dict[str, str]], delegate: Optional[str]):
         with cls._global_lock:
             cls._instance = InferenceService(det_model, lmk_model, delegate)
 
+    @classmethod
+    def start_background(cls, det_model: str, lmk_model: Union[str, Dict[str, str]], delegate: Optional[str],
+                         warmup_iterations: int = WARMUP_ITERATIONS) -> threading.Thread:
+        """Load models and run warm-up on a daemon thread; readiness() flips once both finish."""
+        cls._ready.clear()
+        cls._readiness = {"phase": "loading"}
+
+        def run():
+            try:
+                t0 = time.perf_counter()
+                cls.initialize(det_model, lmk_model, delegate)
+                load_sec = time.perf_counter() - t0
+                cls._readiness = {"phase": "warming_up", "load_sec": load_sec}
+                warmup = cls._instance.warmup(warmup_iterations)  # type: ignore[union-attr]
+                cls._readiness = {"phase": "ready", "load_sec": load_sec, "warmup": warmup}
+                cls._ready.set()
+            except Exception as e:
+                cls._readiness = {"phase": "failed", "error": f"{type(e).__name__}: {e}"}
+
+        cls._init_thread = threading.Thread(target=run, name="pose-warmup", daemon=True)
+        cls._init_thread.start()
+        return cls._init_thread
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls._ready.is_set()
+
+    @classmethod
+    def readiness(cls) -> dict:
+        return {"ready": cls._ready.is_set(), **cls._readiness}
+
     @classmethod
     def instance(cls) -> "InferenceService":
+        if cls._instance is None and cls._init_thread is not None:
+            # Background start in progress: wait for it rather than loading a second copy
+            cls._init_thread.join()
         if cls._instance is None:
             # Reasonable defaults
             det = os.getenv("BLAZEPOSE_DET_MODEL", "pose_detection_quant_vela.tflite")
-            lmk = os.getenv("BLAZEPOSE_LMK_MODEL", "pose_landmark_full_quant_vela.tflite")
+            lmk = parse_variant_models(
+                os.getenv("BLAZEPOSE_LMK_MODELS"),
+                os.getenv("BLAZEPOSE_LMK_MODEL", "pose_landmark_full_quant_vela.tflite"),
+            )
             # On Windows dev, Ethos delegate not available; on i.MX use /usr/lib/libethosu_delegate.so by env
             delegate = os.getenv("BLAZEPOSE_DELEGATE", None)
             cls.initialize(det, lmk, delegate)
         return cls._instance  # type: ignore
 
     # ------------- Public API -------------
-    def infer_keypoints(self, image_path: str) -> List[dict]:
+    def resolve_variant(self, variant: Optional[str] = None) -> str:
+        """Landmark variant that will serve a request: the requested one, or the policy's
+        choice for None/"auto". Raises ValueError for variants that are not loaded."""
+        if variant is None or variant == "auto":
+            return self._policy.choose()
+        if variant not in self._landmarkers:
+            raise ValueError(f"Unknown landmark model variant: {variant} (loaded: {', '.join(self.variants)})")
+        return variant
+
+    def infer_keypoints(self, image: Union[str, bytes], session_id: Optional[str] = None,
+                        variant: Optional[str] = None, timings: Optional[StageTimings] = None) -> List[dict]:
         """Returns keypoints as list of dicts with at least name,x,y,score.
+        image is a file path or the encoded image bytes (decoded from memory).
         If no person detected, returns [].
+        With a session_id, the ROI derived from the session's previous frame is reused
+        and the detector only runs when tracking confidence drops (MediaPipe-style tracking).
+        Session frames skip the landmark cache and run one at a time per session, in order.
+        variant selects the landmark model (see resolve_variant).
+        Per-stage durations are added to timings (if given) and to the /metrics histograms.
+        Runs all stages in the calling thread; see submit() for the pipelined path.
         """
-        key = self._cache_key(image_path)
-        if key in self._cache:
-            return self._cache[key]
-
-        img_rgb = bp._load_image_any(image_path)
-        img_256, meta_letter = bp._letterbox_to_square_rgb(img_rgb, 256)
-
-        with self._infer_lock:
-            det = self._detector.infer(img_256)
-            if det is None:
-                result: List[dict] = []
-                self._put_cache(key, result)
-                return result
-
-            rect0 = bp._compute_roi_normrect_256(det["mid_hip"], det["size_rot"])  # on 256x256 frame
-            rect = bp._rect_transform_norm(rect0, (256, 256), scale_x=1.25, scale_y=1.25, square_long=True)
-            M_affine, _ = bp._roi_affine_from_rect(rect, (256, 256), dst_size=256)
-
-            import cv2
-            roi_rgb = cv2.warpAffine(
-                img_256, M_affine, (256, 256), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
-            )
+        return self.keypoints_json(self.infer_packed(image, session_id, variant, timings))
+
+    def infer_packed(self, image: Union[str, bytes], session_id: Optional[str] = None,
+                     variant: Optional[str] = None, timings: Optional[StageTimings] = None,
+                     timeout: Optional[float] = None) -> np.ndarray:
+        """infer_keypoints without the JSON conversion: float32 [33,4] (x, y, z, score) in
+        original pixels, or [0,4] if no person. The array is shared with the cache; do not modify it.
+        timeout bounds the wait for the session's previous frame (SessionBusy); None waits.
+        """
+        variant = self.resolve_variant(variant)
+        timings = timings if timings is not None else StageTimings()
+        data = self._read_image(image)
+        # Tracked frames bypass the cache: a hit would skip the session's ROI update
+        session = self._sessions.get(session_id) if session_id else None
+        key = None
+        if session is None:
+            key, cached = self._cache_lookup(data, variant, timings)
+            if cached is not None:
+                METRICS.observe_stages(timings)
+                return cached
+        frame = _Frame(image=data, session_id=session_id, key=key, variant=variant, session=session, timings=timings)
+        if session is not None:
+            self._acquire_session(session, timeout)
+        self._policy.begin()
+        t0 = time.perf_counter()
+        try:
+            for _, stage in self._stages():
+                stage(frame)
+                if frame.result is not None:
+                    break
+        finally:
+            if session is not None:
+                session.gate.release()
+            self._policy.end(variant, 1e3 * (time.perf_counter() - t0))
+            METRICS.observe_stages(timings)
+        return frame.result  # type: ignore
+
+    def submit(self, image: Union[str, bytes], session_id: Optional[str] = None,
+               variant: Optional[str] = None, timings: Optional[StageTimings] = None,
+               timeout: Optional[float] = None) -> Future:
+        """Pipelined infer_keypoints: returns a Future resolving to the keypoints list.
+        Detector, warp, landmark and projection stages run on their own threads, so
+        consecutive frames overlap. Pass a variant from resolve_variant() to know
+        which landmark model served the request. timings (if given) is filled by the
+        stages; read it once the future is done.
+        timeout bounds the time submit itself may block: waiting for the session's previous
+        frame raises SessionBusy, waiting for room in the full pipeline queue raises queue.Full.
+        None waits indefinitely.
+        """
+        inner = self.submit_packed(image, session_id, variant, timings, timeout)
+        fut: Future = Future()
+
+        def convert(f: Future):
+            if f.cancelled():
+                fut.cancel()
+            elif f.exception() is not None:
+                fut.set_exception(f.exception())
+            else:
+                fut.set_result(self.keypoints_json(f.result()))
+
+        # A caller giving up on the outer future (request timeout) cancels the queued frame
+        fut.add_done_callback(lambda f: inner.cancel() if f.cancelled() else None)
+        inner.add_done_callback(convert)
+        return fut
+
+    def submit_packed(self, image: Union[str, bytes], session_id: Optional[str] = None,
+                      variant: Optional[str] = None, timings: Optional[StageTimings] = None,
+                      timeout: Optional[float] = None) -> Future:
+        """Pipelined infer_packed: returns a Future resolving to the packed [N,4] keypoints.
+        timeout as in submit()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        variant = self.resolve_variant(variant)
+        timings = timings if timings is not None else StageTimings()
+        data = self._read_image(image)
+        session = self._sessions.get(session_id) if session_id else None
+        key = None
+        if session is None:
+            key, cached = self._cache_lookup(data, variant, timings)
+            if cached is not None:
+                METRICS.observe_stages(timings)
+                fut: Future = Future()
+                fut.set_result(cached)
+                return fut
+        else:
+            # Waits while the session's previous frame is in flight (its landmarks give this ROI)
+            self._acquire_session(session, None if deadline is None else deadline - time.monotonic())
+        self._policy.begin()
+        t0 = time.perf_counter()
+        frame = _Frame(image=data, session_id=session_id, key=key, variant=variant, session=session, timings=timings)
+        try:
+            fut = self.pipeline().submit(frame, None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except BaseException:
+            if session is not None:
+                session.gate.release()
+            # A rejected frame still counts: its wait is the overload the policy reacts to
+            self._policy.end(variant, 1e3 * (time.perf_counter() - t0))
+            raise
+
+        def done(_f: Future):
+            if session is not None:
+                session.gate.release()
+            # Request latency (queueing included) drives the adaptive variant policy
+            self._policy.end(variant, 1e3 * (time.perf_counter() - t0))
+            METRICS.observe_stages(timings)
+
+        fut.add_done_callback(done)
+        return fut
+
+    def infer_multi(self, image: Union[str, bytes], variant: Optional[str] = None,
+                    max_persons: Optional[int] = None, timings: Optional[StageTimings] = None) -> List[np.ndarray]:
+        """Multi-person mode: one packed [33,4] keypoint array per detected person (at most
+        max_persons, default MULTI_PERSON_MAX), ordered by detector confidence; [] if nobody.
+        All post-NMS detections get their own ROI; the crops are warped in parallel, then
+        landmarked back-to-back while holding the variant's interpreter once (the Vela
+        models have a fixed batch-1 input). Tracking sessions do not apply here.
+        """
+        variant = self.resolve_variant(variant)
+        max_persons = MULTI_PERSON_MAX if max_persons is None else max(1, int(max_persons))
+        timings = timings if timings is not None else StageTimings()
+        data = self._read_image(image)
+        key, cached = self._cache_lookup(data, f"{variant}:multi{max_persons}", timings)
+        if cached is None:
+            self._policy.begin()
+            t0 = time.perf_counter()
+            try:
+                cached = self._run_multi(data, variant, max_persons, timings)
+            finally:
+                self._policy.end(variant, 1e3 * (time.perf_counter() - t0))
+            self._put_cache(key, cached)
+        METRICS.observe_stages(timings)
+        return list(cached)
+
+    @staticmethod
+    def _acquire_session(session: tracking.TrackingSession, timeout: Optional[float]):
+        if not session.gate.acquire(timeout=None if timeout is None else max(0.0, timeout)):
+            raise SessionBusy(f"Session {session.session_id} still has a frame in flight")
+
+    def submit_multi(self, image: Union[str, bytes], variant: Optional[str] = None,
+                     max_persons: Optional[int] = None, timings: Optional[StageTimings] = None) -> Future:
+        """infer_multi on the multi-person worker thread; returns a Future of the per-person arrays."""
+        self._multi_pools()
+        return self._multi_exec.submit(self.infer_multi, image, variant, max_persons, timings)  # type: ignore[union-attr]
 
-            lm_img, lm_world, kp_scores, presence = self._landmarker.infer(roi_rgb)
+    def pipeline_queue_depths(self) -> Dict[str, int]:
+        """Frames waiting in front of each pipeline stage (empty until the pipeline starts)."""
+        with self._pipeline_lock:
+            p = self._pipeline
+        return dict(zip(p.names, p.queue_depths())) if p is not None else {}
 
-        # Post-projection to original image coords
-        proj_mat = bp._get_rotated_subrect_to_rect_matrix(rect, (256, 256))
-        pts = lm_img[:, :2].astype(np.float32)
-        x_norm = pts[:, 0] * proj_mat[0, 0] + pts[:, 1] * proj_mat[0, 1] + proj_mat[0, 3]
-        y_norm = pts[:, 0] * proj_mat[1, 0] + pts[:, 1] * proj_mat[1, 1] + proj_mat[1, 3]
-        x_256 = (x_norm * 256.0)
-        y_256 = (y_norm * 256.0)
-        pts_256 = np.stack([x_256, y_256], axis=1)
+    def variant_stats(self) -> dict:
+        return self._policy.stats()
 
-        pts_orig = np.array(
-            [bp._inv_letterbox_coords(float(x), float(y), meta_letter, 256) for x, y in pts_256], dtype=np.float32
-        )
+    def backend_report(self) -> Dict[str, dict]:
+        """Backend serving each interpreter, with the auto-tuner's timings when it ran."""
+        return dict(self._backends)
+
+    def warmup(self, iterations: int = WARMUP_ITERATIONS) -> dict:
+        """Run the detector and every landmark variant (and the cv2 preprocessing) on a
+        synthetic frame so the first request does not pay for delegate graph compilation
+        and first-invoke allocation. The landmark cache and tracking sessions are not touched.
+        """
+        rng = np.random.default_rng(0)
+        img_rgb = rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+        meta_letter = preprocess.letterbox_meta(img_rgb.shape[:2])
+        rect = {"xc": 0.5, "yc": 0.5, "w": 0.5, "h": 0.5, "rot": 0.0}
+        iter_ms: List[float] = []
+        t_start = time.perf_counter()
+        for _ in range(max(0, iterations)):
+            t0 = time.perf_counter()
+            img_det, _ = preprocess.detector_input(img_rgb, 224)
+            with self._det_lock:
+                self._detector.infer(img_det)
+            roi = preprocess.roi_input(img_rgb, rect, meta_letter, 256)
+            for variant in self.variants:
+                self._landmark(roi, variant)
+            iter_ms.append(1e3 * (time.perf_counter() - t0))
+        return {
+            "variants": list(self.variants),
+            "iterations": len(iter_ms),
+            "total_sec": time.perf_counter() - t_start,
+            "first_ms": iter_ms[0] if iter_ms else None,
+            "steady_ms": (sum(iter_ms[1:]) / (len(iter_ms) - 1)) if len(iter_ms) > 1 else None,
+        }
+
+    def cache_stats(self) -> dict:
+        return self._cache.stats()
+
+    def pipeline(self) -> StagedPipeline:
+        with self._pipeline_lock:
+            if self._pipeline is None:
+                self._pipeline = StagedPipeline(self._stages(), queue_size=PIPELINE_QUEUE_SIZE)
+            return self._pipeline
+
+    def end_session(self, session_id: str):
+        """Forget a tracking session (e.g. when a kiosk changes user)."""
+        self._sessions.drop(session_id)
+
+    # ------------- Stages -------------
+    def _stages(self):
+        return [
+            ("detect", self._stage_detect),
+            ("warp", self._stage_warp),
+            ("landmark", self._stage_landmark),
+            ("project", self._stage_project),
+        ]
+
+    def _stage_detect(self, f: "_Frame"):
+        """Decode, then pick the ROI: tracked from the session or from the detector."""
+        if f.session is None and f.session_id:
+            f.session = self._sessions.get(f.session_id)
+        t0 = time.perf_counter()
+        f.img_rgb, f.decode_scale = bp._load_image_reduced(f.image, _decode_min_side(f.session))
+        f.timings.add("decode", time.perf_counter() - t0)
+        f.img_hw = f.img_rgb.shape[:2]
+        f.src_hw = (int(round(f.img_hw[0] * f.decode_scale[1])), int(round(f.img_hw[1] * f.decode_scale[0])))
+        f.meta_letter = preprocess.letterbox_meta(f.img_hw)
+        f.rect = f.session.roi_for(f.src_hw) if f.session is not None else None
+        f.tracked = f.rect is not None
+        if not f.tracked:
+            f.rect = self._detect_roi(f.img_rgb, f.timings)
+            if f.rect is None:
+                self._finish_no_person(f)
+
+    def _stage_warp(self, f: "_Frame"):
+        # ROI sampled from full-resolution pixels in a single warp
+        t0 = time.perf_counter()
+        f.roi_rgb = preprocess.roi_input(f.img_rgb, f.rect, f.meta_letter, 256)
+        f.timings.add("warp", time.perf_counter() - t0)
+
+    def _stage_landmark(self, f: "_Frame"):
+        f.lmk = self._landmark(f.roi_rgb, f.variant, f.timings)
+        if f.tracked and not tracking.tracking_confident(f.lmk[2], f.lmk[3]):
+            # Lost track: re-detect on this frame
+            f.tracked = False
+            f.rect = self._detect_roi(f.img_rgb, f.timings)
+            if f.rect is None:
+                self._finish_no_person(f)
+                return
+            self._stage_warp(f)
+            f.lmk = self._landmark(f.roi_rgb, f.variant, f.timings)
+
+    def _stage_project(self, f: "_Frame"):
+        t0 = time.perf_counter()
+        lm_img, aux_img, kp_prob, presence_prob = f.lmk
+        rect, meta_letter = f.rect, f.meta_letter
 
         # Scores
-        sigmoid = lambda x: 1.0 / (1.0 + np.exp(-x))
-        if kp_scores is not None and getattr(kp_scores, "shape", None) is not None and kp_scores.shape[0] == 33:
-            scores = sigmoid(kp_scores.astype(np.float32))
+        if kp_prob is not None and kp_prob.shape[0] == 33:
+            scores = kp_prob
         else:
-            scores = np.full((33,), float(sigmoid(presence)), dtype=np.float32)
-
-        # Compose keypoints list
-        keypoints_list: List[dict] = []
-        for i, name in enumerate(bp.LANDMARK_NAMES):
-            keypoints_list.append(
-                {
-                    "name": name,
-                    "x": float(pts_orig[i, 0]),
-                    "y": float(pts_orig[i, 1]),
-                    "score": float(scores[i]),
-                }
-            )
+            scores = np.full((33,), presence_prob, dtype=np.float32)
+
+        # ROI -> letterboxed square -> original pixels (incl. reduced-decode scale) as one affine
+        keypoints = transform.project_landmarks(lm_img, rect, meta_letter, f.decode_scale, scores=scores)
+
+        if f.session is not None:
+            to_square = transform.roi_to_square(rect)
+            aux_norm = transform.apply_affine(to_square, aux_img) if aux_img is not None else None
+            next_rect = tracking.roi_from_landmarks(transform.apply_affine(to_square, lm_img[:, :2]), aux_norm)
+            f.session.update(next_rect, f.src_hw, tracked=f.tracked)
+
+        self._put_cache(f.key, keypoints)
+        f.timings.add("projection", time.perf_counter() - t0)
+        f.result = keypoints
+
+    def _finish_no_person(self, f: "_Frame"):
+        if f.session is not None:
+            f.session.update(None, f.src_hw, tracked=False)
+        result = np.zeros((0, 4), dtype=np.float32)
+        self._put_cache(f.key, result)
+        f.result = result
+
+    # ------------- Multi-person -------------
+    def _multi_pools(self) -> ThreadPoolExecutor:
+        with self._multi_lock:
+            if self._crop_pool is None:
+                self._multi_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pose-multi")
+                self._crop_pool = ThreadPoolExecutor(max_workers=max(1, MULTI_PERSON_WORKERS),
+                                                     thread_name_prefix="pose-crop")
+            return self._crop_pool
 
-        self._put_cache(key, keypoints_list)
-        return keypoints_list
+    def _run_multi(self, data: bytes, variant: str, max_persons: int, timings: StageTimings) -> np.ndarray:
+        """Stacked [P,33,4] keypoints for up to max_persons people ([0,33,4] if nobody)."""
+        pool = self._multi_pools()
+        t0 = time.perf_counter()
+        img_rgb, decode_scale = bp._load_image_reduced(data, _decode_min_side(None))
+        timings.add("decode", time.perf_counter() - t0)
+        meta_letter = preprocess.letterbox_meta(img_rgb.shape[:2])
+        rects = self._detect_rois(img_rgb, max_persons, timings)
+        if not rects:
+            return np.zeros((0, 33, 4), dtype=np.float32)
+
+        # cv2 releases the GIL, so the warps of all crops run concurrently
+        t0 = time.perf_counter()
+        rois = list(pool.map(lambda r: preprocess.roi_input(img_rgb, r, meta_letter, 256), rects))
+        timings.add("warp", time.perf_counter() - t0)
+
+        # Back-to-back invokes under one lock acquisition
+        with self._lmk_locks[variant]:
+            lmks = [self._landmark_unlocked(roi, variant, timings) for roi in rois]
+
+        def project(args):
+            (lm_img, _aux, kp_prob, presence_prob), rect = args
+            scores = kp_prob if kp_prob is not None else np.full((33,), presence_prob, dtype=np.float32)
+            return transform.project_landmarks(lm_img, rect, meta_letter, decode_scale, scores=scores)
+
+        t0 = time.perf_counter()
+        people = np.stack(list(pool.map(project, zip(lmks, rects))))
+        timings.add("projection", time.perf_counter() - t0)
+        return people
+
+    def _detect_rois(self, img_rgb: np.ndarray, max_persons: int, timings: Optional[StageTimings] = None) -> List[dict]:
+        """All post-NMS detections (highest score first, at most max_persons) as landmark ROIs."""
+        t0 = time.perf_counter()
+        img_det, _ = preprocess.detector_input(img_rgb, 224)
+        if timings is not None:
+            timings.add("letterbox", time.perf_counter() - t0)
+        with self._det_lock:
+            dets = self._detector.infer_all(img_det, max_detections=max_persons, timer=timings)
+        return [self._roi_from_detection(det) for det in dets]
+
+    # ------------- Interpreter helpers (each holds only its own lock) -------------
+    def _load_model(self, model_cls, path: str, role: str):
+        if BLAZEPOSE_AUTOTUNE in ("0", "false", "off", "no"):
+            self._backends[role] = {"model": os.path.basename(path), "backend": "default", "source": "fixed"}
+            return model_cls(path, ethosu_delegate=self.delegate)
+        model, report = autotune.tuned_model(model_cls, path, self.delegate, retune=(BLAZEPOSE_AUTOTUNE == "retune"))
+        self._backends[role] = report
+        return model
+
+    def _detect_roi(self, img_rgb: np.ndarray, timings: Optional[StageTimings] = None) -> Optional[dict]:
+        """Run the detector and return the landmark ROI, or None if no person."""
+        t0 = time.perf_counter()
+        img_det, _ = preprocess.detector_input(img_rgb, 224)
+        if timings is not None:
+            timings.add("letterbox", time.perf_counter() - t0)
+        with self._det_lock:
+            det = self._detector.infer(img_det, timer=timings)
+        if det is None:
+            return None
+        return self._roi_from_detection(det)
+
+    @staticmethod
+    def _roi_from_detection(det: dict) -> dict:
+        rect0 = bp._compute_roi_normrect_256(det["mid_hip"], det["size_rot"])  # on 256x256 frame
+        return bp._rect_transform_norm(rect0, (256, 256), scale_x=1.25, scale_y=1.25, square_long=True)
+
+    def _landmark(self, roi_rgb: np.ndarray, variant: str, timings: Optional[StageTimings] = None):
+        """Landmark the ROI crop with one variant. Returns (lm_img, aux_img, kp_prob, presence_prob)."""
+        with self._lmk_locks[variant]:
+            return self._landmark_unlocked(roi_rgb, variant, timings)
+
+    def _landmark_unlocked(self, roi_rgb: np.ndarray, variant: str, timings: Optional[StageTimings] = None):
+        """_landmark for callers already holding the variant's lock."""
+        lm_img, _lm_world, kp_scores, presence, aux_img = self._landmarkers[variant].infer(
+            roi_rgb, return_aux=True, timer=timings)
+        sigmoid = lambda x: 1.0 / (1.0 + np.exp(-x))
+        kp_prob = None
+        if kp_scores is not None and getattr(kp_scores, "shape", None) is not None and kp_scores.shape[0] == 33:
+            kp_prob = sigmoid(kp_scores.astype(np.float32))
+        return lm_img, aux_img, kp_prob, float(sigmoid(presence))
 
     # ------------- Cache helpers -------------
-    def _cache_key(self, image_path: str) -> Tuple[str, float]:
-        try:
-            st = os.stat(image_path)
-            return (os.path.abspath(image_path), st.st_mtime)
-        except FileNotFoundError:
-            return (os.path.abspath(image_path), -1.0)
-
-    def _put_cache(self, key: Tuple[str, float], value: List[dict]):
-        if key in self._cache:
-            self._cache[key] = value
-            return
-        self._cache[key] = value
-        self._cache_order.append(key)
-        if len(self._cache_order) > self._cache_max:
-            old = self._cache_order.pop(0)
-            self._cache.pop(old, None)
+    @staticmethod
+    def _read_image(image: Union[str, bytes]) -> bytes:
+        """Encoded image bytes; files are read once and decoded from memory.
+        Keying on content (not path/mtime) keeps rotating camera files from returning stale results.
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return bytes(image)
+        with open(image, "rb") as fh:
+            return fh.read()
+
+    def _cache_lookup(self, data: bytes, variant: str, timings: StageTimings) -> Tuple[str, Optional[np.ndarray]]:
+        """(cache key, cached keypoints or None); hashing + lookup time goes to the "cache" stage."""
+        t0 = time.perf_counter()
+        key = self._cache_key(data, variant)
+        cached = self._cache.get(key)
+        timings.add("cache", time.perf_counter() - t0)
+        return key, cached
+
+    @staticmethod
+    def _cache_key(data: bytes, variant: str) -> str:
+        # Results differ per landmark model, so the variant is part of the key
+        return f"{content_key(data)}:{variant}"
+
+    @staticmethod
+    def keypoints_json(packed: np.ndarray) -> List[dict]:
+        """JSON form of a packed keypoint array: [{name, x, y, score}, ...]."""
+        return transform.keypoints_to_dicts(packed, bp.LANDMARK_NAMES)
 
+    def _put_cache(self, key: Optional[str], value: np.ndarray):
+        value.flags.writeable = False  # shared by every request that hits the cache
+        if key is not None:  # None: tracked session frame, its ROI came from the session
+            self._cache.put(key, value)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import bisect
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Set METRICS_ENABLED=0 to skip histogram bookkeeping entirely
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() not in ("0", "false", "off", "no")
+
+# Fixed latency buckets (seconds): 0.25 ms .. 5 s
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+# Pipeline stages in the order they run; also the Server-Timing order
+STAGES = (
+    "cache", "decode", "letterbox", "detector_invoke", "detector_decode", "warp",
+    "landmark_invoke", "refine", "projection", "similarity", "recognize",
+)
+
+
+class StageTimings(dict):
+    """Per-request stage -> seconds. add() accumulates, so a stage that runs twice
+    (e.g. re-detection after a lost track) reports its total."""
+
+    def add(self, stage: str, seconds: float):
+        self[stage] = self.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value (durations in ms)."""
+        order = [s for s in STAGES if s in self] + [s for s in self if s not in STAGES]
+        parts = [f"{s};dur={1e3 * self[s]:.2f}" for s in order]
+        if total is not None:
+            parts.append(f"total;dur={1e3 * total:.2f}")
+        return ", ".join(parts)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two increments under a lock."""
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.bounds: List[float] = sorted(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+class MetricsRegistry:
+    """Labelled histograms and counters, rendered in Prometheus text format on scrape only."""
+
+    def __init__(self):
+        self._hists: Dict[str, Dict[Tuple[Tuple[str, str], ...], Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        key = tuple(sorted(labels.items()))
+        series = self._hists.get(name)
+        h = series.get(key) if series is not None else None
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(name, {}).setdefault(key, Histogram())
+        return h
+
+    def observe(self, name: str, value: float, **labels: str):
+        if METRICS_ENABLED:
+            self.histogram(name, **labels).observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe_stages(self, timings: Dict[str, float], **labels: str):
+        if not METRICS_ENABLED:
+            return
+        for stage, seconds in timings.items():
+            self.histogram("pose_stage_duration_seconds", stage=stage, **labels).observe(seconds)
+
+    def render(self, gauges: Iterable[Tuple[str, str, Dict[str, str], float]] = ()) -> str:
+        """Exposition text; gauges are (name, help, labels, value) computed by the caller at scrape time."""
+        lines: List[str] = []
+        with self._lock:
+            hists = {n: dict(s) for n, s in self._hists.items()}
+            counters = {n: dict(s) for n, s in self._counters.items()}
+        for name in sorted(hists):
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in sorted(hists[name].items()):
+                labels = dict(key)
+                counts, total = h.snapshot()
+                cum = 0
+                for bound, c in zip(h.bounds + [float("inf")], counts):
+                    cum += c
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {cum}")
+                lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_labels(labels)} {cum}")
+        for name in sorted(counters):
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_labels(dict(key))} {value!r}")
+        seen = set()
+        for name, help_text, labels, value in gauges:
+            if name not in seen:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            lines.append(f"{name}{_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("pose_stage_duration_seconds", "Time spent per pipeline stage")
+METRICS.describe("pose_request_duration_seconds", "End-to-end /similarity latency")
+METRICS.describe("pose_requests_total", "Similarity requests by outcome")
+METRICS.describe("pose_inference_timeouts_total", "Requests that exceeded INFER_TIMEOUT_SEC")
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+# A stage mutates the job in place; when it sets job.result the job completes early
+Stage = Callable[[Any], None]
+
+_STOP = object()
+
+
+class _Item:
+    __slots__ = ("job", "future")
+
+    def __init__(self, job: Any, future: Future):
+        self.job = job
+        self.future = future
+
+
+class StagedPipeline:
+    """Chain of stages, one worker thread each, connected by bounded queues.
+
+    Frames overlap across stages (frame N+1 can be in the detector while frame N
+    is being landmarked), so throughput approaches the slowest stage instead of
+    the sum of all stages. Bounded queues apply backpressure to submit().
+
+    Jobs are objects with a `result` attribute (None while in flight); the
+    future resolves to job.result once a stage sets it or the last stage returns.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Stage]], queue_size: int = 2):
+        self.names = [name for name, _ in stages]
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self._threads: List[threading.Thread] = []
+        for i, (name, fn) in enumerate(stages):
+            t = threading.Thread(target=self._worker, args=(i, fn), name=f"pose-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job: Any, timeout: Optional[float] = None) -> Future:
+        """Queue a job; raises queue.Full if there is no room within timeout (None = wait)."""
+        fut: Future = Future()
+        self._queues[0].put(_Item(job, fut), timeout=timeout)
+        return fut
+
+    def queue_depths(self) -> List[int]:
+        return [q.qsize() for q in self._queues]
+
+    def close(self):
+        self._queues[0].put(_STOP)
+        for t in self._threads:
+            t.join()
+
+    def _worker(self, idx: int, fn: Stage):
+        q_in = self._queues[idx]
+        q_out = self._queues[idx + 1] if idx + 1 < len(self._queues) else None
+        while True:
+            item = q_in.get()
+            if item is _STOP:
+                if q_out is not None:
+                    q_out.put(_STOP)
+                return
+            # Skip jobs whose caller gave up (e.g. request timeout)
+            if idx == 0 and not item.future.set_running_or_notify_cancel():
+                continue
+            try:
+                fn(item.job)
+            except BaseException as e:
+                item.future.set_exception(e)
+                continue
+            if item.job.result is not None or q_out is None:
+                item.future.set_result(item.job.result)
+            else:
+                q_out.put(item)
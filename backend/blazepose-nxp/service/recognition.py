@@ -0,0 +1,190 @@
+"""Nearest-pose recognition over the target library.
+
+Scores a detected pose against every target with the /similarity metric
+(mean absolute angle difference over the selected angles, counting only
+angles defined on both sides, then squared) in both orientations, and
+returns the top-k targets. Missing angles are masked, not imputed.
+
+Targets are scanned in one vectorized float32 pass that shortlists every
+target within rounding of the k-th best; the shortlist is re-scored exactly in
+float64. From RECOGNIZE_TREE_MIN targets on, a KD-tree (scipy, optional) over
+the targets that define every selected angle replaces the scan for those,
+built over the angles the query defines so tree L1 equals the masked metric;
+only targets missing an angle are still scanned.
+"""
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from scripts.pose_similarity import ANGLE_MIRROR_INDEX, ANGLE_NAMES, DEFAULT_SELECTED_ANGLES, angle_columns
+
+# Optional KD-tree for large libraries; brute force otherwise
+try:
+    from scipy.spatial import cKDTree
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# The float32 scan beats the tree up to a few 10k targets (scripts.bench_recognize)
+RECOGNIZE_TREE_MIN = int(os.getenv("RECOGNIZE_TREE_MIN", "20000"))
+# Below this many complete targets every row is scanned directly
+_TREE_ROWS_MIN = 64
+# Trees cached per angle selection, one per set of angles the query defines
+_MAX_TREES = 16
+# Angle selections cached per index (normalized column sets)
+_MAX_SELECTIONS = 64
+# Shortlist slack of the float32 scan per selected angle, in degrees; float32 rounding
+# of sums of <= 180 degree terms stays far below it
+_SCAN_SLACK = 1e-2
+
+
+@dataclass
+class PoseMatch:
+    name: str
+    similarity: float  # percent, as /similarity returns it
+    mirrored: bool  # best score came from the left/right-swapped pose
+
+
+class _Columns:
+    """Target angles for one angle selection, angle-major ([K, N]) for the masked metric:
+    float64 for exact scoring, float32 copies of the scanned rows for the shortlist pass.
+    With trees enabled, targets defining every selected angle ("complete") are searched
+    with a KD-tree per set of angles the query defines; only the others are scanned.
+    """
+
+    def __init__(self, table: np.ndarray, cols: np.ndarray, use_tree: bool):
+        sel = table[:, 0, cols].T  # [K, N] as recorded
+        self.cols = cols
+        self.mcols = ANGLE_MIRROR_INDEX[cols]
+        valid = ~np.isnan(sel)
+        self.filled = np.ascontiguousarray(np.where(valid, sel, 0.0))
+        self.valid = valid.astype(np.float64)  # 0/1 weights
+        self.complete: Optional[np.ndarray] = None  # rows searched by tree, None = no tree
+        self.scanned = np.arange(sel.shape[1])  # rows scanned in float32
+        self._trees: "OrderedDict[bytes, cKDTree]" = OrderedDict()
+        self._lock = threading.Lock()
+        complete = valid.all(axis=0)
+        if use_tree and complete.sum() >= _TREE_ROWS_MIN:
+            self.complete = np.flatnonzero(complete)
+            self.scanned = np.flatnonzero(~complete)
+        self.scan_filled = np.ascontiguousarray(self.filled[:, self.scanned], dtype=np.float32)
+        self.scan_valid = np.ascontiguousarray(self.valid[:, self.scanned], dtype=np.float32)
+
+    def tree(self, dims: np.ndarray) -> "cKDTree":
+        """KD-tree over the complete rows restricted to the angles in dims."""
+        key = dims.tobytes()
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                return tree
+        tree = cKDTree(self.filled[np.ix_(dims, self.complete)].T)
+        with self._lock:
+            self._trees[key] = tree
+            while len(self._trees) > _MAX_TREES:
+                self._trees.popitem(last=False)
+        return tree
+
+
+def _masked_best(filled: np.ndarray, valid: np.ndarray, q: np.ndarray, q_valid: np.ndarray):
+    """Masked L1 of the query [2, K] (as detected, mirrored) against [K, R] targets, in the
+    targets' dtype. Returns (best total over both orientations [R], mirrored was best [R] bool).
+    An orientation without any defined angle is skipped; at least one must have one.
+    """
+    q = q.astype(filled.dtype, copy=False)
+    totals = []
+    for o in range(2):
+        dims = q_valid[o]
+        if not dims.any():
+            totals.append(None)
+            continue
+        f, v = (filled, valid) if dims.all() else (filled[dims], valid[dims])
+        d = f - q[o, dims, None]
+        np.abs(d, out=d)
+        d *= v
+        totals.append(d.sum(axis=0))
+    if totals[1] is None:
+        return totals[0], np.zeros(len(totals[0]), dtype=bool)
+    if totals[0] is None:
+        return totals[1], np.ones(len(totals[1]), dtype=bool)
+    return np.minimum(totals[0], totals[1]), totals[1] < totals[0]
+
+
+def _within(total: np.ndarray, top_k: int, slack: float = 0.0) -> np.ndarray:
+    """Indices of the entries within slack of the top_k-th smallest (all of them if fewer)."""
+    if top_k >= len(total):
+        return np.arange(len(total))
+    cut = np.partition(total, top_k - 1)[top_k - 1]
+    return np.flatnonzero(total <= cut + slack)
+
+
+class PoseIndex:
+    """Top-k search over a [N, 2, NUM_ANGLES] target angle table (see TargetPose.table)."""
+
+    def __init__(self, names: Sequence[str], table: np.ndarray, tree_min: int = RECOGNIZE_TREE_MIN):
+        self.names = list(names)
+        self.table = np.ascontiguousarray(table, dtype=np.float64).reshape(len(self.names), 2, len(ANGLE_NAMES))
+        self.use_tree = SCIPY_AVAILABLE and len(self.names) >= tree_min
+        self._by_selection: "OrderedDict[bytes, _Columns]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _columns(self, selected: Optional[List[str]]) -> _Columns:
+        cols = angle_columns(list(selected or DEFAULT_SELECTED_ANGLES))
+        key = cols.tobytes()  # same column set whatever the order or duplicates in the request
+        with self._lock:
+            c = self._by_selection.get(key)
+            if c is not None:
+                self._by_selection.move_to_end(key)
+                return c
+        c = _Columns(self.table, cols, self.use_tree)
+        with self._lock:
+            c = self._by_selection.setdefault(key, c)
+            while len(self._by_selection) > _MAX_SELECTIONS:
+                self._by_selection.popitem(last=False)
+        return c
+
+    def query(self, angles: np.ndarray, top_k: int = 3, selected: Optional[List[str]] = None) -> List[PoseMatch]:
+        """angles: the detected pose's angles for every supported angle (compute_angles output, NaN = undefined)."""
+        c = self._columns(selected)
+        k = len(c.cols)
+        # Row 0 as detected, row 1 mirrored (a column permutation of the same angles)
+        q = np.stack([angles[c.cols], angles[c.mcols]])  # [2, K]
+        q_valid = ~np.isnan(q)
+        # An orientation without any defined angle scores 0, like compute_similarity_percent
+        if len(self.names) == 0 or not q_valid.any() or top_k <= 0:
+            return []
+
+        # Shortlist: rows within float32 rounding of the k-th best scanned row, plus (tree)
+        # the per-orientation top-k complete rows, which contain every complete row of the top-k
+        approx, _ = _masked_best(c.scan_filled, c.scan_valid, q, q_valid)
+        rows = c.scanned[_within(approx, top_k, _SCAN_SLACK * max(1, k))]
+        if c.complete is not None:
+            kk = min(top_k, len(c.complete))
+            hits = [rows]
+            # Both orientations define the same angles when the query has them all: one tree call
+            orients = [q_valid[0]] if (q_valid[0] == q_valid[1]).all() else [q_valid[0], q_valid[1]]
+            for o, dims in enumerate(orients):
+                if dims.any():
+                    pts = q[:, dims] if len(orients) == 1 else q[o, dims]
+                    _, idx = c.tree(dims).query(pts, k=kk, p=1)
+                    hits.append(c.complete[np.ravel(idx)])
+            rows = np.unique(np.concatenate(hits))
+
+        # Exact re-scoring; ties go to the lower target index, like a stable sort over all targets
+        best_total, best_orient = _masked_best(c.filled[:, rows], c.valid[:, rows], q, q_valid)
+        sel = _within(best_total, top_k)
+        top = sel[np.lexsort((rows[sel], best_total[sel]))[:top_k]]
+        sim = np.maximum(0.0, 1.0 - best_total[top] / max(1, k) / 180.0) ** 2 * 100.0
+        out = []
+        for j, s in zip(top.tolist(), sim.tolist()):
+            i = int(rows[j])
+            out.append(PoseMatch(name=self.names[i], similarity=s, mirrored=bool(best_orient[j])))
+        return out
@@ -0,0 +1,120 @@
+"""Compiled binary target library, memory-mapped at startup.
+
+One file holds every target pose: float32 landmarks, the precomputed angle
+table (as recorded and mirrored, see TargetPose.table) and a sorted name
+index. Opening it maps the file and reads the fixed header only, so startup
+cost and resident memory do not grow with the number of poses; pages are
+faulted in as targets are used. Build it with scripts.compile_targets.
+
+Layout (little-endian, sections 64-byte aligned):
+    header      _HEADER
+    landmarks   float32 [N, 33, 4]   x, y, z, score in source-image pixels
+    angles      float64 [N, 2, A]    row 0 as recorded, row 1 mirrored; NaN = undefined
+    name_offs   uint32  [N + 1]      byte offsets into the name blob
+    names       utf-8               target names, sorted
+    angle_names utf-8               ",".join(ANGLE_NAMES) the table was built with
+"""
+from __future__ import annotations
+import bisect
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from scripts.pose_similarity import ANGLE_MIRROR_INDEX, ANGLE_NAMES, KEYPOINT_NAMES, compute_angles, pack_keypoints
+
+LIBRARY_MAGIC = b"POSELIB\x00"
+LIBRARY_VERSION = 1
+# magic, version, n_poses, n_landmarks, n_angles, then offset/size of each section
+_HEADER = struct.Struct("<8sIIII6Q")
+_ALIGN = 64
+
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_library(path: str, poses: Dict[str, np.ndarray]):
+    """Write {name: float32 [33,4] (x, y, z, score)} as a library file (atomic replace)."""
+    names = sorted(poses)
+    n, n_lmk, n_ang = len(names), len(KEYPOINT_NAMES), len(ANGLE_NAMES)
+    landmarks = np.zeros((n, n_lmk, 4), dtype="<f4")
+    for i, name in enumerate(names):
+        landmarks[i] = poses[name]
+    angles = np.empty((n, 2, n_ang), dtype="<f8")
+    for i in range(n):
+        full = compute_angles(pack_keypoints(landmarks[i]))
+        angles[i, 0], angles[i, 1] = full, full[ANGLE_MIRROR_INDEX]
+    encoded = [nm.encode("utf-8") for nm in names]
+    name_offs = np.zeros(n + 1, dtype="<u4")
+    name_offs[1:] = np.cumsum([len(b) for b in encoded])
+    sections = [landmarks.tobytes(), angles.tobytes(), name_offs.tobytes(), b"".join(encoded),
+                ",".join(ANGLE_NAMES).encode("utf-8")]
+
+    offsets: List[int] = []
+    pos = _align(_HEADER.size)
+    for blob in sections:
+        offsets.append(pos)
+        pos = _align(pos + len(blob))
+    header = _HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, n, n_lmk, n_ang,
+                          offsets[0], offsets[1], offsets[2], offsets[3], offsets[4], len(sections[4]))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for off, blob in zip(offsets, sections):
+            f.seek(off)
+            f.write(blob)
+        f.truncate(pos)
+    os.replace(tmp, path)
+
+
+class _Names(Sequence):
+    """Lazily decoded, sorted name index (bisect-able without building a list)."""
+
+    def __init__(self, blob: memoryview, offs: np.ndarray):
+        self._blob = blob
+        self._offs = offs
+
+    def __len__(self) -> int:
+        return len(self._offs) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return bytes(self._blob[int(self._offs[i]):int(self._offs[i + 1])]).decode("utf-8")
+
+
+class TargetLibrary:
+    """Read-only view of a compiled library. Arrays are views into the mapping."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        (magic, version, n, n_lmk, n_ang,
+         lmk_off, ang_off, offs_off, names_off, anames_off, anames_len) = _HEADER.unpack_from(buf, 0)
+        if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION:
+            raise ValueError(f"{path}: not a version {LIBRARY_VERSION} target library")
+        angle_names = bytes(buf[anames_off:anames_off + anames_len]).decode("utf-8").split(",")
+        if n_lmk != len(KEYPOINT_NAMES) or angle_names != ANGLE_NAMES:
+            raise ValueError(f"{path}: built for other landmark/angle definitions; recompile it")
+        self.landmarks = np.frombuffer(buf, dtype="<f4", count=n * n_lmk * 4, offset=lmk_off).reshape(n, n_lmk, 4)
+        self.angles = np.frombuffer(buf, dtype="<f8", count=n * 2 * n_ang, offset=ang_off).reshape(n, 2, n_ang)
+        name_offs = np.frombuffer(buf, dtype="<u4", count=n + 1, offset=offs_off)
+        self.names = _Names(buf[names_off:], name_offs)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def index(self, name: str) -> Optional[int]:
+        """Row of a target (binary search over the sorted name index), or None."""
+        i = bisect.bisect_left(self.names, name)
+        return i if i < len(self.names) and self.names[i] == name else None
@@ -1,34 +1,103 @@
 from __future__ import annotations
+import functools
 import glob
 import json
 import os
+import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
-# Reuse similarity helpers from existing script
+import numpy as np
+
+# Reuse similarity helpers from existing scripts
+from scripts.analyze_landmarks import similarity_transform
 from scripts.pose_similarity import (
+    ANGLE_MIRROR_INDEX,
+    CONF_THRESHOLD,
     DEFAULT_SELECTED_ANGLES,
-    get_selected_angles,
+    KEYPOINT_NAMES,
+    MIRROR_INDEX,
     adjust_similarity,
+    angle_columns,
+    compute_angles,
     load_pose,
+    pack_keypoints,
+    pack_landmarks,
+    similarity_from_angles,
 )
+from service.recognition import PoseIndex
+from service.target_library import TargetLibrary
+
+# TARGETS_DIR is re-scanned (stat only) at most this often; new or modified files are
+# reloaded by mtime, deleted ones dropped. 0 disables hot reload.
+TARGETS_RELOAD_SEC = float(os.getenv("TARGETS_RELOAD_SEC", "2"))
+# Compiled library (scripts.compile_targets); used instead of the JSON files when present.
+# Default: <TARGETS_DIR>/targets.poselib
+TARGETS_LIBRARY = os.getenv("TARGETS_LIBRARY")
+LIBRARY_FILENAME = "targets.poselib"
+
+
+@functools.lru_cache(maxsize=64)
+def _columns(selected: Sequence[str]) -> np.ndarray:
+    return angle_columns(list(selected))
 
 
 @dataclass
 class TargetPose:
     name: str
     json_path: str
-    angles: List[Optional[float]]
+    # float64 [2, NUM_ANGLES] over every supported angle: row 0 as recorded, row 1 mirrored
+    # (left/right swapped); NaN = undefined. Any angle subset is a column selection.
+    table: np.ndarray
+    mtime_ns: int = 0
+    # float32 [33, 4] (x, y, z, score) as recorded, for the procrustes metric
+    landmarks: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_keypoints(cls, name: str, json_path: str, keypoints, mtime_ns: int = 0) -> "TargetPose":
+        full = compute_angles(pack_keypoints(keypoints))
+        table = np.stack([full, full[ANGLE_MIRROR_INDEX]])
+        table.flags.writeable = False
+        if not isinstance(keypoints, np.ndarray):
+            landmarks = pack_landmarks(keypoints)
+        elif keypoints.shape == (len(KEYPOINT_NAMES), 4):
+            landmarks = keypoints.astype(np.float32)
+        else:  # [33,3] (x, y, score) or empty: no z
+            landmarks = np.zeros((len(KEYPOINT_NAMES), 4), dtype=np.float32)
+            landmarks[:, [0, 1, 3]] = pack_keypoints(keypoints)
+        landmarks.flags.writeable = False
+        return cls(name=name, json_path=json_path, table=table, mtime_ns=mtime_ns, landmarks=landmarks)
+
+    def angles(self, selected: Optional[List[str]] = None, mirrored: bool = False) -> np.ndarray:
+        """Target angles for a selection (default DEFAULT_SELECTED_ANGLES), in table order."""
+        return self.table[int(mirrored), _columns(tuple(selected or DEFAULT_SELECTED_ANGLES))]
 
 
 class TargetRegistry:
+    """Target poses from a compiled library (memory-mapped, see service.target_library)
+    or, when no library exists, from the *_landmarks.json files in targets_dir.
+    Hot reload follows the library file's mtime, or each JSON file's. JSON files newer
+    than the library (added or edited after it was compiled) are served on top of it,
+    with a warning, until the library is recompiled.
+    """
     _instance: Optional["TargetRegistry"] = None
 
-    def __init__(self, targets_dir: str, selected_angles: Optional[List[str]] = None):
+    def __init__(self, targets_dir: str, selected_angles: Optional[List[str]] = None,
+                 reload_sec: float = TARGETS_RELOAD_SEC, library_path: Optional[str] = TARGETS_LIBRARY):
         self.targets_dir = targets_dir
         self.selected = selected_angles or DEFAULT_SELECTED_ANGLES
-        self._by_name: Dict[str, TargetPose] = {}
-        self._load_all()
+        self.reload_sec = reload_sec
+        self.library_path = library_path or os.path.join(targets_dir, LIBRARY_FILENAME)
+        # Replaced wholesale on reload, so readers never need the lock
+        self._library: Optional[TargetLibrary] = None
+        self._by_name: Dict[str, TargetPose] = {}  # JSON targets; with a library, only those newer than it
+        self._lock = threading.Lock()
+        self._scanned_at = 0.0
+        self._version = 0  # bumped whenever the target set changes
+        self._index: Optional[Tuple[int, PoseIndex]] = None
+        self._landmarks: Optional[Tuple[int, List[str], np.ndarray]] = None
+        self.refresh(force=True)
 
     @classmethod
     def initialize(cls, targets_dir: str, selected_angles: Optional[List[str]] = None):
@@ -40,80 +109,189 @@ class TargetRegistry:
             cls.initialize(targets_dir=os.getenv("TARGETS_DIR", os.path.join(os.getcwd(), "targets")))
         return cls._instance  # type: ignore
 
-    def _load_all(self):
-        pattern = os.path.join(self.targets_dir, "*_landmarks.json")
-        for path in glob.glob(pattern):
-            base = os.path.basename(path)
-            # strip suffix "_landmarks.json"
-            if base.endswith("_landmarks.json"):
-                name = base[: -len("_landmarks.json")]
-            else:
-                name = os.path.splitext(base)[0]
+    def refresh(self, force: bool = False) -> bool:
+        """Re-scan and reload only what changed. Returns True if anything changed.
+        Without force this is a no-op until reload_sec has passed since the last scan.
+        """
+        if not force and (self.reload_sec <= 0 or time.monotonic() - self._scanned_at < self.reload_sec):
+            return False
+        with self._lock:
+            if not force and time.monotonic() - self._scanned_at < self.reload_sec:
+                return False  # another thread just scanned
+            try:
+                changed = self._refresh_library()
+                changed = self._refresh_json() or changed
+            finally:
+                self._scanned_at = time.monotonic()
+            if changed:
+                self._version += 1
+            return changed
+
+    def _refresh_library(self) -> bool:
+        """(Re)map the compiled library if it appeared or changed. False if there is none."""
+        try:
+            mtime_ns = os.stat(self.library_path).st_mtime_ns
+        except OSError:
+            if self._library is None:
+                return False
+            self._library = None  # removed: fall back to the JSON files
+            self._by_name = {}
+            return True
+        if self._library is not None and self._library.mtime_ns == mtime_ns:
+            return False
+        try:
+            self._library = TargetLibrary(self.library_path)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Failed to load target library {self.library_path}: {e}")
+            return False
+        self._by_name = {}
+        return True
+
+    def _refresh_json(self) -> bool:
+        """(Re)load changed JSON targets: all of them, or with a library only those newer than it."""
+        lib = self._library
+        by_name = dict(self._by_name)
+        changed = False
+        seen = set()
+        for path in glob.glob(os.path.join(self.targets_dir, "*_landmarks.json")):
+            name = self._target_name(path)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue  # deleted while scanning
+            if lib is not None and mtime_ns <= lib.mtime_ns:
+                continue  # compiled into the library
+            seen.add(name)
+            cur = by_name.get(name)
+            if cur is not None and cur.json_path == path and cur.mtime_ns == mtime_ns:
+                continue
             try:
-                kps = load_pose(path)
-                angles = get_selected_angles(kps, self.selected)
-                self._by_name[name] = TargetPose(name=name, json_path=path, angles=angles)
+                by_name[name] = TargetPose.from_keypoints(name, path, load_pose(path), mtime_ns)
+                changed = True
             except Exception as e:
-                # Skip malformed entries
+                # Skip malformed entries (a previously loaded version stays in place)
                 print(f"[WARN] Failed to load target {path}: {e}")
+        for name in set(by_name) - seen:
+            del by_name[name]
+            changed = True
+        if changed:
+            self._by_name = by_name
+            if lib is not None and by_name:
+                print(f"[WARN] {len(by_name)} target JSON file(s) newer than {self.library_path} are served over it; "
+                      f"recompile it with scripts.compile_targets")
+        return changed
+
+    @staticmethod
+    def _target_name(path: str) -> str:
+        base = os.path.basename(path)
+        # strip suffix "_landmarks.json"
+        if base.endswith("_landmarks.json"):
+            return base[: -len("_landmarks.json")]
+        return os.path.splitext(base)[0]
 
     # ----- Public API -----
     def list_targets(self) -> List[str]:
-        return sorted(self._by_name.keys())
+        self.refresh()
+        lib, by_name = self._library, self._by_name
+        if lib is not None and not by_name:
+            return list(lib.names)  # stored sorted
+        return sorted(set(lib.names if lib is not None else ()) | set(by_name))
 
     def get(self, name: str) -> Optional[TargetPose]:
-        return self._by_name.get(name)
+        self.refresh()
+        lib = self._library
+        target = self._by_name.get(name)
+        if target is not None or lib is None:
+            return target
+        i = lib.index(name)
+        if i is None:
+            return None
+        return TargetPose(name=name, json_path=lib.path, table=lib.angles[i], mtime_ns=lib.mtime_ns,
+                          landmarks=lib.landmarks[i])
 
+    def _stacked(self, lib_rows: Optional[np.ndarray], attr: str, empty: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        """(sorted names, per-target rows stacked) over the library and the JSON targets, JSON first.
+        lib_rows is the library's array for attr (None without a library)."""
+        lib, by_name = self._library, self._by_name
+        names = sorted(set(lib.names if lib is not None else ()) | set(by_name))
+        if not names:
+            return names, empty
+        return names, np.stack([getattr(by_name[n], attr) if n in by_name else lib_rows[lib.index(n)]  # type: ignore
+                                for n in names])
 
-# ---- Mirror helpers ----
+    def recognition_index(self) -> PoseIndex:
+        """Nearest-pose index over all targets, rebuilt after a reload changed the target set."""
+        self.refresh()
+        cached, version = self._index, self._version
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        lib = self._library
+        if lib is not None and not self._by_name:
+            index = PoseIndex(list(lib.names), lib.angles)  # angle table stays in the mapping
+        else:
+            names, table = self._stacked(None if lib is None else lib.angles, "table", np.zeros((0, 2, 0)))
+            index = PoseIndex(names, table)
+        self._index = (version, index)
+        return index
 
-def _swap_left_right_name(name: str) -> str:
-    if name.startswith("left_"):
-        return "right_" + name[len("left_"):]
-    if name.startswith("right_"):
-        return "left_" + name[len("right_"):]
-    return name
+    def landmark_table(self) -> Tuple[List[str], np.ndarray]:
+        """(sorted names, float32 [N, 33, 4] landmarks) of all targets, for batched scoring."""
+        self.refresh()
+        cached, version = self._landmarks, self._version
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        lib = self._library
+        if lib is not None and not self._by_name:
+            names, table = list(lib.names), lib.landmarks  # stays in the mapping
+        else:
+            names, table = self._stacked(None if lib is None else lib.landmarks, "landmarks",
+                                         np.zeros((0, len(KEYPOINT_NAMES), 4), dtype=np.float32))
+        self._landmarks = (version, names, table)
+        return names, table
 
 
-def _swap_lr_keypoints(keypoints: List[dict]) -> List[dict]:
-    swapped: List[dict] = []
-    for kp in keypoints:
-        # Preserve all fields; only change the semantic side encoded in the name
-        nm = str(kp.get("name", ""))
-        swapped.append({**kp, "name": _swap_left_right_name(nm)})
-    return swapped
+def compute_similarity_percent(origin_keypoints, target: TargetPose, selected: Optional[List[str]] = None) -> float:
+    """Compute percent similarity given detected keypoints and a precomputed target.
+    origin_keypoints is a list of keypoint dicts or a packed keypoint array (see pack_keypoints).
+    Supports mirrored poses and returns the max similarity of both orientations. The
+    mirrored pose's angles are a column permutation of the pose's own, so one angle
+    computation covers both; target angles for any selection are a column lookup.
+    """
+    origin = compute_angles(pack_keypoints(origin_keypoints))  # every supported angle
+    return similarity_percent_from_angles(origin, target, selected)
 
 
-def _similarity_from_angles(origin_angles: List[Optional[float]], target_angles: List[Optional[float]]) -> float:
-    # Sum absolute differences where both present; divide by total slots (as in TS code)
-    total_diff = 0.0
-    for a, b in zip(origin_angles, target_angles):
-        if a is not None and b is not None:
-            total_diff += abs(a - b)
-    # If origin has no valid angles, return 0
-    if all(a is None for a in origin_angles):
-        return 0.0
-    avg_diff = total_diff / max(1, len(origin_angles))
-    sim = max(0.0, 1.0 - (avg_diff / 180.0))
-    sim_adj = adjust_similarity(sim)
-    return sim_adj * 100.0
+def similarity_percent_from_angles(origin: np.ndarray, target: TargetPose, selected: Optional[List[str]] = None) -> float:
+    """compute_similarity_percent for a pose given by its angles over every supported angle."""
+    cols = _columns(tuple(selected or DEFAULT_SELECTED_ANGLES))
+    mcols = ANGLE_MIRROR_INDEX[cols]
+    # Row 1: mirrored origin vs target == origin vs mirrored target on the mirrored columns
+    both = np.stack([origin[cols], origin[mcols]])
+    sim = similarity_from_angles(both, np.stack([target.table[0, cols], target.table[1, mcols]]))
+    return float(adjust_similarity(float(sim.max())) * 100.0)
 
 
-def compute_similarity_percent(origin_keypoints: List[dict], target: TargetPose, selected: Optional[List[str]] = None) -> float:
-    """Compute percent similarity given detected keypoints and a precomputed target.
-    By default supports mirrored poses by evaluating both original and left/right-swapped
-    landmark names and returning the max similarity.
+def procrustes_similarity_percent(origin_keypoints, landmarks: np.ndarray) -> np.ndarray:
+    """Shape similarity of one pose against a stack of targets, in percent.
+    landmarks: [N, 33, 4] (x, y, z, score) or [N, 33, 3] (x, y, score); returns float64 [N].
+    Each target is aligned to the pose with the best-fit similarity transform (translation,
+    uniform scale, rotation) over the keypoints confident on both sides, all targets at once
+    with stacked 2x2 SVDs. The score is 1 - Procrustes distance (square root of the residual
+    share of the spread), squared like the angle metric. The mirrored pose (left/right
+    swapped and reflected) is aligned too and the better orientation kept.
     """
-    sel = selected or DEFAULT_SELECTED_ANGLES
-
-    # Original orientation
-    origin_angles = get_selected_angles(origin_keypoints, sel)
-    base = _similarity_from_angles(origin_angles, target.angles)
+    origin = pack_keypoints(origin_keypoints)  # [33,3] x, y, score
+    mirrored = origin[MIRROR_INDEX]
+    mirrored[:, 0] = -mirrored[:, 0]
+    both = np.stack([origin, mirrored])  # [2, 33, 3]
+    lm = np.asarray(landmarks)
+    w = (both[:, None, :, 2] >= CONF_THRESHOLD) & (lm[None, :, :, -1] >= CONF_THRESHOLD)  # [2, N, 33]
+    _, _, _, ratio = similarity_transform(both[:, None, :, :2], lm[None, :, :, :2], w)
+    return adjust_similarity(1.0 - np.sqrt(ratio.min(axis=0))) * 100.0
 
-    # Mirrored (swap left/right names on the fly)
-    swapped_kps = _swap_lr_keypoints(origin_keypoints)
-    swapped_angles = get_selected_angles(swapped_kps, sel)
-    mirrored = _similarity_from_angles(swapped_angles, target.angles)
-
-    return max(base, mirrored)
 
+def compute_procrustes_percent(origin_keypoints, target: TargetPose) -> float:
+    """procrustes_similarity_percent for a single target."""
+    if target.landmarks is None:
+        return 0.0
+    return float(procrustes_similarity_percent(origin_keypoints, target.landmarks[None])[0])
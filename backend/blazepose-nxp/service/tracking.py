@@ -0,0 +1,111 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import numpy as np
+
+import blazepose_imx93 as bp
+
+# A tracked ROI is only reused while both confidences stay above these
+TRACK_PRESENCE_THRESH = float(os.getenv("TRACK_PRESENCE_THRESH", "0.5"))
+TRACK_LANDMARK_THRESH = float(os.getenv("TRACK_LANDMARK_THRESH", "0.5"))
+# Sessions idle for longer than this restart from the detector
+TRACK_SESSION_TTL_SEC = float(os.getenv("TRACK_SESSION_TTL_SEC", "5"))
+TRACK_MAX_SESSIONS = int(os.getenv("TRACK_MAX_SESSIONS", "32"))
+
+# Torso landmarks (shoulders, hips) used for confidence and the fallback ROI
+_L_SHOULDER, _R_SHOULDER, _L_HIP, _R_HIP = 11, 12, 23, 24
+_TORSO = [_L_SHOULDER, _R_SHOULDER, _L_HIP, _R_HIP]
+
+
+@dataclass
+class TrackingSession:
+    """Per-client tracking state; rect is a NormalizedRect in the letterboxed square."""
+    session_id: str
+    rect: Optional[dict] = None
+    img_hw: Optional[Tuple[int, int]] = None
+    updated_at: float = 0.0
+    tracked_frames: int = 0
+    detector_frames: int = 0
+    # Held while one of the session's frames is in flight: each frame's ROI comes from the
+    # frame before it, so a session's frames run one at a time
+    gate: threading.Semaphore = field(default_factory=lambda: threading.Semaphore(1), repr=False)
+
+    def roi_for(self, img_hw: Tuple[int, int]) -> Optional[dict]:
+        """Previous frame's ROI, if still usable for a frame of this size."""
+        if self.rect is None or self.img_hw != tuple(img_hw):
+            return None
+        if time.monotonic() - self.updated_at > TRACK_SESSION_TTL_SEC:
+            return None
+        return self.rect
+
+    def update(self, rect: Optional[dict], img_hw: Tuple[int, int], tracked: bool):
+        self.rect = rect
+        self.img_hw = tuple(img_hw)
+        self.updated_at = time.monotonic()
+        if tracked:
+            self.tracked_frames += 1
+        else:
+            self.detector_frames += 1
+
+
+class SessionStore:
+    """Bounded, thread-safe map session_id -> TrackingSession (least recently used evicted)."""
+
+    def __init__(self, max_sessions: int = TRACK_MAX_SESSIONS):
+        self._sessions: "OrderedDict[str, TrackingSession]" = OrderedDict()
+        self._max = max_sessions
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> TrackingSession:
+        with self._lock:
+            s = self._sessions.get(session_id)
+            if s is None:
+                s = TrackingSession(session_id=session_id)
+                self._sessions[session_id] = s
+                while len(self._sessions) > self._max:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return s
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+def tracking_confident(kp_prob: Optional[np.ndarray], presence_prob: float) -> bool:
+    """Keep tracking only while pose presence and torso landmark confidence hold."""
+    if presence_prob < TRACK_PRESENCE_THRESH:
+        return False
+    if kp_prob is None or kp_prob.shape[0] < 33:
+        return True
+    return float(kp_prob[_TORSO].mean()) >= TRACK_LANDMARK_THRESH
+
+
+def roi_from_landmarks(pts_norm: np.ndarray, aux_norm: Optional[np.ndarray] = None) -> dict:
+    """Next-frame ROI from landmarks normalized to the letterboxed square.
+    Uses the same math as the detector path (_compute_roi_normrect_256 +
+    _rect_transform_norm). With the auxiliary alignment points (39-landmark
+    models) this is MediaPipe's PoseLandmarksToRoi; otherwise the center is
+    the mid-hip, the rotation follows mid-hip -> mid-shoulder and the radius
+    covers the farthest landmark.
+    """
+    if aux_norm is not None:
+        center, scale_pt = aux_norm[0], aux_norm[1]
+    else:
+        center = 0.5 * (pts_norm[_L_HIP] + pts_norm[_R_HIP])
+        up = 0.5 * (pts_norm[_L_SHOULDER] + pts_norm[_R_SHOULDER]) - center
+        norm = float(np.hypot(up[0], up[1]))
+        up = up / norm if norm > 0 else np.array([0.0, -1.0], dtype=np.float32)
+        radius = float(np.hypot(*(pts_norm - center).T).max())
+        scale_pt = center + up * radius
+    rect0 = bp._compute_roi_normrect_256(center, scale_pt)
+    return bp._rect_transform_norm(rect0, (256, 256), scale_x=1.25, scale_y=1.25, square_long=True)
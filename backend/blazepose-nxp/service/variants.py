@@ -0,0 +1,120 @@
+from __future__ import annotations
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Landmark variants from most to least accurate; also the downgrade order
+VARIANT_ORDER = ["heavy", "full", "lite"]
+
+# Automatic policy: downgrade when the rolling p95 request latency or the number of
+# in-flight requests exceeds the budget, upgrade once p95 is well below it and idle
+LMK_LATENCY_BUDGET_MS = float(os.getenv("LMK_LATENCY_BUDGET_MS", "250"))
+LMK_MAX_INFLIGHT = int(os.getenv("LMK_MAX_INFLIGHT", "3"))
+LMK_POLICY_WINDOW = int(os.getenv("LMK_POLICY_WINDOW", "20"))
+LMK_UPGRADE_RATIO = float(os.getenv("LMK_UPGRADE_RATIO", "0.6"))
+
+
+def parse_variant_models(spec: Optional[str], default_path: str) -> Dict[str, str]:
+    """BLAZEPOSE_LMK_MODELS="lite=a.tflite,full=b.tflite" -> {"lite": "a.tflite", "full": "b.tflite"}.
+    Without a spec, the single BLAZEPOSE_LMK_MODEL is registered under the variant
+    named in its file name (pose_landmark_<variant>_...), or "full".
+    """
+    if spec:
+        models: Dict[str, str] = {}
+        for item in spec.split(","):
+            if not item.strip():
+                continue
+            name, sep, path = item.partition("=")
+            if not sep or not name.strip() or not path.strip():
+                raise ValueError(f"Invalid BLAZEPOSE_LMK_MODELS entry: {item!r} (expected name=path)")
+            models[name.strip().lower()] = path.strip()
+        return models
+    base = os.path.basename(default_path).lower()
+    name = next((v for v in VARIANT_ORDER if f"_{v}" in base), "full")
+    return {name: default_path}
+
+
+def order_variants(names: List[str]) -> List[str]:
+    """Most accurate first; unknown names keep their given order after the known ones."""
+    known = [v for v in VARIANT_ORDER if v in names]
+    return known + [n for n in names if n not in known]
+
+
+class AdaptiveVariantPolicy:
+    """Chooses the landmark variant for requests that do not ask for one.
+
+    Starts at the most accurate variant. Request latencies feed a rolling window per
+    level; after a switch the window restarts, so each decision is based only on
+    samples taken at the current level (hysteresis against flapping).
+    """
+
+    def __init__(self, variants: List[str], budget_ms: float = LMK_LATENCY_BUDGET_MS,
+                 max_inflight: int = LMK_MAX_INFLIGHT, window: int = LMK_POLICY_WINDOW,
+                 upgrade_ratio: float = LMK_UPGRADE_RATIO):
+        self.variants = order_variants(list(variants))
+        self.budget_ms = budget_ms
+        self.max_inflight = max_inflight
+        self.window = max(2, window)
+        self.upgrade_ratio = upgrade_ratio
+        self._level = 0
+        self._latencies: deque = deque(maxlen=self.window)
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self.downgrades = 0
+        self.upgrades = 0
+
+    @property
+    def current(self) -> str:
+        return self.variants[self._level]
+
+    def choose(self) -> str:
+        """Variant for the next automatic request; downgrades at once when too many are in flight."""
+        with self._lock:
+            if self._inflight >= self.max_inflight and self._level < len(self.variants) - 1:
+                self._switch(+1)
+            return self.variants[self._level]
+
+    def begin(self):
+        with self._lock:
+            self._inflight += 1
+
+    def end(self, variant: str, latency_ms: float):
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+            # Samples from another level (explicit requests, or in flight across a switch) are ignored
+            if variant != self.variants[self._level]:
+                return
+            self._latencies.append(latency_ms)
+            if len(self._latencies) < self.window:
+                return
+            p95 = float(np.percentile(self._latencies, 95))
+            if p95 > self.budget_ms and self._level < len(self.variants) - 1:
+                self._switch(+1)
+            elif p95 < self.budget_ms * self.upgrade_ratio and self._inflight == 0 and self._level > 0:
+                self._switch(-1)
+
+    def _switch(self, step: int):
+        self._level += step
+        self._latencies.clear()
+        if step > 0:
+            self.downgrades += 1
+        else:
+            self.upgrades += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = list(self._latencies)
+            return {
+                "variants": list(self.variants),
+                "current": self.variants[self._level],
+                "inflight": self._inflight,
+                "p95_ms": float(np.percentile(lat, 95)) if lat else None,
+                "samples": len(lat),
+                "budget_ms": self.budget_ms,
+                "max_inflight": self.max_inflight,
+                "downgrades": self.downgrades,
+                "upgrades": self.upgrades,
+            }
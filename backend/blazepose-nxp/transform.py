@@ -0,0 +1,96 @@
+"""Composed affine projection of landmarks back to the source image.
+
+The landmark model outputs coordinates normalized to the ROI crop. Mapping them
+to original pixels goes ROI -> letterboxed square (MediaPipe's
+GetRotatedSubRectToRectTransformMatrix) -> square pixels -> original frame
+(inverse letterbox) -> full-resolution pixels (reduced JPEG decode). Each step
+is affine, so they are composed into one 3x3 matrix and applied to all
+landmarks in a single matmul.
+
+Landmarks stay a packed float32 [N,4] array (x, y, z, score) in original
+pixels until the JSON boundary (keypoints_to_dicts).
+"""
+from __future__ import annotations
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from preprocess import LetterboxMeta
+
+
+def roi_to_square(rect: dict) -> np.ndarray:
+    """3x3 affine: ROI-normalized (u, v) -> letterboxed-square-normalized (x, y).
+    Same coefficients as blazepose_imx93._get_rotated_subrect_to_rect_matrix on a
+    square frame, without the z row.
+    """
+    w, h = rect["w"], rect["h"]
+    c, s = math.cos(rect["rot"]), math.sin(rect["rot"])
+    return np.array(
+        [[w * c, -h * s, -0.5 * w * c + 0.5 * h * s + rect["xc"]],
+         [w * s, h * c, -0.5 * h * c - 0.5 * w * s + rect["yc"]],
+         [0.0, 0.0, 1.0]],
+        dtype=np.float64,
+    )
+
+
+def square_to_image(meta: LetterboxMeta, decode_scale: Tuple[float, float] = (1.0, 1.0)) -> np.ndarray:
+    """3x3 affine: letterboxed-square-normalized (x, y) -> original pixels.
+    Inverse letterbox (x * S - pad) followed by the reduced-decode scale.
+    """
+    h, w, pad_y, pad_x = meta
+    S = float(max(h, w))
+    sx, sy = float(decode_scale[0]), float(decode_scale[1])
+    return np.array(
+        [[S * sx, 0.0, -pad_x * sx],
+         [0.0, S * sy, -pad_y * sy],
+         [0.0, 0.0, 1.0]],
+        dtype=np.float64,
+    )
+
+
+def roi_to_image(rect: dict, meta: LetterboxMeta, decode_scale: Tuple[float, float] = (1.0, 1.0)) -> np.ndarray:
+    """3x3 affine: ROI-normalized (u, v) -> original pixels."""
+    return square_to_image(meta, decode_scale) @ roi_to_square(rect)
+
+
+def apply_affine(M: np.ndarray, pts: np.ndarray) -> np.ndarray:
+    """Apply a 3x3 affine to [N,2] points; returns float32 [N,2]."""
+    pts = np.asarray(pts, dtype=np.float32)
+    return (pts @ M[:2, :2].T.astype(np.float32)) + M[:2, 2].astype(np.float32)
+
+
+def z_scale(rect: dict) -> float:
+    """LandmarkProjectionCalculator::CalculateZScale: length of the projected unit x step
+    in normalized square space (equals rect["w"])."""
+    M = roi_to_square(rect)
+    return float(math.hypot(M[0, 0], M[1, 0]))
+
+
+def project_landmarks(lm_img: np.ndarray, rect: dict, meta: LetterboxMeta,
+                      decode_scale: Tuple[float, float] = (1.0, 1.0),
+                      scores: Optional[np.ndarray] = None,
+                      clip_hw: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """ROI-normalized landmarks [N,2|3] -> packed float32 [N,4] (x, y, z, score) in original pixels.
+    z is scaled like MediaPipe's projection (normalized square units); scores default to 0.
+    clip_hw=(H, W) clamps x, y to the image bounds.
+    """
+    lm = np.asarray(lm_img, dtype=np.float32)
+    out = np.zeros((lm.shape[0], 4), dtype=np.float32)
+    out[:, :2] = apply_affine(roi_to_image(rect, meta, decode_scale), lm[:, :2])
+    if lm.shape[1] >= 3:
+        out[:, 2] = lm[:, 2] * np.float32(z_scale(rect))
+    if scores is not None:
+        out[:, 3] = scores
+    if clip_hw is not None:
+        np.clip(out[:, 0], 0, clip_hw[1] - 1, out=out[:, 0])
+        np.clip(out[:, 1], 0, clip_hw[0] - 1, out=out[:, 1])
+    return out
+
+
+def keypoints_to_dicts(packed: np.ndarray, names: Sequence[str], with_z: bool = False) -> List[dict]:
+    """JSON boundary: packed [N,4] -> [{name, x, y[, z], score}, ...]."""
+    rows = packed.tolist()  # one conversion to Python floats
+    if with_z:
+        return [{"name": n, "x": x, "y": y, "z": z, "score": c} for n, (x, y, z, c) in zip(names, rows)]
+    return [{"name": n, "x": x, "y": y, "score": c} for n, (x, y, _z, c) in zip(names, rows)]
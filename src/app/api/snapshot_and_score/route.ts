@@ -38,8 +38,8 @@ export async function GET(req: Request) {
     }
     const targetPose = targetPoseRaw.trim()
 
-    // 1) 叫板子相機拍一張 (存在 imx93 本地)
-    const snapUrl = `${CAM_BASE}/snap?save=1`
+    // 1) 叫板子相機拍一張，直接拿回 JPEG bytes（不經過檔案系統）
+    const snapUrl = `${CAM_BASE}/snap`
     const snapRes = await fetch(snapUrl, { cache: "no-store" })
     if (!snapRes.ok) {
       const errTxt = await snapRes.text().catch(() => "")
@@ -48,37 +48,23 @@ export async function GET(req: Request) {
         { status: 502 }
       )
     }
-
-    // 2) 獲取 imx93 上的檔案路徑
-    const healthRes = await fetch(`${CAM_BASE}/health`, { cache: "no-store" })
-    if (!healthRes.ok) {
+    const jpeg = await snapRes.arrayBuffer()
+    if (jpeg.byteLength === 0) {
       return NextResponse.json(
-        { error: "camera_health_failed", status: healthRes.status },
+        { error: "no_frame_available", message: "Camera returned an empty frame" },
         { status: 502 }
       )
     }
 
-    const healthData = await healthRes.json()
-    const lastFrame = healthData.last_frame
-    if (!lastFrame) {
-      return NextResponse.json(
-        { error: "no_frame_available", message: "Camera has no frames" },
-        { status: 502 }
-      )
-    }
-
-    // 3) 使用 imx93 檔案路徑呼叫相似度 API
-    const payload: { image_path: string; target_pose: string } = {
-      image_path: lastFrame,  // imx93 本地路徑
-      target_pose: targetPose,
-    }
-
+    // 2) 把影像 bytes 直接送到相似度 API（target_pose 放在 query string）
+    const simUrl = new URL(SIM_API)
+    simUrl.searchParams.set("target_pose", targetPose)
     const simRes = await fetch(
-      SIM_API,
+      simUrl,
       {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
+        headers: { "Content-Type": "application/octet-stream" },
+        body: jpeg,
       }
     )
 